@@ -1,4 +1,7 @@
 import streamlit as st
+from utils.figure_cache import start_background_warmup
+from utils.filters import render_global_filters
+from utils.result_cache import get_result_cache
 
 # ----------------------------------------------------
 # GLOBAL PAGE CONFIGURATION
@@ -10,6 +13,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Pre-build the default dashboard figures while the user reads the home page
+start_background_warmup()
+
 # ----------------------------------------------------
 # SIDEBAR BRANDING (Header inside sidebar)
 # ----------------------------------------------------
@@ -24,6 +30,9 @@ with st.sidebar:
         <hr style='margin:10px 0 20px 0; border-color:#FFBABA;'>
     """, unsafe_allow_html=True)
 
+# Global filters are drawn on every page and remembered across pages
+render_global_filters()
+
 # ----------------------------------------------------
 # GLOBAL STYLING (CSS)
 # ----------------------------------------------------
@@ -157,6 +166,17 @@ with right:
 
 st.markdown("---")
 
+# ----------------------------------------------------
+# RESULT CACHE STATUS
+# ----------------------------------------------------
+with st.expander("⚙️ Shared Result Cache"):
+    stats = get_result_cache().stats()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Cached Entries", f"{stats['entries']:,}")
+    m2.metric("Memory Used", f"{stats['bytes'] / 1024**2:,.1f} / {stats['max_bytes'] / 1024**2:,.0f} MB")
+    m3.metric("Hit Rate", f"{stats['hit_rate']:.0%}", help=f"{stats['hits']:,} hits, {stats['misses']:,} misses")
+    m4.metric("Evictions", f"{stats['evictions']:,}", help=f"{stats['invalidations']:,} entries dropped by dataset updates")
+
 # ----------------------------------------------------
 # FOOTER
 # ----------------------------------------------------
@@ -0,0 +1,31 @@
+"""Headless generation of the monthly Executive Summary report pack.
+
+Usage (from the repository root):
+
+    python ymca_app/generate_reports.py --out reports/2025-01 --workers 8
+"""
+import argparse
+
+from utils.executive_report import HAS_STATIC_EXPORT, generate_report_pack
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render per-location / per-cluster Executive Summary reports.")
+    parser.add_argument("--out", required=True, help="Output directory for the HTML reports.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--interactive", action="store_true",
+                        help="Use interactive Plotly charts instead of static images.")
+    args = parser.parse_args()
+
+    written = generate_report_pack(
+        args.out,
+        max_workers=args.workers,
+        static_images=HAS_STATIC_EXPORT and not args.interactive,
+    )
+    for title, path in written:
+        print(f"{title}: {path}")
+    print(f"{len(written)} reports written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,20 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from pathlib import Path
+from utils.aggregates import dataset_columns, distinct, take_rows
+from utils.bootstrap import bootstrap_ci, with_error_bars
+from utils.filters import render_global_filters
+from utils.record_browser import render_record_browser
+from utils.segments import compare_segments, segment_rows
+from utils.selection import combine_filters
 
 st.markdown(
     "<h1 style='color:#8b0000;'>🔎 Segment Deep Dive</h1>",
     unsafe_allow_html=True
 )
 
-@st.cache_data
-def load_data():
-    here = Path(__file__).resolve()
-    base_dir = here.parent.parent
-    excel_path = base_dir / "ymca_clusters.xlsx"
-    df = pd.read_excel(excel_path, engine="openpyxl")
-    return df
-
-df = load_data()
+# Hold records narrowed by the sidebar's global filters
+global_filters = render_global_filters()
+columns = dataset_columns()
 
 # Segment columns
 seg_cols = {
@@ -25,27 +23,150 @@ seg_cols = {
     "Package Category": "application_package_category",
     "Age Category": "application_contact_age_category",
     "Reason for Hold": "reason_for_hold",
-    "Cluster": "cluster_label" if "cluster_label" in df.columns else None,
+    "Cluster": "cluster_label" if "cluster_label" in columns else None,
 }
 
 seg_cols = {k: v for k, v in seg_cols.items() if v is not None}
 
-seg_name = st.selectbox("Select segment dimension:", list(seg_cols.keys()))
+# Other pages (e.g. Anomaly Alerts) link here with ?segment=<dimension>&value=<value>
+linked_seg = st.query_params.get("segment")
+seg_name = st.selectbox(
+    "Select segment dimension:",
+    list(seg_cols.keys()),
+    index=list(seg_cols).index(linked_seg) if linked_seg in seg_cols else 0,
+)
 seg_col = seg_cols[seg_name]
 
-values = sorted(df[seg_col].dropna().unique().tolist())
-seg_value = st.selectbox(f"Choose a {seg_name} to analyze:", values)
+values = distinct(seg_col, filters=global_filters)
+mode = st.radio("Mode:", ["Single segment", "Compare segments"], horizontal=True)
+
+# ==========================
+# COMPARE MODE
+# ==========================
+if mode == "Compare segments":
+    compared = st.multiselect(f"Choose two or more {seg_name} values to compare:", values, default=values[:2])
+    metric_options = [
+        c for c in ["fee_loss", "hold_duration_days", "membership_fee", "age_at_hold", "avg_hold_contact"]
+        if c in columns
+    ]
+    category_options = [c for c in seg_cols.values() if c != seg_col] + [
+        c for c in ["application_contact_gender", "hold_duration_group"] if c in columns
+    ]
+    c1, c2 = st.columns(2)
+    metrics = c1.multiselect("Metrics:", metric_options, default=metric_options)
+    categories = c2.multiselect("Category mixes:", category_options, default=category_options)
+
+    if len(compared) < 2:
+        st.info("Pick at least two segment values to compare.")
+        st.stop()
+
+    summary, numeric_tests, category_tests, mix = compare_segments(
+        seg_col, compared, metrics, categories, filters=global_filters
+    )
+
+    st.markdown(f"## ⚖️ Comparing {seg_name}: " + " vs ".join(f"**{v}**" for v in compared))
+    st.caption(
+        "Welch t compares means, Mann–Whitney U compares distributions and chi-square compares category "
+        "mixes. P-values are Holm-adjusted for the number of tests; significant means adjusted p < 0.05."
+    )
+
+    if metrics:
+        st.markdown("### 📋 Metric Summary")
+        st.dataframe(
+            summary.pivot(index="metric", columns=seg_col, values="mean").round(2),
+            use_container_width=True,
+        )
+
+        fig_means = px.bar(
+            summary,
+            x="metric",
+            y="mean",
+            color=seg_col,
+            barmode="group",
+            hover_data=["n", "median", "std"],
+            title=f"Mean of Each Metric by {seg_name}",
+            labels={"metric": "Metric", "mean": "Mean", seg_col: seg_name},
+            color_discrete_sequence=px.colors.sequential.Reds[::-1],
+        )
+        st.plotly_chart(fig_means, use_container_width=True)
 
-sub = df[df[seg_col] == seg_value]
+    if len(numeric_tests):
+        st.markdown("### 🧪 Metric Tests (Welch t, Mann–Whitney U)")
+        st.dataframe(numeric_tests, use_container_width=True, hide_index=True)
+        n_sig = int(numeric_tests["significant"].sum())
+        st.info(f"📌 **{n_sig}** of {len(numeric_tests)} segment-pair × metric comparisons differ significantly.")
+
+    if len(category_tests):
+        st.markdown("### 🧮 Category Mix Tests (Chi-square)")
+        st.dataframe(category_tests, use_container_width=True, hide_index=True)
+
+        mix_col = st.selectbox("Show mix of:", category_tests["category"].tolist())
+        mix_view = mix[mix["category"] == mix_col]
+        fig_mix = px.histogram(
+            mix_view,
+            x=seg_col,
+            y="rows",
+            color="value",
+            barnorm="percent",
+            title=f"{mix_col} Mix by {seg_name}",
+            labels={seg_col: seg_name, "value": mix_col},
+            color_discrete_sequence=px.colors.sequential.Reds[::-1],
+        )
+        fig_mix.update_layout(yaxis_title="Share of Holds (%)")
+        st.plotly_chart(fig_mix, use_container_width=True)
+
+    st.stop()
+
+# ==========================
+# SINGLE SEGMENT
+# ==========================
+linked_values = [v for v in values if seg_name == linked_seg and str(v) == st.query_params.get("value")]
+seg_value = st.selectbox(
+    f"Choose a {seg_name} to analyze:", values, index=values.index(linked_values[0]) if linked_values else 0
+)
+
+# Rows come straight from the segment's slice of the offsets index, no scan;
+# only the columns charted below are fetched
+sub = take_rows(
+    segment_rows(seg_col, seg_value, global_filters),
+    [c for c in ["fee_loss", "hold_duration_days", "membership_fee", "hold_duration_group", "cluster_label"] if c in columns],
+)
 
 st.markdown(f"## 📌 Segment: {seg_name} = **{seg_value}**")
 
+# 95% bootstrap intervals for every value of the segment dimension at once
+ci_values = [c for c in ["fee_loss", "hold_duration_days"] if c in columns]
+seg_ci = bootstrap_ci([seg_col], ci_values, filters=global_filters)
+seg_row = seg_ci[seg_ci[seg_col] == seg_value].iloc[0]
+
 c1, c2, c3 = st.columns(3)
 c1.metric("Members in Segment", f"{len(sub):,}")
 if "fee_loss" in sub.columns:
     c2.metric("Total Fee Loss", f"${sub['fee_loss'].sum():,.0f}")
+    c2.caption(f"95% CI ${seg_row['fee_loss_sum_lo']:,.0f} – ${seg_row['fee_loss_sum_hi']:,.0f}")
 if "hold_duration_days" in sub.columns:
     c3.metric("Avg Hold Duration", f"{sub['hold_duration_days'].mean():.1f} days")
+    c3.caption(f"95% CI {seg_row['hold_duration_days_mean_lo']:.1f} – {seg_row['hold_duration_days_mean_hi']:.1f} days")
+
+if "fee_loss" in ci_values:
+    st.markdown(f"### 📏 Avg Fee Loss per Hold Across {seg_name}")
+    compare = with_error_bars(seg_ci, "fee_loss_mean")
+    compare["segment"] = (compare[seg_col] == seg_value).map({True: "Selected", False: "Other"})
+    fig_compare = px.bar(
+        compare.sort_values("fee_loss_mean", ascending=False),
+        x=seg_col,
+        y="fee_loss_mean",
+        error_y="fee_loss_mean_err_plus",
+        error_y_minus="fee_loss_mean_err_minus",
+        color="segment",
+        color_discrete_map={"Selected": "#8b0000", "Other": "#ffb3b3"},
+        hover_data={"rows": True},
+        title=f"Avg Fee Loss per Hold by {seg_name} (95% CI)",
+        labels={seg_col: seg_name, "fee_loss_mean": "Avg Fee Loss", "segment": ""},
+    )
+    fig_compare.update_layout(xaxis_tickangle=-35)
+    st.plotly_chart(fig_compare, use_container_width=True)
+    st.caption("Overlapping intervals mean the difference between segments may be noise.")
 
 st.markdown("### 💳 Membership Fee & Fee Loss (If Available)")
 if "membership_fee" in sub.columns and "fee_loss" in sub.columns:
@@ -83,5 +204,5 @@ if "cluster_label" in sub.columns:
     )
     st.plotly_chart(fig_cl, use_container_width=True)
 
-st.markdown("### 🧾 Sample Records")
-st.dataframe(sub.head(50), use_container_width=True)
+st.markdown("### 🧾 Segment Records")
+render_record_browser("segment_deep_dive", combine_filters(global_filters, {seg_col: [seg_value]}))
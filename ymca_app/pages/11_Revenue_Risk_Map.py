@@ -1,33 +1,26 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from pathlib import Path
+from utils.aggregates import aggregate, dataset_columns
+from utils.bootstrap import bootstrap_ci, with_error_bars
+from utils.filters import render_global_filters
+from utils.sketches import quantiles
 
 st.markdown(
     "<h1 style='color:#8b0000;'>🗺 Revenue at Risk by Location</h1>",
     unsafe_allow_html=True
 )
 
-@st.cache_data
-def load_data():
-    here = Path(__file__).resolve()
-    base_dir = here.parent.parent
-    excel_path = base_dir / "ymca_clusters.xlsx"
-    df = pd.read_excel(excel_path, engine="openpyxl")
-    return df
+# Only aggregates are materialized (works in out-of-core mode too)
+columns = dataset_columns()
+global_filters = render_global_filters()
 
-df = load_data()
-
-if "fee_loss" not in df.columns or "membership_location" not in df.columns:
+if "fee_loss" not in columns or "membership_location" not in columns:
     st.error("Need 'fee_loss' and 'membership_location' columns.")
     st.stop()
 
-loc_summary = (
-    df.groupby("membership_location")[["fee_loss", "hold_duration_days"]]
-    .agg(["sum", "mean", "count"])
-)
-loc_summary.columns = [f"{a}_{b}" for a, b in loc_summary.columns.to_flat_index()]
-loc_summary = loc_summary.reset_index()
+loc_summary = aggregate(
+    ["membership_location"], ["fee_loss", "hold_duration_days"], ["sum", "mean", "count"], filters=global_filters
+).drop(columns="rows")
 
 # Risk bucket
 q = loc_summary["fee_loss_sum"].quantile([0.33, 0.66]).values
@@ -41,16 +34,48 @@ def bucket(x):
 
 loc_summary["risk_level"] = loc_summary["fee_loss_sum"].apply(bucket)
 
+# 95% bootstrap intervals; a location whose interval spans several risk levels
+# is ranked on noise, so the table shows the range of levels the interval covers
+loc_ci = bootstrap_ci(["membership_location"], ["fee_loss"], filters=global_filters)
+loc_summary = loc_summary.merge(
+    with_error_bars(loc_ci, "fee_loss_sum")[
+        ["membership_location", "fee_loss_sum_lo", "fee_loss_sum_hi", "fee_loss_sum_err_plus", "fee_loss_sum_err_minus"]
+    ],
+    on="membership_location",
+)
+risk_lo = loc_summary["fee_loss_sum_lo"].apply(bucket)
+risk_hi = loc_summary["fee_loss_sum_hi"].apply(bucket)
+loc_summary["risk_level_ci"] = risk_lo.where(risk_lo == risk_hi, risk_lo + "–" + risk_hi)
+
+# Approximate P50 / P90 / P99 merged from the quantile sketches
+for col in ["hold_duration_days", "fee_loss"]:
+    if col in columns:
+        loc_summary = loc_summary.merge(
+            quantiles(["membership_location"], col, filters=global_filters).round(1),
+            on="membership_location",
+            how="left",
+        )
+
 st.markdown("### 📊 Location Risk Table")
-st.dataframe(loc_summary, use_container_width=True)
+st.dataframe(
+    loc_summary.drop(columns=["fee_loss_sum_err_plus", "fee_loss_sum_err_minus"]), use_container_width=True
+)
+
+uncertain = loc_summary.loc[loc_summary["risk_level_ci"] != loc_summary["risk_level"], "membership_location"]
+if len(uncertain):
+    st.caption(
+        f"⚠️ The risk level of {', '.join(uncertain)} is uncertain: its 95% interval spans several levels."
+    )
 
 st.markdown("### 💰 Total Fee Loss by Location")
 fig = px.bar(
     loc_summary.sort_values("fee_loss_sum", ascending=False),
     x="membership_location",
     y="fee_loss_sum",
+    error_y="fee_loss_sum_err_plus",
+    error_y_minus="fee_loss_sum_err_minus",
     color="risk_level",
-    title="Total Fee Loss & Risk Level by Location",
+    title="Total Fee Loss & Risk Level by Location (95% CI)",
 )
 fig.update_layout(xaxis_tickangle=-35, yaxis_title="Total Fee Loss")
 st.plotly_chart(fig, use_container_width=True)
@@ -67,3 +92,26 @@ fig2 = px.scatter(
     labels={"hold_duration_days_mean": "Avg Hold Duration (Days)", "fee_loss_sum": "Total Fee Loss"}
 )
 st.plotly_chart(fig2, use_container_width=True)
+
+if "hold_duration_days_p50" in loc_summary.columns:
+    st.markdown("### 📐 Hold Duration Percentiles by Location")
+    pct_long = loc_summary.melt(
+        id_vars="membership_location",
+        value_vars=["hold_duration_days_p50", "hold_duration_days_p90", "hold_duration_days_p99"],
+        var_name="percentile",
+        value_name="days",
+    )
+    pct_long["percentile"] = pct_long["percentile"].str.rsplit("_", n=1).str[-1].str.upper()
+    fig3 = px.bar(
+        pct_long,
+        x="membership_location",
+        y="days",
+        color="percentile",
+        barmode="group",
+        title="Hold Duration P50 / P90 / P99 by Location",
+        labels={"membership_location": "Location", "days": "Hold Duration (Days)", "percentile": "Percentile"},
+        color_discrete_sequence=["#FFBABA", "#E34A33", "#8B0000"],
+    )
+    fig3.update_layout(xaxis_tickangle=-35)
+    st.plotly_chart(fig3, use_container_width=True)
+    st.caption("Percentiles are approximate (within 1% of the exact value); means hide the long tail of holds.")
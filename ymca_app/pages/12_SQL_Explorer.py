@@ -0,0 +1,75 @@
+import streamlit as st
+from utils.sql_engine import (
+    DEFAULT_ROW_CAP,
+    DEFAULT_TIMEOUT_S,
+    TABLE_NAME,
+    QueryError,
+    run_query,
+    table_schema,
+)
+
+st.markdown(
+    "<h1 style='color:#8b0000;'>🧮 SQL Explorer</h1>",
+    unsafe_allow_html=True
+)
+
+st.write(
+    f"Run ad-hoc SQL (joins, window functions, CTEs, filters) directly on the hold dataset. "
+    f"The data is available as the table **`{TABLE_NAME}`**. Queries are read-only."
+)
+st.caption("🌐 The global sidebar filters do not apply here; add a WHERE clause to narrow the data.")
+
+# ==========================
+# SCHEMA
+# ==========================
+with st.expander("📑 Table schema", expanded=False):
+    st.dataframe(table_schema(), use_container_width=True, hide_index=True)
+
+# ==========================
+# QUERY EDITOR
+# ==========================
+EXAMPLE_QUERY = f"""SELECT
+    membership_location,
+    hold_year,
+    COUNT(*)                     AS holds,
+    SUM(fee_loss)                AS total_fee_loss,
+    AVG(hold_duration_days)      AS avg_hold_days,
+    RANK() OVER (PARTITION BY hold_year ORDER BY SUM(fee_loss) DESC) AS loss_rank
+FROM {TABLE_NAME}
+GROUP BY membership_location, hold_year
+ORDER BY hold_year, loss_rank"""
+
+st.markdown("### ✍️ Query")
+
+sql = st.text_area("SQL:", value=EXAMPLE_QUERY, height=240)
+
+c1, c2 = st.columns(2)
+row_cap = c1.number_input("Max rows returned", min_value=10, max_value=100_000, value=DEFAULT_ROW_CAP, step=1_000)
+timeout_s = c2.slider("Timeout (seconds)", min_value=1, max_value=60, value=DEFAULT_TIMEOUT_S)
+
+if not st.button("▶️ Run query", type="primary"):
+    st.stop()
+
+# ==========================
+# RESULTS
+# ==========================
+try:
+    result, truncated = run_query(sql, row_cap=row_cap, timeout_s=timeout_s)
+except QueryError as e:
+    st.error(f"❌ {e}")
+    st.stop()
+
+st.markdown("### 📊 Result")
+st.write(f"📌 **{len(result):,}** rows returned.")
+if truncated:
+    st.warning(f"⚠️ Result truncated to the first {row_cap:,} rows. Add filters or aggregation to see everything.")
+
+st.dataframe(result, use_container_width=True)
+
+csv = result.to_csv(index=False).encode("utf-8")
+st.download_button(
+    label="📥 Download Result as CSV",
+    data=csv,
+    file_name="ymca_sql_result.csv",
+    mime="text/csv"
+)
@@ -0,0 +1,114 @@
+import streamlit as st
+import plotly.express as px
+from utils.aggregates import dataset_columns
+from utils.cohorts import COHORT_COLUMNS, cohort_matrix
+from utils.filters import render_global_filters
+
+st.markdown(
+    "<h1 style='color:#8b0000;'>🧫 Hold Cohort Analysis</h1>",
+    unsafe_allow_html=True
+)
+
+st.write(
+    "Holds are grouped into cohorts by the month they started. Each cohort's hold days and fee loss "
+    "are spread over the months the holds stay active, showing how cohorts accrue losses over time."
+)
+
+# Only the cohort matrix is materialized (works in out-of-core mode too)
+columns = dataset_columns()
+global_filters = render_global_filters()
+
+missing = [c for c in COHORT_COLUMNS if c not in columns]
+if missing:
+    st.error(f"Need {', '.join(missing)} to build hold cohorts.")
+    st.stop()
+
+matrix = cohort_matrix(global_filters)
+if matrix.empty:
+    st.warning("No holds with a start date to build cohorts from.")
+    st.stop()
+
+# ==========================
+# CONTROLS
+# ==========================
+METRICS = {
+    "Active Holds": "active_holds",
+    "Cumulative Holds Ended": "cum_ended_holds",
+    "Cumulative Hold Days": "cum_hold_days",
+    "Cumulative Fee Loss": "cum_fee_loss",
+    "Hold Days in Month": "hold_days",
+    "Fee Loss in Month": "fee_loss",
+}
+
+c1, c2, c3 = st.columns([2, 1, 1])
+metric_label = c1.selectbox("Cohort metric:", list(METRICS.keys()), index=3)
+metric = METRICS[metric_label]
+per_hold = c2.radio("Show as:", ["Total", "Per hold in cohort"], index=0)
+oldest_age = max(1, int(matrix["months_since_start"].max()))
+max_age = c3.slider("Months since start", min_value=1, max_value=oldest_age, value=min(12, oldest_age))
+
+view = matrix[matrix["months_since_start"] <= max_age].copy()
+if per_hold == "Per hold in cohort":
+    # For active / ended holds this is the share of the cohort still on hold / done
+    view["value"] = view[metric] / view["cohort_holds"]
+else:
+    view["value"] = view[metric]
+
+# ==========================
+# COHORT KPIs
+# ==========================
+sizes = matrix.groupby("cohort")["cohort_holds"].first()
+k1, k2, k3 = st.columns(3)
+k1.metric("Cohorts", f"{len(sizes):,}")
+k2.metric("Median Cohort Size", f"{sizes.median():,.0f} holds")
+k3.metric("Largest Cohort", f"{sizes.idxmax()} ({sizes.max():,})")
+
+st.markdown("<hr>", unsafe_allow_html=True)
+
+# ==========================
+# COHORT MATRIX HEATMAP
+# ==========================
+st.markdown(f"### 🌡 {metric_label} by Cohort and Months Since Start")
+
+pivot = view.pivot(index="cohort", columns="months_since_start", values="value").sort_index()
+fig_heat = px.imshow(
+    pivot,
+    aspect="auto",
+    labels=dict(x="Months Since Start", y="Start Month Cohort", color=metric_label),
+    color_continuous_scale="Reds",
+)
+fig_heat.update_layout(height=max(450, 18 * len(pivot)))
+st.plotly_chart(fig_heat, use_container_width=True)
+
+# ==========================
+# COHORT CURVES
+# ==========================
+st.markdown("### 📈 Cohort Curves")
+
+cohort_list = pivot.index.tolist()
+default_cohorts = cohort_list[:: max(1, len(cohort_list) // 6)][:6]
+selected_cohorts = st.multiselect("Cohorts to compare:", cohort_list, default=default_cohorts)
+
+if selected_cohorts:
+    fig_line = px.line(
+        view[view["cohort"].isin(selected_cohorts)],
+        x="months_since_start",
+        y="value",
+        color="cohort",
+        markers=True,
+        labels={"months_since_start": "Months Since Start", "value": metric_label, "cohort": "Cohort"},
+        title=f"{metric_label} Over Cohort Tenure",
+    )
+    st.plotly_chart(fig_line, use_container_width=True)
+
+# ==========================
+# MATRIX TABLE
+# ==========================
+with st.expander("📋 Cohort matrix table"):
+    st.dataframe(pivot.round(2), use_container_width=True)
+    st.download_button(
+        label="📥 Download Cohort Matrix (CSV)",
+        data=matrix.to_csv(index=False).encode("utf-8"),
+        file_name="ymca_hold_cohorts.csv",
+        mime="text/csv",
+    )
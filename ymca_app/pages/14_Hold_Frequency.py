@@ -0,0 +1,130 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from utils.filters import render_global_filters
+from utils.members import FREQUENCY_SEGMENTS, member_holds, member_key_columns, member_table, members_in
+from utils.selection import filter_index
+
+st.markdown(
+    "<h1 style='color:#8b0000;'>🔁 Hold Frequency by Member</h1>",
+    unsafe_allow_html=True
+)
+
+st.write("How often do members put their membership on hold, and how long do they stay active in between?")
+
+# ==========================
+# MEMBER TABLE
+# ==========================
+global_filters = render_global_filters()
+members = member_table()
+if global_filters:
+    # Members with at least one hold in the global selection
+    members = members.iloc[members_in(filter_index(global_filters))]
+
+key_cols, is_proxy = member_key_columns(members.columns)
+if is_proxy:
+    st.caption(
+        "ℹ️ The dataset has no member id, so members are approximated by location, gender, "
+        "average hold length and birth year. Counts are estimates."
+    )
+
+# ==========================
+# KPIs
+# ==========================
+repeat = members["holds"] > 1
+k1, k2, k3, k4 = st.columns(4)
+k1.metric("Members", f"{len(members):,}")
+k2.metric("Avg Holds per Member", f"{members['holds'].mean():.2f}")
+k3.metric("Repeat Holders", f"{repeat.mean() * 100:.1f}%")
+k4.metric("Median Gap Between Holds", f"{members.loc[repeat, 'mean_gap_days'].median():.0f} days")
+
+st.markdown("<hr>", unsafe_allow_html=True)
+
+# ==========================
+# FREQUENCY SEGMENTS
+# ==========================
+st.markdown("### 📊 Members by Hold Frequency")
+
+segment_order = [label for _, label in FREQUENCY_SEGMENTS]
+seg_summary = (
+    members.groupby("frequency_segment")
+    .agg(
+        members=("member", "size"),
+        total_fee_loss=("total_fee_loss", "sum"),
+        avg_hold_days=("total_hold_days", "mean"),
+    )
+    .reindex(segment_order)
+    .dropna(how="all")
+    .reset_index()
+)
+seg_summary["fee_loss_share_%"] = (seg_summary["total_fee_loss"] / seg_summary["total_fee_loss"].sum() * 100).round(1)
+
+c1, c2 = st.columns(2)
+fig_seg = px.bar(
+    seg_summary,
+    x="frequency_segment",
+    y="members",
+    title="Members per Frequency Segment",
+    labels={"frequency_segment": "Hold Frequency", "members": "Members"},
+    color="members",
+    color_continuous_scale="Reds",
+)
+c1.plotly_chart(fig_seg, use_container_width=True)
+
+fig_loss = px.pie(
+    seg_summary,
+    names="frequency_segment",
+    values="total_fee_loss",
+    hole=0.5,
+    title="Share of Fee Loss by Frequency Segment",
+    color_discrete_sequence=px.colors.sequential.Reds[::-1],
+)
+c2.plotly_chart(fig_loss, use_container_width=True)
+
+st.dataframe(seg_summary.round(2), use_container_width=True, hide_index=True)
+
+top = seg_summary.sort_values("fee_loss_share_%", ascending=False).iloc[0]
+st.info(
+    f"📌 Members with **{top['frequency_segment']}** account for **{top['fee_loss_share_%']}%** "
+    f"of fee loss (${top['total_fee_loss']:,.0f})."
+)
+
+# ==========================
+# GAPS BETWEEN HOLDS
+# ==========================
+st.markdown("### ⏱ Days Active Between Holds (Repeat Holders)")
+
+fig_gap = px.histogram(
+    members[repeat],
+    x="mean_gap_days",
+    nbins=40,
+    title="Average Idle Days Between Consecutive Holds",
+    labels={"mean_gap_days": "Avg Days Between Holds"},
+    color_discrete_sequence=["#8B0000"],
+)
+st.plotly_chart(fig_gap, use_container_width=True)
+
+# ==========================
+# MEMBER DRILL-DOWN
+# ==========================
+st.markdown("### 🔎 Member Drill-Down")
+
+top_n = st.slider("Show top members by hold count", 10, 200, 25)
+top_members = members.nlargest(top_n, ["holds", "total_fee_loss"])
+st.dataframe(top_members, use_container_width=True, hide_index=True)
+
+member_choice = st.selectbox("Inspect member:", top_members["member"].tolist())
+if member_choice is not None:
+    # Holds come straight from the member -> hold-offsets index, no scan
+    holds = member_holds(member_choice)
+    fig_member = px.timeline(
+        holds.assign(end_date=holds["start_date"] + pd.to_timedelta(holds["hold_duration_days"], unit="D")),
+        x_start="start_date",
+        x_end="end_date",
+        y="reason_for_hold" if "reason_for_hold" in holds.columns else None,
+        color="fee_loss" if "fee_loss" in holds.columns else None,
+        color_continuous_scale="Reds",
+        title=f"Hold History of Member {member_choice}",
+    )
+    st.plotly_chart(fig_member, use_container_width=True)
+    st.dataframe(holds, use_container_width=True)
@@ -0,0 +1,132 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from utils.aggregates import aggregate, dataset_columns
+from utils.anomalies import MIN_HISTORY, THRESHOLD, WINDOW, anomaly_alerts, sync_anomalies
+from utils.filters import render_global_filters
+from utils.selection import DateRange
+
+st.markdown(
+    "<h1 style='color:#8b0000;'>🚨 Anomaly Alerts</h1>",
+    unsafe_allow_html=True
+)
+
+columns = dataset_columns()
+global_filters = render_global_filters()
+
+if "start_date" not in columns:
+    st.error("Need a 'start_date' column to track monthly anomalies.")
+    st.stop()
+
+# The monitor only reads rows added since the last dataset version
+monitor = sync_anomalies()
+alerts = anomaly_alerts()
+
+st.caption(
+    f"Monthly fee loss and hold counts per location and cluster are scored as each month closes, against the "
+    f"rolling median / MAD of the previous {WINDOW} months (flagged at a robust z-score of ±{THRESHOLD} once a "
+    f"series has {MIN_HISTORY} months of history). The EWMA z-score is shown alongside. The latest month stays "
+    f"open until a later month arrives."
+)
+
+c1, c2, c3 = st.columns(3)
+c1.metric("Alerts", f"{len(alerts):,}")
+c2.metric("Last Scored Month", monitor.last_closed.strftime("%b %Y") if monitor.last_closed is not None else "–")
+open_from = monitor.open_from()
+c3.metric("Open Month", open_from.strftime("%b %Y") if open_from is not None else "–")
+if monitor.late_rows:
+    st.caption(f"⚠️ {monitor.late_rows:,} holds arrived after their month was scored and were not scored.")
+
+if alerts.empty:
+    st.success("✅ No anomalies detected.")
+    st.stop()
+
+# Series-level alerts follow the global filters on the alerted series and months
+for dimension, col in monitor.dimensions.items():
+    allowed = global_filters.get(col)
+    if isinstance(allowed, list) and allowed:
+        alerts = alerts[(alerts["dimension"] != dimension) | alerts["key"].isin(allowed)]
+dates = global_filters.get("start_date")
+if isinstance(dates, DateRange):
+    month_end = alerts["month"] + pd.offsets.MonthEnd(0)
+    alerts = alerts[(month_end >= pd.Timestamp(dates.start)) & (alerts["month"] <= pd.Timestamp(dates.end))]
+
+f1, f2, f3 = st.columns(3)
+dimensions = f1.multiselect("Dimension:", list(monitor.dimensions), default=list(monitor.dimensions))
+metrics = f2.multiselect("Metric:", ["fee_loss", "holds"], default=["fee_loss", "holds"])
+directions = f3.multiselect("Direction:", ["Spike", "Drop"], default=["Spike", "Drop"])
+alerts = alerts[
+    alerts["dimension"].isin(dimensions) & alerts["metric"].isin(metrics) & alerts["direction"].isin(directions)
+]
+
+if alerts.empty:
+    st.info("No alerts match the current filters.")
+    st.stop()
+
+st.markdown("### 📋 Alerts")
+st.dataframe(
+    # Keys mix location names and cluster labels; shown as text
+    alerts.assign(month=alerts["month"].dt.strftime("%Y-%m"), key=alerts["key"].astype(str)).round(2),
+    use_container_width=True,
+    hide_index=True,
+)
+
+fig_count = px.histogram(
+    alerts,
+    x="month",
+    color="direction",
+    title="Alerts per Month",
+    color_discrete_map={"Spike": "#8B0000", "Drop": "#ffb3b3"},
+)
+fig_count.update_layout(xaxis_title="Month", yaxis_title="Alerts", bargap=0.1)
+st.plotly_chart(fig_count, use_container_width=True)
+
+# ==========================
+# ALERTED SERIES
+# ==========================
+st.markdown("### 📈 Alerted Series")
+series = alerts[["dimension", "key"]].drop_duplicates()
+labels = [f"{d}: {k}" for d, k in zip(series["dimension"], series["key"])]
+choice = st.selectbox("Series:", range(len(series)), format_func=lambda i: labels[i])
+dimension, key = series.iloc[choice]
+col = monitor.dimensions[dimension]
+
+metric = st.radio("Show:", ["fee_loss", "holds"], horizontal=True)
+history = aggregate(["hold_year", "hold_month"], ["fee_loss"], ["sum"], filters={col: [key]})
+history["month"] = pd.to_datetime(dict(year=history["hold_year"], month=history["hold_month"], day=1))
+history = history.sort_values("month").rename(columns={"fee_loss_sum": "fee_loss", "rows": "holds"})
+
+flagged = alerts[(alerts["dimension"] == dimension) & (alerts["key"] == key) & (alerts["metric"] == metric)]
+fig_series = px.line(
+    history,
+    x="month",
+    y=metric,
+    markers=True,
+    title=f"Monthly {metric.replace('_', ' ').title()} – {dimension} {key}",
+    color_discrete_sequence=["#8B0000"],
+)
+fig_series.add_scatter(
+    x=flagged["month"],
+    y=flagged["value"],
+    mode="markers",
+    marker=dict(size=14, color="#ff4d4d", symbol="x"),
+    name="Anomaly",
+    customdata=flagged[["expected", "robust_z"]],
+    hovertemplate="%{x|%b %Y}: %{y:,.0f}<br>expected %{customdata[0]:,.0f} (z = %{customdata[1]:.1f})",
+)
+fig_series.update_layout(xaxis_title="Month", yaxis_title=metric.replace("_", " ").title())
+st.plotly_chart(fig_series, use_container_width=True)
+
+# ==========================
+# DRILL-DOWN LINKS
+# ==========================
+st.markdown("### 🔎 Drill Down")
+st.caption("Open an alerted series in Segment Deep Dive.")
+for (d, k), group in alerts.groupby(["dimension", "key"], sort=False):
+    latest = group["month"].max().strftime("%b %Y")
+    st.page_link(
+        "pages/10_Segment_Deep_Dive.py",
+        label=f"{d}: {k} — {len(group)} alert(s), latest {latest}",
+        icon="🔎",
+        query_params={"segment": d, "value": str(k)},
+    )
@@ -0,0 +1,84 @@
+import streamlit as st
+import plotly.express as px
+from utils.aggregates import dataset_columns
+from utils.drivers import NUMERIC_DRIVERS, PERMUTATION_REPEATS, TARGETS, driver_analysis
+from utils.filters import render_global_filters
+
+st.markdown(
+    "<h1 style='color:#8b0000;'>🧠 Fee Loss Driver Analysis</h1>",
+    unsafe_allow_html=True
+)
+
+columns = dataset_columns()
+render_global_filters()
+
+if "fee_loss" not in columns or "hold_duration_days" not in columns:
+    st.error("Need 'fee_loss' and 'hold_duration_days' columns to model drivers.")
+    st.stop()
+
+st.caption(
+    "A gradient-boosted tree model learns the target from every driver jointly, so each driver's effect is "
+    "measured with the others held fixed. The model is trained once per dataset version on all holds; "
+    "global filters do not apply to this page."
+)
+
+target = st.radio("Explain:", list(TARGETS), horizontal=True)
+result = driver_analysis(target)
+
+c1, c2, c3 = st.columns(3)
+c1.metric("Held-out R²", f"{result['r2_test']:.3f}")
+c2.metric("Holds Trained On", f"{result['train_rows']:,}")
+c3.metric(f"Average {target}", f"${result['baseline']:,.0f}" if target == "Fee Loss" else f"{result['baseline']:.1f}")
+
+# ==========================
+# PERMUTATION IMPORTANCE
+# ==========================
+st.markdown("### 🏆 Which Drivers Matter Most")
+importance = result["importance"]
+fig_imp = px.bar(
+    importance.sort_values("importance"),
+    x="importance",
+    y="driver",
+    orientation="h",
+    error_x="importance_std",
+    title=f"Permutation Importance for {target}",
+    labels={"importance": "Drop in Held-out R² When Shuffled", "driver": "Driver"},
+    color_discrete_sequence=["#8B0000"],
+)
+st.plotly_chart(fig_imp, use_container_width=True)
+st.caption(
+    f"Each driver is shuffled {PERMUTATION_REPEATS} times on {result['test_rows']:,} held-out holds; "
+    "the bar is the average loss of accuracy and the whisker its spread."
+)
+
+# ==========================
+# PARTIAL DEPENDENCE
+# ==========================
+st.markdown("### 📈 How Each Driver Moves the Prediction")
+pdp = result["partial_dependence"]
+shown = st.multiselect(
+    "Drivers:", importance["driver"].tolist(), default=importance["driver"].head(4).tolist()
+)
+
+numeric_labels = set(NUMERIC_DRIVERS)
+for i in range(0, len(shown), 2):
+    cols = st.columns(2)
+    for col, driver in zip(cols, shown[i:i + 2]):
+        curve = pdp[pdp["driver"] == driver]
+        if driver in numeric_labels:
+            fig = px.line(curve, x="value", y="prediction", markers=True, color_discrete_sequence=["#8B0000"])
+        else:
+            curve = curve.assign(value=curve["value"].astype(str))
+            fig = px.bar(curve, x="value", y="prediction", color_discrete_sequence=["#AA2B2B"])
+            fig.update_layout(xaxis_tickangle=-35)
+        fig.add_hline(y=result["baseline"], line_dash="dot", line_color="#999999")
+        fig.update_layout(title=driver, xaxis_title=driver, yaxis_title=f"Predicted {target}")
+        col.plotly_chart(fig, use_container_width=True)
+
+st.caption(
+    "Partial dependence: the model's average prediction when every hold is given that driver value. "
+    "The dotted line is the overall average."
+)
+
+with st.expander("Importance table"):
+    st.dataframe(importance.round(4), use_container_width=True, hide_index=True)
@@ -1,7 +1,24 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from pathlib import Path
+import plotly.graph_objects as go
+from utils.aggregates import aggregate, dataset_columns, distinct, take_rows
+from utils.data_quality import data_quality_report
+from utils.figure_cache import cached_figure
+from utils.filters import render_global_filters
+from utils.outliers import (
+    FOREST_CONTAMINATION,
+    PAGE_SIZE as OUTLIER_PAGE_SIZE,
+    ROBUST_Z_THRESHOLD,
+    box_stats,
+    outlier_metrics,
+    outlier_summary,
+    top_outliers,
+)
+from utils.progressive import ProgressiveCharts
+from utils.record_browser import render_record_browser
+from utils.result_cache import cached_result
+from utils.selection import combine_filters, filtered_data, selection_hash
 
 # ==========================
 # PAGE TITLE
@@ -17,98 +34,169 @@ st.write("Explore the cleaned & clustered YMCA dataset, check data quality, and
 # ==========================
 # LOAD DATA
 # ==========================
-@st.cache_data
-def load_data():
-    here = Path(__file__).resolve()
-    base_dir = here.parent.parent        # ymca_app/
-    excel_path = base_dir / "ymca_clusters.xlsx"
-    df = pd.read_excel(excel_path, engine="openpyxl")
-
-    # Convert date column if present
-    if "start_date" in df.columns:
-        df["start_date"] = pd.to_datetime(df["start_date"], errors="coerce")
+# Everything on this page starts from the sidebar's global filters. Columns are
+# fetched one at a time as a section needs them, never the whole frame.
+global_filters = render_global_filters()
+columns = dataset_columns()
+selection = selection_hash(global_filters)
 
-    return df
 
-df = load_data()
+def _column(col):
+    return filtered_data(global_filters, [col])[col]
 
 
 # ==========================
 # DETECT CLUSTER COLUMN
 # ==========================
 cluster_col = None
-for c in df.columns:
+for c in columns:
     if "cluster_label" in c.lower() or "cluster" in c.lower():
         cluster_col = c
         break
 
 
 # ==========================
-# 🔍 COLUMN EXPLORER
+# CACHED COLUMN PROFILES
 # ==========================
-st.markdown("### 🧠 Explore Any Column")
-
-column_choice = st.selectbox("Choose a column to inspect:", df.columns)
-col_data = df[column_choice]
-
-with st.expander("Column Summary", expanded=True):
-    st.write(f"**Data Type:** {col_data.dtype}")
-    st.write(f"**Unique Values:** {col_data.nunique()}")
-    st.write(f"**Missing Values:** {col_data.isnull().sum()}")
-    st.write("**Example Values:**")
-    st.write(col_data.dropna().unique()[:10])
-
-    # Auto visualization
-    if col_data.dtype == "object":
-        cat_df = col_data.fillna("Unknown").astype(str).value_counts().reset_index()
+def _column_profile(col):
+    col_data = _column(col)
+    return {
+        "dtype": str(col_data.dtype),
+        "is_object": col_data.dtype == "object",
+        "unique": col_data.nunique(),
+        "missing": col_data.isnull().sum(),
+        "examples": col_data.dropna().unique()[:10],
+    }
+
+
+def _column_figure(col, is_object):
+    if is_object:
+        cat_df = _column(col).fillna("Unknown").astype(str).value_counts().reset_index()
         cat_df.columns = ["Category", "Count"]
 
-        fig_auto = px.bar(
+        fig = px.bar(
             cat_df,
             x="Category",
             y="Count",
-            title=f"Distribution of {column_choice}",
+            title=f"Distribution of {col}",
             color_discrete_sequence=["#8B0000"]
         )
-        fig_auto.update_layout(xaxis_tickangle=-45)
-        st.plotly_chart(fig_auto, use_container_width=True)
+        fig.update_layout(xaxis_tickangle=-45)
+        return fig
 
-    else:
-        fig_auto = px.histogram(
-            df,
-            x=column_choice,
-            nbins=30,
-            title=f"Distribution of {column_choice}",
-            color_discrete_sequence=["#8B0000"]
+    return px.histogram(
+        _column(col).to_frame(),
+        x=col,
+        nbins=30,
+        title=f"Distribution of {col}",
+        color_discrete_sequence=["#8B0000"]
+    )
+
+
+def _schema():
+    rows = []
+    for col in columns:
+        values = _column(col)
+        present = values.dropna()
+        rows.append({
+            "Column": col,
+            "Datatype": str(values.dtype),
+            "Non-Null Count": len(present),
+            "Missing Count": len(values) - len(present),
+            "Missing %": round((len(values) - len(present)) / len(values) * 100, 2) if len(values) else 0.0,
+            "Unique Values": present.nunique(),
+            "Example Value": present.iloc[0] if len(present) else "",
+        })
+    return pd.DataFrame(rows)
+
+
+# ==========================
+# 🔍 COLUMN EXPLORER
+# ==========================
+# Fragment: picking another column reruns only this section
+@st.fragment
+def column_explorer():
+    st.markdown("### 🧠 Explore Any Column")
+
+    column_choice = st.selectbox("Choose a column to inspect:", columns)
+    profile = cached_result("column_profile", (column_choice, selection), lambda: _column_profile(column_choice))
+
+    with st.expander("Column Summary", expanded=True):
+        st.write(f"**Data Type:** {profile['dtype']}")
+        st.write(f"**Unique Values:** {profile['unique']}")
+        st.write(f"**Missing Values:** {profile['missing']}")
+        st.write("**Example Values:**")
+        st.write(profile["examples"])
+
+        # Auto visualization
+        fig_auto = cached_figure(
+            "data_overview",
+            "column_distribution",
+            (column_choice, selection),
+            lambda: _column_figure(column_choice, profile["is_object"]),
         )
         st.plotly_chart(fig_auto, use_container_width=True)
 
 
+column_explorer()
+
 st.markdown("<hr>", unsafe_allow_html=True)
 
 
 # ==========================
 # DATA DICTIONARY
 # ==========================
-st.markdown("### 📑 Data Dictionary")
-
-schema = pd.DataFrame({
-    "Column": df.columns,
-    "Datatype": df.dtypes.astype(str),
-    "Non-Null Count": df.notnull().sum().values,
-    "Missing Count": df.isnull().sum().values,
-    "Missing %": (df.isnull().sum().values / len(df) * 100).round(2),
-    "Unique Values": [df[col].nunique() for col in df.columns],
-    "Example Value": [df[col].dropna().iloc[0] if df[col].notna().any() else "" for col in df.columns]
-})
-
-search_term = st.text_input("🔎 Search column name (optional):")
-if search_term.strip():
-    schema_filtered = schema[schema["Column"].str.contains(search_term.strip(), case=False)]
+# Fragment: typing in the search box reruns only the dictionary table
+@st.fragment
+def data_dictionary():
+    st.markdown("### 📑 Data Dictionary")
+
+    schema = cached_result("data_dictionary", (selection,), _schema)
+
+    search_term = st.text_input("🔎 Search column name (optional):")
+    if search_term.strip():
+        schema_filtered = schema[schema["Column"].str.contains(search_term.strip(), case=False)]
+    else:
+        schema_filtered = schema
+
+    st.dataframe(schema_filtered, use_container_width=True)
+
+
+data_dictionary()
+st.markdown("<hr>", unsafe_allow_html=True)
+
+
+# ==========================
+# DATA QUALITY RULES
+# ==========================
+# Rules run over the whole dataset (not the filters) once per dataset version
+st.markdown("### 🩺 Data Quality Rules")
+
+quality, violation_rows = data_quality_report()
+failing = quality[quality["violations"] > 0]
+
+q1, q2, q3 = st.columns(3)
+q1.metric("Rules Checked", len(quality))
+q2.metric("Rules Failing", len(failing))
+q3.metric(
+    "Records with Violations",
+    f"{quality.attrs['rows_with_violations']:,}",
+    f"{quality.attrs['rows_with_violations'] / max(quality.attrs['rows'], 1) * 100:.1f}%",
+    delta_color="inverse",
+)
+
+st.dataframe(
+    quality.sort_values(["violations", "category"], ascending=[False, True]).round(2),
+    use_container_width=True,
+    hide_index=True,
+)
+
+if len(failing):
+    rule_choice = st.selectbox("Show violating records for:", failing["rule"].tolist())
+    st.dataframe(take_rows(violation_rows[rule_choice]), use_container_width=True)
 else:
-    schema_filtered = schema
+    st.success("✅ Every record passes every rule.")
 
-st.dataframe(schema_filtered, use_container_width=True)
 st.markdown("<hr>", unsafe_allow_html=True)
 
 
@@ -123,39 +211,39 @@ with st.expander("Click to expand filters", expanded=True):
 
     loc_sel = f1.multiselect(
         "Membership Location",
-        sorted(df["membership_location"].dropna().unique().tolist()),
-        default=sorted(df["membership_location"].dropna().unique().tolist())
+        distinct("membership_location", filters=global_filters),
+        default=distinct("membership_location", filters=global_filters)
     )
 
     pkg_sel = f2.multiselect(
         "Package Category",
-        sorted(df["application_package_category"].dropna().unique().tolist()),
-        default=sorted(df["application_package_category"].dropna().unique().tolist())
+        distinct("application_package_category", filters=global_filters),
+        default=distinct("application_package_category", filters=global_filters)
     )
 
     mtype_sel = f3.multiselect(
         "Membership Type",
-        sorted(df["application_subscription_membership_type"].dropna().unique().tolist()),
-        default=sorted(df["application_subscription_membership_type"].dropna().unique().tolist())
+        distinct("application_subscription_membership_type", filters=global_filters),
+        default=distinct("application_subscription_membership_type", filters=global_filters)
     )
 
     age_sel = f4.multiselect(
         "Age Category",
-        sorted(df["application_contact_age_category"].dropna().unique().tolist()),
-        default=sorted(df["application_contact_age_category"].dropna().unique().tolist())
+        distinct("application_contact_age_category", filters=global_filters),
+        default=distinct("application_contact_age_category", filters=global_filters)
     )
 
     reason_sel = f5.multiselect(
         "Reason for Hold",
-        sorted(df["reason_for_hold"].dropna().unique().tolist()),
-        default=sorted(df["reason_for_hold"].dropna().unique().tolist())
+        distinct("reason_for_hold", filters=global_filters),
+        default=distinct("reason_for_hold", filters=global_filters)
     )
 
     if cluster_col:
         cluster_sel = f6.multiselect(
             "Cluster",
-            sorted(df[cluster_col].dropna().unique().tolist()),
-            default=sorted(df[cluster_col].dropna().unique().tolist())
+            distinct(cluster_col, filters=global_filters),
+            default=distinct(cluster_col, filters=global_filters)
         )
     else:
         cluster_sel = None
@@ -164,16 +252,21 @@ with st.expander("Click to expand filters", expanded=True):
 # ==========================
 # APPLY FILTERS
 # ==========================
-df_filt = df.copy()
-
-df_filt = df_filt[df_filt["membership_location"].isin(loc_sel)]
-df_filt = df_filt[df_filt["application_package_category"].isin(pkg_sel)]
-df_filt = df_filt[df_filt["application_subscription_membership_type"].isin(mtype_sel)]
-df_filt = df_filt[df_filt["application_contact_age_category"].isin(age_sel)]
-df_filt = df_filt[df_filt["reason_for_hold"].isin(reason_sel)]
+page_filters = {
+    "membership_location": loc_sel,
+    "application_package_category": pkg_sel,
+    "application_subscription_membership_type": mtype_sel,
+    "application_contact_age_category": age_sel,
+    "reason_for_hold": reason_sel,
+}
 
 if cluster_sel is not None and cluster_col is not None:
-    df_filt = df_filt[df_filt[cluster_col].isin(cluster_sel)]
+    page_filters[cluster_col] = cluster_sel
+
+# Row positions are cached per filter combination
+filters = combine_filters(global_filters, page_filters)
+chart_cols = [c for c in ["membership_location", "application_contact_age_category", "hold_duration_days"] if c in columns]
+df_filt = filtered_data(filters, chart_cols)
 
 st.write(f"📌 Showing **{len(df_filt):,}** records after filters.")
 st.markdown("<hr>", unsafe_allow_html=True)
@@ -186,10 +279,12 @@ st.markdown("### 🔢 Key Metrics (Filtered Subset)")
 
 k1, k2, k3, k4 = st.columns(4)
 
+totals = aggregate([], ["fee_loss", "hold_duration_days"], ["sum", "mean"], filters=filters).iloc[0]
+
 k1.metric("Total Records", f"{len(df_filt):,}")
-k2.metric("Unique Locations", df_filt["membership_location"].nunique())
-k3.metric("Total Fee Loss", f"${df_filt['fee_loss'].sum():,.0f}")
-k4.metric("Avg Hold Duration", f"{df_filt['hold_duration_days'].mean():.1f} days")
+k2.metric("Unique Locations", len(aggregate(["membership_location"], filters=filters)))
+k3.metric("Total Fee Loss", f"${totals['fee_loss_sum']:,.0f}")
+k4.metric("Avg Hold Duration", f"{totals['hold_duration_days_mean']:.1f} days")
 
 st.markdown("<hr>", unsafe_allow_html=True)
 
@@ -197,37 +292,44 @@ st.markdown("<hr>", unsafe_allow_html=True)
 # ==========================
 # SAMPLE DATA
 # ==========================
-st.markdown("### 🧾 Sample Data Preview (Filtered)")
-st.dataframe(df_filt.head(20), use_container_width=True)
+st.markdown("### 🧾 Record Browser (Filtered)")
+render_record_browser("data_overview", filters)
 st.markdown("<hr>", unsafe_allow_html=True)
 
+# Charts below stream into placeholders once built on the worker pool
+charts = ProgressiveCharts()
+
 
 # ==========================
 # FIXED LOCATION BAR CHART
 # ==========================
 st.markdown("### 🏢 Members by Location (Filtered)")
 
-loc_series = df_filt["membership_location"].fillna("Unknown").astype(str)
+def build_location_bar():
+    loc_series = df_filt["membership_location"].fillna("Unknown").astype(str)
 
-loc_counts = (
-    loc_series.value_counts()
-    .reset_index()
-)
+    loc_counts = (
+        loc_series.value_counts()
+        .reset_index()
+    )
 
-loc_counts.columns = ["Location", "Count"]
+    loc_counts.columns = ["Location", "Count"]
+
+    fig_loc = px.bar(
+        loc_counts,
+        x="Location",
+        y="Count",
+        text="Count",
+        title="Members per YMCA Location",
+        color="Count",
+        color_continuous_scale="Reds"
+    )
+
+    fig_loc.update_layout(xaxis_tickangle=-45)
+    return fig_loc
 
-fig_loc = px.bar(
-    loc_counts,
-    x="Location",
-    y="Count",
-    text="Count",
-    title="Members per YMCA Location",
-    color="Count",
-    color_continuous_scale="Reds"
-)
 
-fig_loc.update_layout(xaxis_tickangle=-45)
-st.plotly_chart(fig_loc, use_container_width=True)
+charts.add(build_location_bar)
 
 st.markdown("<hr>", unsafe_allow_html=True)
 
@@ -235,16 +337,15 @@ st.markdown("<hr>", unsafe_allow_html=True)
 # ==========================
 # AGE CATEGORY PIE
 # ==========================
-if "application_contact_age_category" in df_filt.columns:
+if "application_contact_age_category" in columns:
     st.markdown("### 🎂 Age Category Breakdown (Filtered)")
 
-    fig_age = px.pie(
+    charts.add(lambda: px.pie(
         df_filt,
         names="application_contact_age_category",
         title="Age Distribution",
         color_discrete_sequence=px.colors.sequential.Reds
-    )
-    st.plotly_chart(fig_age, use_container_width=True)
+    ))
 
     st.markdown("<hr>", unsafe_allow_html=True)
 
@@ -252,17 +353,16 @@ if "application_contact_age_category" in df_filt.columns:
 # ==========================
 # HOLD DURATION HISTOGRAM
 # ==========================
-if "hold_duration_days" in df_filt.columns:
+if "hold_duration_days" in columns:
     st.markdown("### ⏳ Hold Duration Distribution (Days)")
 
-    fig_hold = px.histogram(
+    charts.add(lambda: px.histogram(
         df_filt,
         x="hold_duration_days",
         nbins=30,
         title="Distribution of Hold Duration (Days)",
         color_discrete_sequence=["#8b0000"]
-    )
-    st.plotly_chart(fig_hold, use_container_width=True)
+    ))
 
     st.markdown("<hr>", unsafe_allow_html=True)
 
@@ -270,15 +370,85 @@ if "hold_duration_days" in df_filt.columns:
 # ==========================
 # MEMBERSHIP FEE BOXPLOT
 # ==========================
-if "membership_fee" in df_filt.columns:
+# Quartiles and whiskers are computed on the server; only the statistics are
+# sent to the browser, not every fee
+def build_box(value, title):
+    stats = box_stats(value, filters=filters)
+    fig = go.Figure()
+    if len(stats):
+        row = stats.iloc[0]
+        fig.add_trace(go.Box(
+            name=value,
+            q1=[row["q1"]],
+            median=[row["median"]],
+            q3=[row["q3"]],
+            lowerfence=[row["lowerfence"]],
+            upperfence=[row["upperfence"]],
+            mean=[row["mean"]],
+            marker_color="#8B0000",
+        ))
+        # Range beyond the whiskers, in place of one marker per outlier
+        fig.add_trace(go.Scatter(
+            x=[value, value],
+            y=[row["min"], row["max"]],
+            mode="markers",
+            marker=dict(color="#ff4d4d", symbol="line-ew-open", size=14),
+            name=f"min / max ({row['outliers']:,} outliers)",
+        ))
+    else:
+        # An empty box keeps the chart (and its axes) when nothing is selected
+        fig.add_trace(go.Box(name=value, y=[], marker_color="#8B0000"))
+    fig.update_layout(title=title)
+    return fig
+
+
+if "membership_fee" in columns:
     st.markdown("### 💳 Membership Fee Distribution")
 
-    fig_fee = px.box(
-        df_filt,
-        y="membership_fee",
-        title="Membership Fee Distribution (Box Plot)",
-        points="outliers"
-    )
-    st.plotly_chart(fig_fee, use_container_width=True)
+    charts.add(lambda: build_box("membership_fee", "Membership Fee Distribution (Box Plot)"))
+
+    st.markdown("<hr>", unsafe_allow_html=True)
+
+
+# ==========================
+# STREAM IN CHARTS
+# ==========================
+charts.render()
+
 
+# ==========================
+# OUTLIER DETECTION
+# ==========================
+metrics = outlier_metrics(columns)
+if metrics:
     st.markdown("<hr>", unsafe_allow_html=True)
+    st.markdown("### 🚩 Outlier Detection")
+    st.caption(
+        f"Every hold is scored by an Isolation Forest over {', '.join(metrics)} jointly (the most isolated "
+        f"{FOREST_CONTAMINATION:.0%} are flagged) and by robust z-scores against holds of the same membership "
+        f"type (flagged at |z| ≥ {ROBUST_Z_THRESHOLD})."
+    )
+
+    summary = outlier_summary(filters)
+    o1, o2, o3 = st.columns(3)
+    o1.metric("Isolation Forest Outliers", f"{summary['forest']:,}")
+    o2.metric("Robust Z Outliers", f"{summary['robust']:,}")
+    o3.metric("Flagged by Both", f"{summary['both']:,}")
+
+    st.markdown("#### 📐 Box Statistics (Filtered)")
+    st.dataframe(
+        pd.concat([box_stats(m, filters=filters).assign(metric=m) for m in metrics], ignore_index=True)
+        .set_index("metric")
+        .round(2),
+        use_container_width=True,
+    )
+
+    st.markdown("#### 🔝 Most Anomalous Holds")
+    n_pages = max(1, -(-summary["holds"] // OUTLIER_PAGE_SIZE))
+    page = st.number_input(f"Page (of {n_pages:,}):", min_value=1, max_value=n_pages, value=1, step=1)
+    detail_cols = [
+        c for c in ["membership_location", "application_subscription_membership_type", "reason_for_hold"]
+        if c in columns
+    ] + metrics
+    page_rows, _ = top_outliers(filters, page=page - 1, columns=detail_cols)
+    st.dataframe(page_rows.round(3), use_container_width=True, hide_index=True)
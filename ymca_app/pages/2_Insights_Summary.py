@@ -1,36 +1,35 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from pathlib import Path
 import numpy as np
+from utils.aggregates import aggregate, dataset_columns, distinct, rollup, sample
+from utils.bootstrap import bootstrap_ci, with_error_bars
+from utils.figure_cache import figure
+from utils.filters import cross_filter, cross_filter_key, render_cross_filter_status, render_global_filters
+from utils.insights import mine_insights
+from utils.progressive import ProgressiveCharts
+from utils.selection import combine_filters, freeze_filters
 
 st.markdown(
     "<h1 style='color:#8b0000;'>📊 Revenue & Hold Behaviour Insights</h1>",
     unsafe_allow_html=True
 )
 
+# Max points drawn in the fee loss vs hold duration scatter
+SCATTER_SAMPLE_ROWS = 50_000
+
 # ==========================
 # LOAD DATA
 # ==========================
-@st.cache_data
-def load_data():
-    here = Path(__file__).resolve()
-    base_dir = here.parent.parent
-    excel_path = base_dir / "ymca_clusters.xlsx"
-
-    df = pd.read_excel(excel_path, engine="openpyxl")
-
-    # Convert date column if present
-    if "start_date" in df.columns:
-        df["start_date"] = pd.to_datetime(df["start_date"], errors="coerce")
+# Only aggregates and samples are materialized (works in out-of-core mode too)
+columns = dataset_columns()
+global_filters = render_global_filters()
 
-    return df
-
-df = load_data()
+# KPIs and tables render immediately; charts stream into placeholders afterwards
+charts = ProgressiveCharts()
 
 # Detect cluster column
 cluster_col = None
-for c in df.columns:
+for c in columns:
     if "cluster" in c.lower():
         cluster_col = c
         break
@@ -40,26 +39,34 @@ for c in df.columns:
 # ==========================
 st.markdown("### 🔢 Key Revenue & Behaviour Metrics")
 
-total_fee_loss = df["fee_loss"].sum() if "fee_loss" in df.columns else np.nan
-avg_fee_loss = df["fee_loss"].mean() if "fee_loss" in df.columns else np.nan
-avg_hold_duration = df["hold_duration_days"].mean() if "hold_duration_days" in df.columns else np.nan
-total_members = len(df)
+kpi_values = [c for c in ["fee_loss", "hold_duration_days"] if c in columns]
+# Point estimates with 95% bootstrap intervals
+totals = bootstrap_ci([], kpi_values, filters=global_filters).iloc[0]
+
+total_fee_loss = totals["fee_loss_sum"] if "fee_loss" in columns else np.nan
+avg_fee_loss = totals["fee_loss_mean"] if "fee_loss" in columns else np.nan
+avg_hold_duration = totals["hold_duration_days_mean"] if "hold_duration_days" in columns else np.nan
+total_members = int(totals["rows"])
 
 col1, col2, col3, col4 = st.columns(4)
 
 col1.metric("Total Records", f"{total_members:,}")
 if not np.isnan(total_fee_loss):
     col2.metric("Total Fee Loss", f"${total_fee_loss:,.0f}")
+    col2.caption(f"95% CI ${totals['fee_loss_sum_lo']:,.0f} – ${totals['fee_loss_sum_hi']:,.0f}")
 else:
     col2.metric("Total Fee Loss", "N/A")
 
 if not np.isnan(avg_hold_duration):
     col3.metric("Avg Hold Duration", f"{avg_hold_duration:.1f} days")
+    col3.caption(
+        f"95% CI {totals['hold_duration_days_mean_lo']:.1f} – {totals['hold_duration_days_mean_hi']:.1f} days"
+    )
 else:
     col3.metric("Avg Hold Duration", "N/A")
 
 if cluster_col is not None:
-    col4.metric("Number of Clusters", df[cluster_col].nunique())
+    col4.metric("Number of Clusters", len(distinct(cluster_col, filters=global_filters)))
 else:
     col4.metric("Number of Clusters", "N/A")
 
@@ -73,23 +80,23 @@ st.markdown("### 🎛 Choose Dimension to Analyze")
 dimension_options = []
 col_map = {}
 
-if "membership_location" in df.columns:
+if "membership_location" in columns:
     dimension_options.append("Location")
     col_map["Location"] = "membership_location"
 
-if "application_contact_age_category" in df.columns:
+if "application_contact_age_category" in columns:
     dimension_options.append("Age Category")
     col_map["Age Category"] = "application_contact_age_category"
 
-if "application_package_category" in df.columns:
+if "application_package_category" in columns:
     dimension_options.append("Package Category")
     col_map["Package Category"] = "application_package_category"
 
-if "application_subscription_membership_type" in df.columns:
+if "application_subscription_membership_type" in columns:
     dimension_options.append("Membership Type")
     col_map["Membership Type"] = "application_subscription_membership_type"
 
-if "reason_for_hold" in df.columns:
+if "reason_for_hold" in columns:
     dimension_options.append("Reason for Hold")
     col_map["Reason for Hold"] = "reason_for_hold"
 
@@ -113,34 +120,60 @@ selected_dim_col = col_map[selected_dimension]
 
 top_n = dim_col2.slider("Top N Categories", min_value=3, max_value=15, value=8)
 
+# ==========================
+# CROSS-FILTER
+# ==========================
+# Bars selected on the fee loss chart narrow every chart below it. Tables are
+# rolled up from a small cube and row-level charts reuse cached bitmaps, so a
+# click never re-scans the raw rows.
+xf_chart = f"fee_loss_by_{selected_dim_col}"
+cross = cross_filter("insights", xf_chart, {"x": selected_dim_col}, filters=global_filters)
+page_filters = combine_filters(global_filters, cross)
+selection = freeze_filters(page_filters)
+
+cube_keys = list(dict.fromkeys(
+    [selected_dim_col, cluster_col, "reason_for_hold", "application_contact_age_category"]
+))
+cube_keys = [c for c in cube_keys if c is not None and c in columns]
+cube_values = [c for c in ["fee_loss", "hold_duration_days"] if c in columns]
+insights_cube = aggregate(cube_keys, cube_values, ["sum", "count"], filters=global_filters)
+
 st.markdown("<hr>", unsafe_allow_html=True)
 
 # ==========================
 # MAIN BAR: FEE LOSS BY DIMENSION
 # ==========================
-if "fee_loss" in df.columns:
+if "fee_loss" in columns:
     st.markdown(f"### 💰 Fee Loss by {selected_dimension}")
 
     dim_group = (
-        df.groupby(selected_dim_col)["fee_loss"]
-        .sum()
-        .reset_index()
+        with_error_bars(bootstrap_ci([selected_dim_col], ["fee_loss"], filters=global_filters), "fee_loss_sum")
+        .rename(columns={"fee_loss_sum": "fee_loss"})
+        [[selected_dim_col, "fee_loss", "fee_loss_sum_err_plus", "fee_loss_sum_err_minus"]]
         .sort_values("fee_loss", ascending=False)
         .head(top_n)
     )
 
-    fig_main = px.bar(
-        dim_group,
-        x=selected_dim_col,
-        y="fee_loss",
-        title=f"Total Fee Loss by {selected_dimension} (Top {top_n})",
-        labels={selected_dim_col: selected_dimension, "fee_loss": "Total Fee Loss"},
-        text_auto=".2s",
-        color="fee_loss",
-        color_continuous_scale="Reds"
-    )
-    fig_main.update_layout(xaxis_tickangle=-35)
-    st.plotly_chart(fig_main, use_container_width=True)
+    def build_main():
+        fig_main = px.bar(
+            dim_group,
+            x=selected_dim_col,
+            y="fee_loss",
+            error_y="fee_loss_sum_err_plus",
+            error_y_minus="fee_loss_sum_err_minus",
+            title=f"Total Fee Loss by {selected_dimension} (Top {top_n})",
+            labels={selected_dim_col: selected_dimension, "fee_loss": "Total Fee Loss"},
+            text_auto=".2s",
+            color="fee_loss",
+            color_continuous_scale="Reds"
+        )
+        fig_main.update_layout(xaxis_tickangle=-35)
+        return fig_main
+
+    st.caption("Error bars show 95% bootstrap confidence intervals.")
+
+    charts.add(build_main, on_select="rerun", key=cross_filter_key("insights", xf_chart))
+    render_cross_filter_status("insights", xf_chart, cross, {selected_dim_col: selected_dimension})
 
     # Simple narrative insight
     top_row = dim_group.iloc[0]
@@ -159,36 +192,27 @@ st.markdown("<hr>", unsafe_allow_html=True)
 # ==========================
 st.markdown(f"### 🍩 Distribution of Records by {selected_dimension}")
 
-cat_counts = df[selected_dim_col].value_counts().reset_index()
-cat_counts.columns = [selected_dimension, "Count"]
-
-fig_donut = px.pie(
-    cat_counts,
-    names=selected_dimension,
-    values="Count",
-    hole=0.5,
-    title=f"Share of Records by {selected_dimension}",
-    color_discrete_sequence=px.colors.sequential.Reds
-)
-st.plotly_chart(fig_donut, use_container_width=True)
+charts.add(lambda: figure("insights", "records_donut", selected_dim_col, selected_dimension, selection))
 
 st.markdown("<hr>", unsafe_allow_html=True)
 
 # ==========================
 # CLUSTER PERFORMANCE PANEL
 # ==========================
-if cluster_col is not None and "fee_loss" in df.columns and "hold_duration_days" in df.columns:
+if cluster_col is not None and "fee_loss" in columns and "hold_duration_days" in columns:
     st.markdown("### 🧩 Cluster Performance Overview")
 
-    cluster_summary = (
-        df.groupby(cluster_col)[["fee_loss", "hold_duration_days"]]
-        .agg(["mean", "sum", "count"])
+    cluster_summary = rollup(
+        insights_cube, [cluster_col], ["fee_loss", "hold_duration_days"], ["mean", "sum", "count"], filters=cross
+    ).drop(columns="rows")
+    cluster_ci = bootstrap_ci(
+        [cluster_col], ["fee_loss", "hold_duration_days"], filters=global_filters, within=cross
+    )
+    cluster_ci = with_error_bars(with_error_bars(cluster_ci, "fee_loss_sum"), "hold_duration_days_mean")
+    cluster_bars = cluster_summary.merge(
+        cluster_ci[[cluster_col] + [c for c in cluster_ci.columns if c.endswith(("_err_plus", "_err_minus"))]],
+        on=cluster_col,
     )
-    # flatten columns
-    cluster_summary.columns = [
-        f"{a}_{b}" for a, b in cluster_summary.columns.to_flat_index()
-    ]
-    cluster_summary = cluster_summary.reset_index()
 
     # Add % of total fee loss
     total_loss = cluster_summary["fee_loss_sum"].sum()
@@ -198,27 +222,29 @@ if cluster_col is not None and "fee_loss" in df.columns and "hold_duration_days"
 
     col_c1, col_c2 = st.columns(2)
 
-    fig_cluster_fee = px.bar(
-        cluster_summary,
+    charts.add(lambda: px.bar(
+        cluster_bars,
         x=cluster_col,
         y="fee_loss_sum",
+        error_y="fee_loss_sum_err_plus",
+        error_y_minus="fee_loss_sum_err_minus",
         title="Total Fee Loss by Cluster",
         labels={cluster_col: "Cluster", "fee_loss_sum": "Total Fee Loss"},
         text_auto=".2s",
         color="fee_loss_sum",
         color_continuous_scale="Reds"
-    )
-    col_c1.plotly_chart(fig_cluster_fee, use_container_width=True)
+    ), container=col_c1)
 
-    fig_cluster_hold = px.bar(
-        cluster_summary,
+    charts.add(lambda: px.bar(
+        cluster_bars,
         x=cluster_col,
         y="hold_duration_days_mean",
+        error_y="hold_duration_days_mean_err_plus",
+        error_y_minus="hold_duration_days_mean_err_minus",
         title="Average Hold Duration by Cluster",
         labels={cluster_col: "Cluster", "hold_duration_days_mean": "Avg Hold Duration (Days)"},
         text_auto=".1f"
-    )
-    col_c2.plotly_chart(fig_cluster_hold, use_container_width=True)
+    ), container=col_c2)
 
     # Insight
     worst_cluster = cluster_summary.sort_values("fee_loss_sum", ascending=False).iloc[0]
@@ -233,82 +259,110 @@ if cluster_col is not None and "fee_loss" in df.columns and "hold_duration_days"
 # ==========================
 # SCATTER: FEE LOSS VS HOLD DURATION
 # ==========================
-if "fee_loss" in df.columns and "hold_duration_days" in df.columns:
+if "fee_loss" in columns and "hold_duration_days" in columns:
     st.markdown("### 📈 Fee Loss vs Hold Duration")
 
-    if cluster_col is not None:
-        fig_scatter = px.scatter(
-            df,
-            x="hold_duration_days",
-            y="fee_loss",
-            color=cluster_col,
-            title="Fee Loss vs Hold Duration (Colored by Cluster)",
-            labels={"hold_duration_days": "Hold Duration (Days)", "fee_loss": "Fee Loss"},
-            opacity=0.7
-        )
-    else:
-        fig_scatter = px.scatter(
-            df,
+    def build_scatter():
+        scatter_cols = ["hold_duration_days", "fee_loss"] + ([cluster_col] if cluster_col is not None else [])
+        scatter_df = sample(scatter_cols, SCATTER_SAMPLE_ROWS, filters=page_filters)
+
+        if cluster_col is not None:
+            return px.scatter(
+                scatter_df,
+                x="hold_duration_days",
+                y="fee_loss",
+                color=cluster_col,
+                title="Fee Loss vs Hold Duration (Colored by Cluster)",
+                labels={"hold_duration_days": "Hold Duration (Days)", "fee_loss": "Fee Loss"},
+                opacity=0.7
+            )
+        return px.scatter(
+            scatter_df,
             x="hold_duration_days",
             y="fee_loss",
             title="Fee Loss vs Hold Duration",
             labels={"hold_duration_days": "Hold Duration (Days)", "fee_loss": "Fee Loss"},
             opacity=0.7
         )
-    st.plotly_chart(fig_scatter, use_container_width=True)
+
+    charts.add(build_scatter)
 
     st.markdown("<hr>", unsafe_allow_html=True)
 
 # ==========================
 # HOLD REASON vs AGE GROUP
 # ==========================
-if "reason_for_hold" in df.columns and "application_contact_age_category" in df.columns:
+if "reason_for_hold" in columns and "application_contact_age_category" in columns:
     st.markdown("### 🧠 Hold Reason by Age Group")
 
-    reason_age = (
-        df.groupby(["reason_for_hold", "application_contact_age_category"])
-        .size()
-        .reset_index(name="count")
-    )
+    def build_reason_age():
+        reason_age = rollup(insights_cube, ["reason_for_hold", "application_contact_age_category"], filters=cross).rename(
+            columns={"rows": "count"}
+        )
 
-    fig_reason_age = px.bar(
-        reason_age,
-        x="reason_for_hold",
-        y="count",
-        color="application_contact_age_category",
-        barmode="group",
-        title="Hold Reasons by Age Group",
-        labels={
-            "reason_for_hold": "Reason for Hold",
-            "count": "Number of Holds",
-            "application_contact_age_category": "Age Category",
-        }
-    )
-    fig_reason_age.update_layout(xaxis_tickangle=-35)
-    st.plotly_chart(fig_reason_age, use_container_width=True)
+        fig_reason_age = px.bar(
+            reason_age,
+            x="reason_for_hold",
+            y="count",
+            color="application_contact_age_category",
+            barmode="group",
+            title="Hold Reasons by Age Group",
+            labels={
+                "reason_for_hold": "Reason for Hold",
+                "count": "Number of Holds",
+                "application_contact_age_category": "Age Category",
+            }
+        )
+        fig_reason_age.update_layout(xaxis_tickangle=-35)
+        return fig_reason_age
+
+    charts.add(build_reason_age)
 
     st.markdown("<hr>", unsafe_allow_html=True)
 
 # ==========================
 # OPTIONAL: TREEMAP OF FEE LOSS
 # ==========================
-if "fee_loss" in df.columns and "membership_location" in df.columns and "application_contact_age_category" in df.columns:
+if "fee_loss" in columns and "membership_location" in columns and "application_contact_age_category" in columns:
     st.markdown("### 🌳 Fee Loss Treemap (Location + Age Category)")
 
-    treemap_df = (
-        df.groupby(["membership_location", "application_contact_age_category"])["fee_loss"]
-        .sum()
-        .reset_index()
-    )
+    charts.add(lambda: figure("insights", "fee_loss_treemap", selection))
 
-    fig_tree = px.treemap(
-        treemap_df,
-        path=["membership_location", "application_contact_age_category"],
-        values="fee_loss",
-        title="Fee Loss by Location and Age Category"
-    )
-    st.plotly_chart(fig_tree, use_container_width=True)
+    st.markdown("<hr>", unsafe_allow_html=True)
+
+# ==========================
+# MINED INSIGHTS
+# ==========================
+if "fee_loss" in columns:
+    st.markdown("### 🔍 Automatically Mined Insights")
+
+    mined = mine_insights(global_filters)
+    if mined.empty:
+        st.info("No segment has enough holds to report on.")
+    else:
+        st.caption(
+            f"Scanned {mined.attrs.get('segments_scanned', 0):,} segments across "
+            f"{mined.attrs.get('combinations', 0)} combinations of up to three dimensions; ranked by fee loss "
+            "above what the segment's size and its parts predict."
+        )
+        c1, c2 = st.columns([1, 2])
+        n_insights = c1.slider("Insights to show", 3, 30, 10)
+        orders = c2.multiselect("Combination size:", [1, 2, 3], default=[1, 2, 3])
+
+        shown = mined[mined["order"].isin(orders)].head(n_insights)
+        for i, text in enumerate(shown["insight"], start=1):
+            st.markdown(f"{i}. {text}")
+
+        with st.expander("📋 All mined segments"):
+            st.dataframe(mined.drop(columns="insight").round(3), use_container_width=True, hide_index=True)
+            st.download_button(
+                label="📥 Download Insights (CSV)",
+                data=mined.to_csv(index=False).encode("utf-8"),
+                file_name="ymca_mined_insights.csv",
+                mime="text/csv",
+            )
 
 # ==========================
-# END
+# STREAM IN CHARTS
 # ==========================
+charts.render()
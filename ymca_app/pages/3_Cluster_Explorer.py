@@ -1,6 +1,10 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
+from utils.aggregates import aggregate, dataset_schema, distinct
+from utils.filters import render_global_filters
+from utils.record_browser import render_record_browser
+from utils.result_cache import cached_result
+from utils.selection import combine_filters, filtered_data, selection_hash
 
 # -----------------------------
 # Page Config
@@ -15,16 +19,12 @@ st.title("🔍 Cluster Explorer")
 # -----------------------------
 # Load Excel
 # -----------------------------
-@st.cache_data
-def load_data():
-    df = pd.read_excel("ymca_app/ymca_clusters.xlsx")
-    return df
-
-df = load_data()
+global_filters = render_global_filters()
+schema = dataset_schema()
 
 st.success("📌 Excel Loaded Successfully")
 st.write(f"### Columns in dataset:")
-st.code(list(df.columns))
+st.code(list(schema.columns))
 
 # -----------------------------
 # Identify cluster column
@@ -32,7 +32,7 @@ st.code(list(df.columns))
 cluster_col = None
 possible = ["cluster_label", "cluster", "cluster_name"]
 
-for col in df.columns:
+for col in schema.columns:
     if col.lower() in possible:
         cluster_col = col
         break
@@ -46,99 +46,122 @@ st.success(f"🎯 Cluster Column Detected: **{cluster_col}**")
 # -----------------------------
 # Sidebar Cluster Filter
 # -----------------------------
-clusters = sorted(df[cluster_col].unique())
+clusters = distinct(cluster_col, filters=global_filters)
 cluster_choice = st.selectbox("Select Cluster:", clusters)
 
-filtered = df[df[cluster_col] == cluster_choice]
+# Cached row positions of the selected cluster; every section below reuses them
+# and fetches only the columns it shows
+cluster_filter = combine_filters(global_filters, {cluster_col: [cluster_choice]})
+cluster_rows = aggregate([], filters=cluster_filter)["rows"].iloc[0]
+
+numeric_cols = schema.select_dtypes(include=["float64", "int64"]).columns.tolist()
+all_cat_cols = schema.select_dtypes(include=["object"]).columns.tolist()
 
 st.subheader(f"📊 Cluster {cluster_choice} Summary")
 
-st.write("### Filtered Data Preview")
-st.dataframe(filtered.head(50), use_container_width=True)
+st.write("### Filtered Records")
+render_record_browser("cluster_explorer", cluster_filter)
 
 # -----------------------------
 # Numeric Summary
 # -----------------------------
-numeric_cols = filtered.select_dtypes(include=["float64", "int64"]).columns.tolist()
-
 if len(numeric_cols) > 0:
     st.write("### 📈 Numeric Feature Summary")
-    st.dataframe(filtered[numeric_cols].describe(), use_container_width=True)
+    describe = cached_result(
+        "cluster_describe",
+        (selection_hash(cluster_filter), tuple(numeric_cols)),
+        lambda: filtered_data(cluster_filter, numeric_cols).describe(),
+    )
+    st.dataframe(describe, use_container_width=True)
 else:
     st.warning("⚠️ No numeric columns found!")
 
+
 # -----------------------------
 # Category Breakdown (Bar Chart)
 # -----------------------------
-st.write("---")
-st.write("## 📊 Category Breakdown")
+# Each section below is a fragment: changing its widget reruns only that section
+@st.fragment
+def category_breakdown():
+    st.write("---")
+    st.write("## 📊 Category Breakdown")
 
-all_cat_cols = filtered.select_dtypes(include=["object"]).columns.tolist()
-selected_cat = st.selectbox("Break down by category:", all_cat_cols)
+    selected_cat = st.selectbox("Break down by category:", all_cat_cols)
 
-# ---- FIXED BAR CHART CODE ----
-cat_counts = (
-    filtered[selected_cat]
-    .fillna("Unknown")
-    .astype(str)
-    .value_counts()
-    .reset_index()
-)
+    # ---- FIXED BAR CHART CODE ----
+    cat_counts = (
+        aggregate([selected_cat], filters=cluster_filter)
+        .sort_values("rows", ascending=False)
+        .rename(columns={selected_cat: "category", "rows": "count"})
+    )
+    missing = cluster_rows - cat_counts["count"].sum()
+    if missing:
+        cat_counts.loc[len(cat_counts)] = ["Unknown", missing]
+    cat_counts["category"] = cat_counts["category"].astype(str)
+
+    fig = px.bar(
+        cat_counts,
+        x="category",
+        y="count",
+        title=f"{selected_cat} Distribution – Cluster {cluster_choice}",
+        color_discrete_sequence=["#AA2B2B"]
+    )
+    fig.update_layout(
+        xaxis_title=selected_cat,
+        yaxis_title="Count",
+        xaxis={'categoryorder':'total descending'}
+    )
 
-cat_counts.columns = ["category", "count"]
+    st.plotly_chart(fig, use_container_width=True)
 
-fig = px.bar(
-    cat_counts,
-    x="category",
-    y="count",
-    title=f"{selected_cat} Distribution – Cluster {cluster_choice}",
-    color_discrete_sequence=["#AA2B2B"]
-)
-fig.update_layout(
-    xaxis_title=selected_cat,
-    yaxis_title="Count",
-    xaxis={'categoryorder':'total descending'}
-)
-
-st.plotly_chart(fig, use_container_width=True)
 
 # -----------------------------
 # Numeric Visualizer
 # -----------------------------
-st.write("---")
-st.write("## 📈 Numeric Feature Visualizer")
+@st.fragment
+def numeric_visualizer():
+    st.write("---")
+    st.write("## 📈 Numeric Feature Visualizer")
 
-if len(numeric_cols) >= 2:
-    num_x = st.selectbox("Select X-Axis:", numeric_cols, key="x_axis")
-    num_y = st.selectbox("Select Y-Axis:", numeric_cols, key="y_axis")
+    if len(numeric_cols) >= 2:
+        num_x = st.selectbox("Select X-Axis:", numeric_cols, key="x_axis")
+        num_y = st.selectbox("Select Y-Axis:", numeric_cols, key="y_axis")
 
-    fig2 = px.scatter(
-        filtered,
-        x=num_x,
-        y=num_y,
-        color_discrete_sequence=["#AA2B2B"],
-        title=f"{num_x} vs {num_y} (Cluster {cluster_choice})",
-    )
+        fig2 = px.scatter(
+            filtered_data(cluster_filter, list(dict.fromkeys([num_x, num_y]))),
+            x=num_x,
+            y=num_y,
+            color_discrete_sequence=["#AA2B2B"],
+            title=f"{num_x} vs {num_y} (Cluster {cluster_choice})",
+        )
+
+        st.plotly_chart(fig2, use_container_width=True)
+    else:
+        st.warning("⚠️ Not enough numeric columns for scatter plot.")
 
-    st.plotly_chart(fig2, use_container_width=True)
-else:
-    st.warning("⚠️ Not enough numeric columns for scatter plot.")
 
 # -----------------------------
 # Histogram Section
 # -----------------------------
-st.write("---")
-st.write("## 📊 Numeric Histogram")
+@st.fragment
+def numeric_histogram():
+    st.write("---")
+    st.write("## 📊 Numeric Histogram")
 
-num_hist = st.selectbox("Select numeric column:", numeric_cols)
+    num_hist = st.selectbox("Select numeric column:", numeric_cols)
 
-fig3 = px.histogram(
-    filtered,
-    x=num_hist,
-    nbins=25,
-    color_discrete_sequence=["#AA2B2B"],
-    title=f"Histogram of {num_hist}"
-)
-st.plotly_chart(fig3, use_container_width=True)
+    fig3 = px.histogram(
+        filtered_data(cluster_filter, [num_hist]),
+        x=num_hist,
+        nbins=25,
+        color_discrete_sequence=["#AA2B2B"],
+        title=f"Histogram of {num_hist}"
+    )
+    st.plotly_chart(fig3, use_container_width=True)
+
+
+category_breakdown()
+numeric_visualizer()
+numeric_histogram()
 
 # End
@@ -1,6 +1,10 @@
 import streamlit as st
+import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
+import pandas as pd
+from utils.filters import render_global_filters
+from utils.policy import FAIRNESS_DIMENSIONS, hold_shares, policy_impact, policy_stats, search_policies
 
 st.markdown(
     "<h1 style='color:#8b0000;'>📉 Revenue Impact Simulator</h1>",
@@ -9,6 +13,10 @@ st.markdown(
 
 st.write("Use the controls below to explore how member hold behavior affects YMCA revenue.")
 
+global_filters = render_global_filters()
+# Duration histograms per (reason x age x location); every policy is scored from these
+stats = policy_stats(global_filters)
+total_loss = stats["loss"].sum()
 
 # ==========================
 # SECTION 1 — SIMPLE SLIDER
@@ -24,6 +32,12 @@ hold_threshold = st.slider(
 
 st.success(f"Current Threshold: **{hold_threshold} days**")
 
+threshold_recovered, _ = policy_impact(stats, hold_threshold, 0)
+st.info(
+    f"📌 Charging the full fee for hold days beyond **{hold_threshold} days** would recover "
+    f"**${threshold_recovered:,.0f}** ({threshold_recovered / max(total_loss, 1) * 100:.1f}% of fee loss)."
+)
+
 
 # ==========================
 # SECTION 2 — CIRCULAR GAUGE METER
@@ -96,3 +110,108 @@ st.plotly_chart(fig, use_container_width=True)
 st.info(
     f"📌 Revenue retained at **{dot_x} days hold** ≈ **{dot_y:.2f}%**"
 )
+
+
+# ==========================
+# SECTION 4 — HOLD POLICY OPTIMIZER
+# ==========================
+st.markdown("## 🧮 Hold Policy Optimizer")
+st.write(
+    "Search hold policies — a maximum hold length, a partial fee charged while on hold and reasons "
+    "exempt from the policy — for the best trade-off between recovered revenue and fairness. "
+    "Fairness is the largest gap (in percentage points) between an age category's or location's "
+    "share of the charges and its share of holds."
+)
+
+c1, c2 = st.columns(2)
+cap_range = c1.slider("Max hold days to try", 0, 365, (0, 180))
+cap_step = c1.number_input("Max hold days step", min_value=1, max_value=90, value=15)
+pct_range = c2.slider("Partial fee % to try", 0, 100, (0, 50))
+pct_step = c2.number_input("Partial fee % step", min_value=1, max_value=50, value=5)
+exemptable = st.multiselect(
+    "Reasons that may be exempted:",
+    stats["reasons"],
+    default=stats["reasons"],
+    help="Every combination of these reasons is tried as an exemption list.",
+)
+
+caps = list(range(cap_range[0], cap_range[1] + 1, int(cap_step)))
+pcts = list(range(pct_range[0], pct_range[1] + 1, int(pct_step)))
+n_candidates = len(caps) * len(pcts) * 2 ** len(exemptable)
+st.caption(f"{n_candidates:,} candidate policies")
+
+if st.button("🚀 Run optimizer"):
+    st.session_state["policy_search"] = (tuple(caps), tuple(pcts), tuple(exemptable))
+
+if "policy_search" in st.session_state:
+    caps, pcts, exemptable = st.session_state["policy_search"]
+    with st.spinner("Scoring candidate policies..."):
+        candidates = search_policies(caps, pcts, exemptable, filters=global_filters)
+    frontier = candidates[candidates["pareto"]].sort_values("recovered_revenue")
+
+    # Only a sample of the dominated policies is drawn; the frontier is always shown in full
+    background = candidates[~candidates["pareto"]]
+    background = background.sample(min(len(background), 5000), random_state=0)
+    fig_front = go.Figure()
+    fig_front.add_trace(go.Scattergl(
+        x=background["disparity"],
+        y=background["recovered_revenue"],
+        mode="markers",
+        marker=dict(size=4, color="#ffb3b3"),
+        name="Candidate policies",
+        hoverinfo="skip",
+    ))
+    fig_front.add_trace(go.Scatter(
+        x=frontier["disparity"],
+        y=frontier["recovered_revenue"],
+        mode="lines+markers",
+        marker=dict(size=9, color="#8B0000"),
+        name="Pareto frontier",
+        customdata=frontier[["max_hold_days", "partial_fee_pct", "exempt_reasons"]],
+        hovertemplate=(
+            "Max %{customdata[0]} days, %{customdata[1]}% fee<br>"
+            "Exempt: %{customdata[2]}<br>Recovered: $%{y:,.0f}<br>Disparity: %{x:.1f} pp<extra></extra>"
+        ),
+    ))
+    fig_front.update_layout(
+        title="Recovered Revenue vs Disparity",
+        xaxis_title="Disparity (pp)",
+        yaxis_title="Recovered Revenue ($)",
+    )
+    st.plotly_chart(fig_front, use_container_width=True)
+
+    st.markdown("### 🏅 Pareto-Optimal Policies")
+    st.dataframe(frontier.drop(columns="pareto").round(2), use_container_width=True, hide_index=True)
+
+    labels = [
+        f"{r.max_hold_days} days, {r.partial_fee_pct:g}% fee, exempt: {r.exempt_reasons}"
+        for r in frontier.itertuples()
+    ]
+    choice = st.selectbox("Inspect policy:", range(len(frontier)), format_func=lambda i: labels[i])
+    policy = frontier.iloc[choice]
+    exempt = [] if policy["exempt_reasons"] == "None" else policy["exempt_reasons"].split(", ")
+    recovered, shares = policy_impact(stats, policy["max_hold_days"], policy["partial_fee_pct"], exempt)
+    st.success(
+        f"Recovers **${recovered:,.0f}** ({recovered / max(total_loss, 1) * 100:.1f}% of fee loss) "
+        f"with a disparity of **{policy['disparity']:.1f} pp**."
+    )
+
+    baseline = hold_shares(stats)
+    cols = st.columns(len(FAIRNESS_DIMENSIONS))
+    for col, (label, (groups, _)) in zip(cols, FAIRNESS_DIMENSIONS.items()):
+        burden = pd.DataFrame({
+            label: np.repeat(stats[groups], 2),
+            "Share": np.ravel(np.column_stack([shares[label], baseline[label]])) * 100,
+            "Of": ["Charges", "Holds"] * len(stats[groups]),
+        })
+        fig_burden = px.bar(
+            burden,
+            x=label,
+            y="Share",
+            color="Of",
+            barmode="group",
+            title=f"Share of Charges vs Holds by {label}",
+            labels={"Share": "Share (%)"},
+            color_discrete_sequence=["#8B0000", "#ffb3b3"],
+        )
+        col.plotly_chart(fig_burden, use_container_width=True)
@@ -2,26 +2,24 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from pathlib import Path
+from utils.aggregates import dataset_columns, distinct
+from utils.cluster_diagnostics import cluster_diagnostics, cluster_embedding, embedding_density
+from utils.filters import render_global_filters
+from utils.selection import combine_filters, filtered_data
+from utils.sketches import SKETCH_VALUES, quantiles
 
 st.markdown(
     "<h1 style='color:#8b0000;'>🧬 Cluster Profiling Lab</h1>",
     unsafe_allow_html=True
 )
 
-@st.cache_data
-def load_data():
-    here = Path(__file__).resolve()
-    base_dir = here.parent.parent
-    excel_path = base_dir / "ymca_clusters.xlsx"
-    df = pd.read_excel(excel_path, engine="openpyxl")
-    return df
-
-df = load_data()
+# Hold records narrowed by the sidebar's global filters
+global_filters = render_global_filters()
+columns = dataset_columns()
 
 # Detect cluster column
 cluster_col = None
-for c in df.columns:
+for c in columns:
     if "cluster_label" in c.lower() or "cluster_name" in c.lower() or c.lower() == "cluster":
         cluster_col = c
         break
@@ -30,7 +28,7 @@ if not cluster_col:
     st.error("No cluster column found (cluster_label / cluster_name).")
     st.stop()
 
-clusters = sorted(df[cluster_col].dropna().unique().tolist())
+clusters = distinct(cluster_col, filters=global_filters)
 
 st.markdown("### 🎛 Cluster Selection")
 c1, c2 = st.columns([3, 1])
@@ -45,12 +43,10 @@ if not selected_clusters:
 
 compare_mode = c2.radio("Comparison mode:", ["Single view", "Compare all"], index=1)
 
-df_sel = df[df[cluster_col].isin(selected_clusters)]
-
 # Metrics to profile
 metric_cols = []
 for col in ["fee_loss", "hold_duration_days", "membership_fee", "avg_hold_contact", "age_at_hold"]:
-    if col in df.columns:
+    if col in columns:
         metric_cols.append(col)
 
 if not metric_cols:
@@ -60,40 +56,130 @@ if not metric_cols:
 # Cluster summary table
 st.markdown("### 📊 Cluster Summary Table")
 
+# Only the columns profiled below are fetched for the selected clusters
+selection_filters = combine_filters(global_filters, {cluster_col: selected_clusters})
+comp_cols = []
+if "application_contact_age_category" in columns:
+    comp_cols.append(("Age Category", "application_contact_age_category"))
+if "application_subscription_membership_type" in columns:
+    comp_cols.append(("Membership Type", "application_subscription_membership_type"))
+df_sel = filtered_data(selection_filters, [cluster_col] + metric_cols + [col for _, col in comp_cols])
+
 summary = df_sel.groupby(cluster_col)[metric_cols].agg(["mean", "sum", "count"])
 summary.columns = [f"{a}_{b}" for a, b in summary.columns.to_flat_index()]
 summary = summary.reset_index()
 
 st.dataframe(summary, use_container_width=True)
 
-# Radar chart for first selected cluster
-st.markdown("### 🕸 Radar Profile (First Selected Cluster)")
-first_cluster = selected_clusters[0]
-cluster_means = df.groupby(cluster_col)[metric_cols].mean()
+# Percentiles are merged from pre-built quantile sketches (no raw-row scan);
+# hold durations are heavily skewed, so the mean alone misleads
+st.markdown("### 📐 Cluster Percentiles (P50 / P90 / P99)")
+
+pct_values = [c for c in SKETCH_VALUES if c in columns]
+percentiles = None
+for col in pct_values:
+    q = quantiles([cluster_col], col, filters=selection_filters)
+    percentiles = q if percentiles is None else percentiles.merge(q, on=cluster_col, how="outer")
 
-values = cluster_means.loc[first_cluster].values.tolist()
-values.append(values[0])  # close loop
+if percentiles is not None:
+    st.dataframe(percentiles.round(1), use_container_width=True)
+    st.caption("Percentiles are approximate (within 1% of the exact value).")
 
-labels = metric_cols + [metric_cols[0]]
+# Radar of z-scored centroids: every metric in standard deviations from the
+# all-holds mean, so metrics in different units share one axis
+centroids, separation = cluster_diagnostics(
+    cluster_col, selected_clusters, filters=global_filters, features=metric_cols
+)
 
+st.markdown("### 🕸 Radar Profile (Z-Scored Centroids)")
+radar_colors = ["#8b0000", "#ff4d4d", "#ffb3b3", "#4a0000", "#e34a33"]
 fig_radar = go.Figure()
-fig_radar.add_trace(go.Scatterpolar(
-    r=values,
-    theta=labels,
-    fill='toself',
-    name=f"Cluster {first_cluster}",
-    line_color="#8b0000"
-))
+for i, row in centroids.iterrows():
+    values = [row[c] for c in metric_cols] + [row[metric_cols[0]]]
+    fig_radar.add_trace(go.Scatterpolar(
+        r=values,
+        theta=metric_cols + [metric_cols[0]],
+        fill='toself',
+        name=f"Cluster {row[cluster_col]}",
+        line_color=radar_colors[i % len(radar_colors)],
+        opacity=0.7,
+    ))
 fig_radar.update_layout(
-    showlegend=False,
-    polar=dict(radialaxis=dict(visible=True))
+    polar=dict(radialaxis=dict(visible=True, title="z-score"))
 )
 st.plotly_chart(fig_radar, use_container_width=True)
 
+# ==========================
+# CLUSTER DIAGNOSTICS
+# ==========================
+st.markdown("### 🧭 Cluster Separation Diagnostics")
+
+if len(separation):
+    d1, d2 = st.columns(2)
+    d1.metric(
+        "Silhouette (−1 to 1, higher is better)",
+        f"{separation['silhouette'].mean():.3f}",
+        help=f"Mean over {len(separation)} stratified samples of {separation['rows'].iloc[0]:,} holds",
+    )
+    d2.metric(
+        "Davies–Bouldin (lower is better)",
+        f"{separation['davies_bouldin'].mean():.3f}",
+        help=f"Mean over {len(separation)} stratified samples of {separation['rows'].iloc[0]:,} holds",
+    )
+    st.caption(
+        f"Scored on the standardized features ({', '.join(metric_cols)}). Spread across samples: "
+        f"silhouette ±{separation['silhouette'].std():.3f}, Davies–Bouldin ±{separation['davies_bouldin'].std():.3f}."
+    )
+else:
+    st.info("Select at least two clusters to score how well they are separated.")
+
+st.markdown("#### 📌 Z-Scored Centroids")
+fig_centroids = px.imshow(
+    centroids.set_index(cluster_col)[metric_cols].round(2),
+    text_auto=True,
+    aspect="auto",
+    color_continuous_scale="RdBu_r",
+    color_continuous_midpoint=0,
+    labels={"x": "Metric", "y": "Cluster", "color": "z-score"},
+)
+fig_centroids.update_yaxes(type="category")
+st.plotly_chart(fig_centroids, use_container_width=True)
+
+embedding = cluster_embedding(cluster_col, features=metric_cols)
+density = embedding_density(cluster_col, selected_clusters, filters=global_filters, features=metric_cols)
+explained = embedding["explained_variance_ratio"]
+
+st.markdown("#### 🗺 PCA Projection (Density-Binned)")
+fig_pca = px.scatter(
+    density.assign(**{cluster_col: density[cluster_col].astype(str)}),
+    x="pc1",
+    y="pc2",
+    size="holds",
+    color=cluster_col,
+    opacity=0.6,
+    size_max=18,
+    title=f"Holds in the First Two Principal Components ({explained.sum() * 100:.0f}% of variance)",
+    labels={
+        "pc1": f"PC1 ({explained[0] * 100:.0f}%)",
+        "pc2": f"PC2 ({explained[1] * 100:.0f}%)",
+        cluster_col: "Cluster",
+    },
+    color_discrete_sequence=radar_colors,
+)
+st.plotly_chart(fig_pca, use_container_width=True)
+st.caption(
+    "Each marker is a cell of an 80 × 80 grid over the projection, sized by its number of holds, "
+    "so the chart stays small however many holds there are."
+)
+
+loadings = pd.DataFrame(embedding["components"].T, index=metric_cols, columns=["PC1", "PC2"])
+with st.expander("Principal component loadings"):
+    st.dataframe(loadings.round(3), use_container_width=True)
+
 # Bar: total fee_loss vs hold_duration per cluster
 st.markdown("### 💰 Fee Loss & Hold Duration by Cluster")
 
-if "fee_loss" in df.columns and "hold_duration_days" in df.columns:
+if "fee_loss" in columns and "hold_duration_days" in columns:
     cluster_bar = (
         df_sel.groupby(cluster_col)[["fee_loss", "hold_duration_days"]]
         .mean()
@@ -113,12 +199,6 @@ if "fee_loss" in df.columns and "hold_duration_days" in df.columns:
 # Distribution by age category & membership type per cluster
 st.markdown("### 🧱 Composition by Age & Membership Type")
 
-comp_cols = []
-if "application_contact_age_category" in df.columns:
-    comp_cols.append(("Age Category", "application_contact_age_category"))
-if "application_subscription_membership_type" in df.columns:
-    comp_cols.append(("Membership Type", "application_subscription_membership_type"))
-
 for title, col in comp_cols:
     st.markdown(f"#### {title} Distribution (Selected Clusters)")
     comp = (
@@ -140,14 +220,20 @@ for title, col in comp_cols:
 st.markdown("### 🧠 Behaviour Insights (Auto-generated)")
 
 for cl in selected_clusters:
-    sub = df[df[cluster_col] == cl]
+    sub = df_sel[df_sel[cluster_col] == cl]
     size = len(sub)
     avg_hold = sub["hold_duration_days"].mean() if "hold_duration_days" in sub.columns else None
     avg_loss = sub["fee_loss"].mean() if "fee_loss" in sub.columns else None
+    median_hold = None
+    if percentiles is not None and "hold_duration_days_p50" in percentiles.columns:
+        median_hold = percentiles.loc[percentiles[cluster_col] == cl, "hold_duration_days_p50"]
+        median_hold = median_hold.iloc[0] if len(median_hold) else None
 
     desc = f"- **Cluster {cl}** → {size} records"
     if avg_hold is not None:
         desc += f", avg hold ≈ {avg_hold:.1f} days"
+    if median_hold is not None:
+        desc += f" (median ≈ {median_hold:.0f})"
     if avg_loss is not None:
         desc += f", avg fee loss ≈ ${avg_loss:,.0f}"
     st.write(desc)
@@ -1,49 +1,56 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from pathlib import Path
+import plotly.graph_objects as go
+from utils.aggregates import aggregate, dataset_columns, distinct, rollup
+from utils.figure_cache import figure
+from utils.filters import cross_filter, cross_filter_key, render_cross_filter_status, render_global_filters
+from utils.forecast import fee_loss_forecast
+from utils.selection import combine_filters, freeze_filters
+from utils.timeline import TIMELINE_COLUMNS, concurrent_holds
 
 st.markdown(
     "<h1 style='color:#8b0000;'>📆 Time & Seasonality Trends</h1>",
     unsafe_allow_html=True
 )
 
-@st.cache_data
-def load_data():
-    here = Path(__file__).resolve()
-    base_dir = here.parent.parent
-    excel_path = base_dir / "ymca_clusters.xlsx"
-    df = pd.read_excel(excel_path, engine="openpyxl")
+# Only aggregates are materialized (works in out-of-core mode too)
+columns = dataset_columns()
+global_filters = render_global_filters()
 
-    # Ensure date, year, month fields
-    if "start_date" in df.columns:
-        df["start_date"] = pd.to_datetime(df["start_date"], errors="coerce")
-    if "hold_year" not in df.columns and "start_date" in df.columns:
-        df["hold_year"] = df["start_date"].dt.year
-    if "hold_month" not in df.columns and "start_date" in df.columns:
-        df["hold_month"] = df["start_date"].dt.month
-
-    return df
-
-df = load_data()
-
-if "hold_year" not in df.columns or "hold_month" not in df.columns:
+if "hold_year" not in columns or "hold_month" not in columns:
     st.error("Need 'hold_year' and 'hold_month' or 'start_date' to build time trends.")
     st.stop()
 
 # Year filter
-years = sorted(df["hold_year"].dropna().unique().tolist())
+years = distinct("hold_year", filters=global_filters)
 year_choice = st.multiselect("Select year(s):", years, default=years)
 
-df_year = df[df["hold_year"].isin(year_choice)]
+year_filter = combine_filters(global_filters, {"hold_year": year_choice})
+
+# Cells selected on the heatmap below narrow the monthly charts to their
+# locations. Only the location axis is used: independent location and month
+# lists would also keep unselected (location, month) cells. Both are rolled up
+# from this (year x month x location) cube, never from raw rows.
+has_heatmap = "membership_location" in columns and "fee_loss" in columns
+cross = (
+    cross_filter("time_trends", "location_month_heatmap",
+                 {"y": "membership_location"}, filters=year_filter)
+    if has_heatmap else {}
+)
+cube_keys = ["hold_year", "hold_month"] + (["membership_location"] if "membership_location" in columns else [])
+cube_values = ["fee_loss"] if "fee_loss" in columns else []
+trend_cube = aggregate(cube_keys, cube_values, ["sum", "count"], filters=year_filter)
+
+if cross:
+    st.caption("🔗 The monthly charts are filtered by the heatmap selection below.")
 
 st.markdown("### 📉 Monthly Fee Loss Trend")
 
-if "fee_loss" in df.columns:
+if "fee_loss" in columns:
+    horizon = st.slider("Forecast months ahead:", min_value=1, max_value=12, value=3)
     monthly = (
-        df_year.groupby(["hold_year", "hold_month"])["fee_loss"]
-        .sum()
-        .reset_index()
+        rollup(trend_cube, ["hold_year", "hold_month"], ["fee_loss"], ["sum"], filters=cross)
+        .rename(columns={"fee_loss_sum": "fee_loss"})
         .sort_values(["hold_year", "hold_month"])
     )
     monthly["year_month"] = monthly["hold_year"].astype(str) + "-" + monthly["hold_month"].astype(str).str.zfill(2)
@@ -56,15 +63,35 @@ if "fee_loss" in df.columns:
         markers=True
     )
     fig_line.update_layout(xaxis_title="Year-Month", yaxis_title="Total Fee Loss")
+
+    # Forecast continues the full history, so it is only drawn after the latest selected year
+    forecast = fee_loss_forecast(None, horizon, filters=global_filters)
+    ahead = forecast[forecast["kind"] == "Forecast"]
+    if not cross and year_choice and max(year_choice) == max(years) and len(ahead):
+        ahead_x = ahead["month"].dt.strftime("%Y-%m").tolist()
+        fig_line.add_trace(go.Scatter(
+            x=ahead_x + ahead_x[::-1],
+            y=ahead["upper"].tolist() + ahead["lower"].tolist()[::-1],
+            fill="toself",
+            fillcolor="rgba(139, 0, 0, 0.15)",
+            line=dict(width=0),
+            hoverinfo="skip",
+            name="95% interval",
+        ))
+        fig_line.add_trace(go.Scatter(
+            x=[monthly["year_month"].iloc[-1]] + ahead_x,
+            y=[monthly["fee_loss"].iloc[-1]] + ahead["fee_loss"].tolist(),
+            mode="lines+markers",
+            line=dict(color="#8B0000", dash="dash"),
+            name="Forecast",
+        ))
     st.plotly_chart(fig_line, use_container_width=True)
 
 # Holds per month
 st.markdown("### 📦 Number of Holds per Month")
 
-monthly_count = (
-    df_year.groupby(["hold_year", "hold_month"])
-    .size()
-    .reset_index(name="count")
+monthly_count = rollup(trend_cube, ["hold_year", "hold_month"], filters=cross).rename(
+    columns={"rows": "count"}
 )
 monthly_count["year_month"] = monthly_count["hold_year"].astype(str) + "-" + monthly_count["hold_month"].astype(str).str.zfill(2)
 
@@ -78,23 +105,108 @@ fig_bar.update_layout(xaxis_title="Year-Month", yaxis_title="Holds")
 st.plotly_chart(fig_bar, use_container_width=True)
 
 # Heatmap by month vs location
-if "membership_location" in df.columns and "fee_loss" in df.columns:
+if has_heatmap:
     st.markdown("### 🌡 Fee Loss Heatmap by Location & Month")
 
-    heat_df = (
-        df_year.groupby(["membership_location", "hold_month"])["fee_loss"]
-        .sum()
-        .reset_index()
+    fig_heat = figure("time_trends", "location_month_heatmap", tuple(sorted(year_choice)), freeze_filters(global_filters))
+    st.plotly_chart(
+        fig_heat,
+        use_container_width=True,
+        on_select="rerun",
+        key=cross_filter_key("time_trends", "location_month_heatmap"),
+    )
+    render_cross_filter_status("time_trends", "location_month_heatmap", cross, {"membership_location": "Location"})
+    st.caption("Selecting heatmap cells filters the monthly charts by the cells' locations; the month is not used.")
+
+# Next-quarter leakage per location / cluster, all series fitted as one batch
+forecast_splits = {}
+if "membership_location" in columns:
+    forecast_splits["Location"] = "membership_location"
+for c in ["cluster_label", "cluster_name"]:
+    if c in columns:
+        forecast_splits["Cluster"] = c
+        break
+
+if "fee_loss" in columns and forecast_splits:
+    st.markdown("### 🔮 Fee Loss Forecast by Location & Cluster")
+
+    forecast_label = st.radio("Forecast by:", list(forecast_splits.keys()), horizontal=True)
+    forecast = fee_loss_forecast(forecast_splits[forecast_label], horizon, filters=global_filters)
+    forecast = forecast[forecast["series"] != "All"]
+    if forecast.attrs.get("method") == "naive":
+        st.caption("ℹ️ Less than two years of history: forecasts repeat the last month.")
+
+    fig_fc = px.line(
+        forecast,
+        x="month",
+        y="fee_loss",
+        color="series",
+        line_dash="kind",
+        title=f"Monthly Fee Loss and {horizon}-Month Forecast by {forecast_label}",
+        labels={"month": "Month", "fee_loss": "Fee Loss", "series": forecast_label, "kind": ""},
+        color_discrete_sequence=px.colors.sequential.Reds[::-1],
     )
+    st.plotly_chart(fig_fc, use_container_width=True)
 
-    pivot = heat_df.pivot(index="membership_location", columns="hold_month", values="fee_loss").fillna(0)
-    pivot = pivot.sort_index()
+    ahead = forecast[forecast["kind"] == "Forecast"]
+    outlook = (
+        ahead.groupby("series")
+        .agg(forecast_fee_loss=("fee_loss", "sum"), low_month=("lower", "min"), high_month=("upper", "max"))
+        .sort_values("forecast_fee_loss", ascending=False)
+        .reset_index()
+        .rename(columns={"series": forecast_label})
+    )
+    st.dataframe(outlook.round(0), use_container_width=True, hide_index=True)
+    st.caption(
+        f"Forecast = expected fee loss over the next {horizon} month(s) (additive Holt–Winters with a damped "
+        "trend); low / high are the extremes of the monthly 95% intervals."
+    )
 
-    fig_heat = px.imshow(
-        pivot,
-        aspect="auto",
-        labels=dict(x="Month", y="Location", color="Total Fee Loss"),
-        title="Monthly Fee Loss Heatmap by Location",
-        color_continuous_scale="Reds"
+# Members on hold per day (sweep over each hold's start / end events)
+if all(c in columns for c in TIMELINE_COLUMNS):
+    st.markdown("### 🕒 Members on Hold per Day & Daily Revenue Leakage")
+
+    split_options = {"Overall": None}
+    if "membership_location" in columns:
+        split_options["Location"] = "membership_location"
+    for c in ["cluster_label", "cluster_name"]:
+        if c in columns:
+            split_options["Cluster"] = c
+            break
+
+    t1, t2 = st.columns(2)
+    split_label = t1.radio("Split by:", list(split_options.keys()), horizontal=True)
+    timeline_metric = t2.radio("Show:", ["Members on hold", "Daily revenue leakage"], horizontal=True)
+
+    split_col = split_options[split_label]
+    timeline = concurrent_holds(split_col, filters=year_filter)
+    y_col = "on_hold" if timeline_metric == "Members on hold" else "daily_leakage"
+
+    if timeline.empty:
+        st.info("No holds in the selected year(s).")
+    else:
+        overall = timeline.groupby("date")[["on_hold", "daily_leakage"]].sum()
+        peak_day = overall["on_hold"].idxmax()
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Peak Members on Hold", f"{overall['on_hold'].max():,}", f"on {peak_day:%Y-%m-%d}",
+                  delta_color="off")
+        m2.metric("Peak Daily Leakage", f"${overall['daily_leakage'].max():,.0f}")
+        m3.metric("Avg Daily Leakage (while any hold is open)",
+                  f"${overall.loc[overall['on_hold'] > 0, 'daily_leakage'].mean():,.0f}")
+
+    fig_timeline = px.line(
+        timeline,
+        x="date",
+        y=y_col,
+        color=split_col,
+        title=f"{timeline_metric} by Day",
+        labels={
+            "date": "Date",
+            "on_hold": "Members on Hold",
+            "daily_leakage": "Daily Revenue Leakage ($)",
+            split_col or "": split_label,
+        },
+        color_discrete_sequence=px.colors.sequential.Reds[::-1],
     )
-    st.plotly_chart(fig_heat, use_container_width=True)
+    st.plotly_chart(fig_timeline, use_container_width=True)
+    st.caption("Each hold's fee loss is spread evenly over its days; holds are counted from their start date.")
@@ -1,22 +1,28 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from pathlib import Path
+import tempfile
+from utils.aggregates import dataset_columns
+from utils.bootstrap import bootstrap_ci
+from utils.executive_report import (
+    HAS_STATIC_EXPORT,
+    executive_cube,
+    generate_report_pack,
+    summarize,
+    zip_report_pack,
+)
+from utils.figure_cache import figure
+from utils.insights import mine_insights
+from utils.filters import render_global_filters
+from utils.selection import freeze_filters
 
 st.markdown(
     "<h1 style='color:#8b0000;'>📋 Executive Summary</h1>",
     unsafe_allow_html=True
 )
 
-@st.cache_data
-def load_data():
-    here = Path(__file__).resolve()
-    base_dir = here.parent.parent
-    excel_path = base_dir / "ymca_clusters.xlsx"
-    df = pd.read_excel(excel_path, engine="openpyxl")
-    return df
-
-df = load_data()
+# Only aggregates are materialized (works in out-of-core mode too)
+columns = dataset_columns()
+global_filters = render_global_filters()
 
 st.markdown("""
 ### 🎯 Project Focus: Revenue Impact of Hold Behaviour
@@ -26,76 +32,51 @@ which **member segments** contribute most to lost fee income.
 Below is a high-level summary suitable for stakeholders and leadership.
 """)
 
-# Basic numbers
-total_records = len(df)
-total_fee_loss = df["fee_loss"].sum() if "fee_loss" in df.columns else 0
-avg_hold = df["hold_duration_days"].mean() if "hold_duration_days" in df.columns else 0
+# Basic numbers (same computation the report pack uses)
+cube, cluster_col = executive_cube(filters=global_filters)
+summary = summarize(cube, cluster_col)
+
+total_records = summary["total_records"]
+total_fee_loss = summary["total_fee_loss"]
+avg_hold = summary["avg_hold"]
 
 c1, c2, c3 = st.columns(3)
 c1.metric("Total Hold Records", f"{total_records:,}")
 c2.metric("Total Estimated Fee Loss", f"${total_fee_loss:,.0f}")
 c3.metric("Average Hold Duration", f"{avg_hold:.1f} days")
 
+# 95% bootstrap intervals around the headline numbers
+kpi_ci = bootstrap_ci(
+    [], [c for c in ["fee_loss", "hold_duration_days"] if c in columns], filters=global_filters
+).iloc[0]
+if "fee_loss" in columns:
+    c2.caption(f"95% CI ${kpi_ci['fee_loss_sum_lo']:,.0f} – ${kpi_ci['fee_loss_sum_hi']:,.0f}")
+if "hold_duration_days" in columns:
+    c3.caption(f"95% CI {kpi_ci['hold_duration_days_mean_lo']:.1f} – {kpi_ci['hold_duration_days_mean_hi']:.1f} days")
+
 st.markdown("---")
 
 # Top locations by fee loss
-if "membership_location" in df.columns and "fee_loss" in df.columns:
+if "membership_location" in columns and "fee_loss" in columns:
     st.markdown("### 🏢 Top Locations by Fee Loss")
 
-    loc_loss = (
-        df.groupby("membership_location")["fee_loss"]
-        .sum()
-        .reset_index()
-        .sort_values("fee_loss", ascending=False)
-        .head(5)
-    )
-    fig_loc = px.bar(
-        loc_loss,
-        x="membership_location",
-        y="fee_loss",
-        title="Top 5 Locations by Fee Loss",
-        color="fee_loss",
-        color_continuous_scale="Reds"
-    )
+    fig_loc = figure("executive", "top_locations", freeze_filters(global_filters))
     st.plotly_chart(fig_loc, use_container_width=True)
 
 # Top reasons by fee loss
-if "reason_for_hold" in df.columns and "fee_loss" in df.columns:
+if "reason_for_hold" in columns and "fee_loss" in columns:
     st.markdown("### 🧠 Hold Reasons Driving Fee Loss")
 
-    reason_loss = (
-        df.groupby("reason_for_hold")["fee_loss"]
-        .sum()
-        .reset_index()
-        .sort_values("fee_loss", ascending=False)
-    )
-    fig_reason = px.bar(
-        reason_loss,
-        x="reason_for_hold",
-        y="fee_loss",
-        title="Fee Loss by Hold Reason",
-    )
-    fig_reason.update_layout(xaxis_tickangle=-35)
+    fig_reason = figure("executive", "reason_loss", freeze_filters(global_filters))
     st.plotly_chart(fig_reason, use_container_width=True)
 
 st.markdown("---")
 
 # Cluster summary (if available)
-cluster_col = None
-for c in df.columns:
-    if "cluster_label" in c.lower() or "cluster_name" in c.lower():
-        cluster_col = c
-        break
-
-if cluster_col and "fee_loss" in df.columns:
+if cluster_col and "fee_loss" in columns:
     st.markdown("### 🧩 Cluster-Level Summary")
 
-    cluster_summary = (
-        df.groupby(cluster_col)["fee_loss"]
-        .agg(["sum", "mean", "count"])
-        .reset_index()
-        .rename(columns={"sum": "Total Fee Loss", "mean": "Avg Fee Loss", "count": "Members"})
-    )
+    cluster_summary = summary["cluster_summary"]
 
     st.dataframe(cluster_summary, use_container_width=True)
 
@@ -105,6 +86,14 @@ if cluster_col and "fee_loss" in df.columns:
         f"(${top_cluster['Total Fee Loss']:,.0f}) and should be prioritized for policy review and engagement strategies."
     )
 
+# Top segments across every 1- to 3-way dimension combination
+if "fee_loss" in columns:
+    mined = mine_insights(global_filters)
+    if not mined.empty:
+        st.markdown("### 🔍 Top Mined Insights")
+        for text in mined["insight"].head(5):
+            st.markdown(f"- {text}")
+
 st.markdown("---")
 
 st.markdown("""
@@ -115,3 +104,30 @@ st.markdown("""
 - **Experiment with alternative options** such as partial fees during holds or benefit adjustments.
 - Use this dashboard to **monitor impact over time** after policy changes.
 """)
+
+st.markdown("---")
+
+# ==========================
+# REPORT PACK
+# ==========================
+st.markdown("### 📦 Monthly Report Pack")
+st.write(
+    "Generate one Executive Summary report per location and per cluster (plus an overall report), "
+    "rendered in parallel, and download them as a single zip. The pack always covers the full "
+    "dataset, regardless of the global filters."
+)
+if not HAS_STATIC_EXPORT:
+    st.caption("Install `kaleido` to embed static chart images; reports currently use interactive Plotly charts.")
+
+if st.button("🖨 Generate report pack"):
+    with st.spinner("Rendering reports..."), tempfile.TemporaryDirectory() as out_dir:
+        written = generate_report_pack(out_dir)
+        pack = zip_report_pack(out_dir)
+
+    st.success(f"✅ Generated {len(written)} reports.")
+    st.download_button(
+        label="📥 Download Report Pack (.zip)",
+        data=pack,
+        file_name=f"ymca_executive_reports_{pd.Timestamp.today():%Y_%m}.zip",
+        mime="application/zip"
+    )
@@ -1,23 +1,18 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from pathlib import Path
 import numpy as np
+from utils.aggregates import aggregate, dataset_columns
+from utils.filters import render_global_filters
+from utils.sketches import quantiles
 
 st.markdown(
     "<h1 style='color:#8b0000;'>💸 Lifetime Value (LTV) Impact</h1>",
     unsafe_allow_html=True
 )
 
-@st.cache_data
-def load_data():
-    here = Path(__file__).resolve()
-    base_dir = here.parent.parent
-    excel_path = base_dir / "ymca_clusters.xlsx"
-    df = pd.read_excel(excel_path, engine="openpyxl")
-    return df
-
-df = load_data()
+# Hold records narrowed by the sidebar's global filters
+global_filters = render_global_filters()
+columns = dataset_columns()
 
 # ----- Configurable assumptions -----
 st.markdown("### ⚙️ LTV Model Assumptions (Simple Approximation)")
@@ -25,12 +20,18 @@ col_a1, col_a2 = st.columns(2)
 
 base_months = col_a1.slider("Assumed Active Months (no holds)", 6, 48, 24)
 hold_penalty_factor = col_a2.slider("Hold Penalty Factor (months lost per 30 days on hold)", 0.0, 1.5, 1.0, step=0.1)
+hold_stat = st.radio(
+    "Typical hold duration per segment:",
+    ["Mean", "Median (P50)"],
+    horizontal=True,
+    help="Hold durations are heavily skewed; the median is less affected by a few very long holds.",
+)
 
 # ----- Choose grouping dimension -----
 group_options = {}
-if "cluster_label" in df.columns:
+if "cluster_label" in columns:
     group_options["Cluster"] = "cluster_label"
-if "cluster_name" in df.columns:
+if "cluster_name" in columns:
     group_options["Cluster Name"] = "cluster_name"
 group_options["Membership Type"] = "application_subscription_membership_type"
 group_options["Package Category"] = "application_package_category"
@@ -42,26 +43,35 @@ seg_label = st.selectbox("Group members by:", list(group_options.keys()))
 seg_col = group_options[seg_label]
 
 # ----- Compute LTV metrics -----
-if "membership_fee" not in df.columns or "hold_duration_days" not in df.columns:
+if "membership_fee" not in columns or "hold_duration_days" not in columns:
     st.error("Need 'membership_fee' and 'hold_duration_days' columns for LTV analysis.")
     st.stop()
 
 grouped = (
-    df.groupby(seg_col)[["membership_fee", "hold_duration_days"]]
-    .mean()
-    .reset_index()
-    .rename(columns={"membership_fee": "avg_fee", "hold_duration_days": "avg_hold_days"})
+    aggregate([seg_col], ["membership_fee", "hold_duration_days"], ["mean"], filters=global_filters)
+    .drop(columns="rows")
+    .rename(columns={"membership_fee_mean": "avg_fee", "hold_duration_days_mean": "avg_hold_days"})
 )
 
+# Approximate percentiles merged from the quantile sketches
+hold_pct = quantiles([seg_col], "hold_duration_days", filters=global_filters).rename(columns={
+    "hold_duration_days_p50": "median_hold_days",
+    "hold_duration_days_p90": "p90_hold_days",
+    "hold_duration_days_p99": "p99_hold_days",
+})
+grouped = grouped.merge(hold_pct, on=seg_col, how="left")
+typical_hold = grouped["median_hold_days"] if hold_stat.startswith("Median") else grouped["avg_hold_days"]
+
 # Baseline and adjusted LTV
 grouped["baseline_ltv"] = grouped["avg_fee"] * base_months
-grouped["hold_months_lost"] = (grouped["avg_hold_days"] / 30.0) * hold_penalty_factor
+grouped["hold_months_lost"] = (typical_hold / 30.0) * hold_penalty_factor
 grouped["effective_months"] = np.maximum(base_months - grouped["hold_months_lost"], 0)
 grouped["adjusted_ltv"] = grouped["avg_fee"] * grouped["effective_months"]
 grouped["ltv_impact"] = grouped["baseline_ltv"] - grouped["adjusted_ltv"]
 
 st.markdown("### 📊 LTV Summary Table")
-st.dataframe(grouped[[seg_col, "avg_fee", "avg_hold_days", "baseline_ltv", "adjusted_ltv", "ltv_impact"]]
+st.dataframe(grouped[[seg_col, "avg_fee", "avg_hold_days", "median_hold_days", "p90_hold_days", "p99_hold_days",
+                      "baseline_ltv", "adjusted_ltv", "ltv_impact"]]
              .round(2), use_container_width=True)
 
 st.markdown("### 💥 LTV Loss by Segment")
@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
+from utils.aggregates import dataset_schema
+from utils.filters import render_global_filters
+from utils.selection import filtered_data
 
 st.markdown(
     "<h1 style='color:#8b0000;'>📊 Pivot Explorer</h1>",
@@ -9,19 +11,12 @@ st.markdown(
 
 st.write("Build custom summaries by choosing rows, columns, and metrics – similar to Excel / Power BI pivot tables.")
 
-@st.cache_data
-def load_data():
-    here = Path(__file__).resolve()
-    base_dir = here.parent.parent
-    excel_path = base_dir / "ymca_clusters.xlsx"
-    df = pd.read_excel(excel_path, engine="openpyxl")
-    return df
-
-df = load_data()
+global_filters = render_global_filters()
 
 # Split columns by type
-num_cols = df.select_dtypes(include=["float64", "int64"]).columns.tolist()
-cat_cols = df.select_dtypes(include=["object"]).columns.tolist()
+schema = dataset_schema()
+num_cols = schema.select_dtypes(include=["float64", "int64"]).columns.tolist()
+cat_cols = schema.select_dtypes(include=["object"]).columns.tolist()
 
 # Controls
 st.markdown("### 🎛 Pivot Controls")
@@ -57,6 +52,9 @@ kwargs = {}
 if columns_col != "(None)":
     kwargs["columns"] = columns_col
 
+# Hold records narrowed by the sidebar's global filters, only the pivoted columns
+df = filtered_data(global_filters, list(dict.fromkeys([index_col, value_col] + list(kwargs.values()))))
+
 pivot = pd.pivot_table(
     df,
     index=index_col,
@@ -1,41 +1,40 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from pathlib import Path
 import numpy as np
+from utils.aggregates import dataset_columns
+from utils.drivers import retention_risk_score
+from utils.filters import render_global_filters
+from utils.record_browser import render_record_browser
+from utils.selection import filtered_data
 
 st.markdown(
     "<h1 style='color:#8b0000;'>⚠️ Retention Risk Dashboard</h1>",
     unsafe_allow_html=True
 )
 
-@st.cache_data
-def load_data():
-    here = Path(__file__).resolve()
-    base_dir = here.parent.parent
-    excel_path = base_dir / "ymca_clusters.xlsx"
-    df = pd.read_excel(excel_path, engine="openpyxl")
-    return df
-
-df = load_data()
+# Hold records narrowed by the sidebar's global filters
+global_filters = render_global_filters()
+columns = dataset_columns()
 
 # Simple risk score = normalized combo of hold_duration_days + fee_loss
-if "hold_duration_days" not in df.columns or "fee_loss" not in df.columns:
+if "hold_duration_days" not in columns or "fee_loss" not in columns:
     st.error("Need 'hold_duration_days' and 'fee_loss' for risk scoring.")
     st.stop()
 
-hold_norm = (df["hold_duration_days"] - df["hold_duration_days"].min()) / (
-    df["hold_duration_days"].max() - df["hold_duration_days"].min() + 1e-9
-)
-fee_norm = (df["fee_loss"] - df["fee_loss"].min()) / (
-    df["fee_loss"].max() - df["fee_loss"].min() + 1e-9
-)
+# Only the scored columns and the segment columns below are fetched
+SEGMENT_COLS = [
+    "membership_location", "application_subscription_membership_type", "application_contact_age_category",
+    "reason_for_hold",
+]
+df = filtered_data(global_filters, ["hold_duration_days", "fee_loss"] + [c for c in SEGMENT_COLS if c in columns])
 
-df["retention_risk_score"] = (0.6 * hold_norm + 0.4 * fee_norm) * 100
+# Derived columns live in a side frame so the shared dataset is never mutated
+risk = pd.DataFrame({"retention_risk_score": retention_risk_score(df)}, index=df.index)
 
 st.markdown("### 📈 Risk Score Distribution")
 fig_hist = px.histogram(
-    df,
+    risk,
     x="retention_risk_score",
     nbins=30,
     title="Distribution of Retention Risk Scores",
@@ -46,22 +45,20 @@ st.plotly_chart(fig_hist, use_container_width=True)
 # Risk banding
 bins = [0, 33, 66, 100]
 labels = ["Low", "Medium", "High"]
-df["risk_band"] = pd.cut(df["retention_risk_score"], bins=bins, labels=labels, include_lowest=True)
+risk["risk_band"] = pd.cut(risk["retention_risk_score"], bins=bins, labels=labels, include_lowest=True)
 
 c1, c2, c3 = st.columns(3)
-c1.metric("Low Risk Members", (df["risk_band"] == "Low").sum())
-c2.metric("Medium Risk Members", (df["risk_band"] == "Medium").sum())
-c3.metric("High Risk Members", (df["risk_band"] == "High").sum())
+c1.metric("Low Risk Members", (risk["risk_band"] == "Low").sum())
+c2.metric("Medium Risk Members", (risk["risk_band"] == "Medium").sum())
+c3.metric("High Risk Members", (risk["risk_band"] == "High").sum())
 
 st.markdown("### 🧱 Risk by Segment")
 
-seg_col = st.selectbox(
-    "Group risk by:",
-    ["membership_location", "application_subscription_membership_type", "application_contact_age_category", "reason_for_hold"]
-)
+seg_col = st.selectbox("Group risk by:", SEGMENT_COLS)
 
 risk_seg = (
-    df.groupby([seg_col, "risk_band"])
+    df[[seg_col]].join(risk["risk_band"])
+    .groupby([seg_col, "risk_band"], observed=False)
     .size()
     .reset_index(name="count")
 )
@@ -77,9 +74,14 @@ fig_seg = px.bar(
 fig_seg.update_layout(xaxis_tickangle=-35)
 st.plotly_chart(fig_seg, use_container_width=True)
 
-st.markdown("### 🔝 High-Risk Members (Sample)")
-st.dataframe(
-    df.sort_values("retention_risk_score", ascending=False)
-      .head(50)[[seg_col, "hold_duration_days", "fee_loss", "retention_risk_score"]],
-    use_container_width=True
+st.markdown("### 🔝 High-Risk Members")
+# Scores are relative to the current selection, so their sort order is cached per selection
+render_record_browser(
+    "retention_risk",
+    global_filters,
+    columns=[seg_col, "hold_duration_days", "fee_loss"],
+    sort_by="retention_risk_score",
+    descending=True,
+    derived=risk[["retention_risk_score"]],
+    derived_key="retention_risk_score",
 )
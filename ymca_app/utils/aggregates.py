@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import load_data
+from utils.out_of_core import OUT_OF_CORE, iter_batches, store_columns, store_rows, take_from_store
+from utils.result_cache import get_result_cache
+from utils.selection import filter_index, row_mask, selection_hash
+
+# ==========================
+# MERGEABLE PARTIAL STATES
+# ==========================
+# Every supported aggregate is computed from partial states that can be
+# combined across batches: mean = sum / count.
+SUPPORTED_AGGS = ("sum", "mean", "count", "min", "max")
+_STATE_MERGE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+# Re-merge the collected partial states once they grow past this many rows
+_MERGE_EVERY_ROWS = 200_000
+
+
+def _state_aggs(aggs):
+    states = set()
+    for agg in aggs:
+        if agg not in SUPPORTED_AGGS:
+            raise ValueError(f"Unsupported aggregate '{agg}', expected one of {SUPPORTED_AGGS}")
+        states.update(("sum", "count") if agg == "mean" else (agg,))
+    return sorted(states)
+
+
+def _partial(batch, by, values, states, dropna=True):
+    """Partial states of one batch: ``rows`` plus ``{value}__{state}`` per value column."""
+    if not by:
+        batch = batch.assign(_all=0)
+        by = ["_all"]
+    grouped = batch.groupby(list(by), sort=False, dropna=dropna)
+    out = grouped.size().rename("rows").to_frame()
+    if values:
+        part = grouped[list(values)].agg(states)
+        part.columns = [f"{v}__{s}" for v, s in part.columns.to_flat_index()]
+        out = out.join(part)
+    return out
+
+
+def _merge(partials, states, dropna=True):
+    merged = pd.concat(partials)
+    how = {"rows": "sum"}
+    for col in merged.columns:
+        if "__" in col:
+            how[col] = _STATE_MERGE[col.rsplit("__", 1)[1]]
+    return merged.groupby(level=list(range(merged.index.nlevels)), sort=False, dropna=dropna).agg(how)
+
+
+def _finalize(states_df, by, values, aggs):
+    out = pd.DataFrame(index=states_df.index)
+    for v in values:
+        for agg in aggs:
+            if agg == "mean":
+                count = states_df[f"{v}__count"]
+                out[f"{v}_mean"] = states_df[f"{v}__sum"] / count.where(count > 0, np.nan)
+            else:
+                out[f"{v}_{agg}"] = states_df[f"{v}__{agg}"]
+    out["rows"] = states_df["rows"]
+    if not by:
+        return out.reset_index(drop=True)
+    return out.sort_index().reset_index()
+
+
+def streaming_aggregate(batches, by, values=(), aggs=("sum",), dropna=True):
+    """Group-by over an iterator of DataFrame batches using mergeable partial states.
+
+    Only the partial states (one row per group seen so far) are held in memory,
+    so the input can be far larger than RAM. With ``dropna=False`` rows with a
+    missing key form their own group instead of being left out.
+    """
+    by, values = list(by), list(values)
+    states = _state_aggs(aggs) if values else []
+
+    partials, pending_rows = [], 0
+    for batch in batches:
+        part = _partial(batch, by, values, states, dropna)
+        partials.append(part)
+        pending_rows += len(part)
+        if pending_rows > _MERGE_EVERY_ROWS:
+            partials = [_merge(partials, states, dropna)]
+            pending_rows = len(partials[0])
+
+    out = _finalize(_merge(partials, states, dropna), by, values, aggs) if partials else None
+    if out is not None and (by or len(out)):
+        return out
+    if by:
+        return pd.DataFrame(columns=by + [f"{v}_{a}" for v in values for a in aggs] + ["rows"])
+    # Totals of an empty selection: one row, sums and counts 0, the rest NaN
+    return pd.DataFrame(
+        {f"{v}_{a}": [0 if a in ("sum", "count") else np.nan] for v in values for a in aggs} | {"rows": [0]}
+    )
+
+
+def streaming_sample(batches, n, seed=0):
+    """Uniform sample of ``n`` rows from a batch stream.
+
+    Each row gets a random key and the ``n`` smallest keys are kept, which is a
+    reservoir sample whose partial results merge by simply re-taking the top n.
+    """
+    rng = np.random.default_rng(seed)
+    kept = None
+    for batch in batches:
+        batch = batch.assign(_key=rng.random(len(batch)))
+        kept = batch if kept is None else pd.concat([kept, batch], ignore_index=True)
+        if len(kept) > n:
+            kept = kept.nsmallest(n, "_key")
+    if kept is None:
+        return pd.DataFrame()
+    return kept.sort_index().drop(columns="_key").reset_index(drop=True)
+
+
+# ==========================
+# PAGE-FACING API
+# ==========================
+def scan_batches(columns, filters=None):
+    """Batches of the requested columns, streamed from disk or taken from the shared frame."""
+    columns = list(dict.fromkeys(columns))
+    if OUT_OF_CORE:
+        yield from iter_batches(columns, filters)
+        return
+
+    df = load_data()
+    if filters:
+        df = df.iloc[filter_index(filters)]
+    yield df[columns]
+
+
+def aggregate(by, values=(), aggs=("sum",), filters=None, dropna=True):
+    """Group the hold dataset by ``by`` and aggregate ``values``.
+
+    Returns one row per group with the key columns, ``{value}_{agg}`` for every
+    value / aggregate pair and ``rows`` (the group size). With ``by=[]`` a single
+    row of dataset-wide totals is returned, even for an empty selection. ``filters`` is a filter set as described
+    in ``utils.selection``. Rows with a missing key are left out unless
+    ``dropna=False``. Works the same in-memory and in out-of-core mode.
+    """
+    by, values, aggs = tuple(by), tuple(values), tuple(aggs)
+    return get_result_cache().get_or_compute(
+        "aggregate",
+        (by, values, aggs, selection_hash(filters), dropna),
+        lambda: streaming_aggregate(scan_batches(by + values, filters), by, values, aggs, dropna),
+    )
+
+
+def rollup(cube, by, values=(), aggs=("sum",), filters=None):
+    """Re-aggregate a cube built with ``aggregate(keys, values, ["sum", "count"])``.
+
+    ``filters`` may only use the cube's key columns. Cells are filtered and
+    summed, so narrowing a view (e.g. a chart cross-filter) never goes back to
+    the raw rows. Same output layout as ``aggregate`` for sum, count and mean.
+    """
+    by, values = list(by), list(values)
+    cells = cube[row_mask(cube, filters)] if filters else cube
+    state_cols = [f"{v}_{s}" for v in values for s in ("sum", "count")] + ["rows"]
+    if by:
+        states = cells.groupby(by, sort=True)[state_cols].sum().reset_index()
+    else:
+        states = cells[state_cols].sum().to_frame().T
+        states = states.astype({c: "int64" for c in state_cols if not c.endswith("_sum")})
+
+    out = states[by].copy()
+    for v in values:
+        for agg in aggs:
+            if agg == "mean":
+                count = states[f"{v}_count"]
+                out[f"{v}_mean"] = states[f"{v}_sum"] / count.where(count > 0, np.nan)
+            elif agg in ("sum", "count"):
+                out[f"{v}_{agg}"] = states[f"{v}_{agg}"]
+            else:
+                raise ValueError(f"Cannot roll up '{agg}' from a sum / count cube")
+    out["rows"] = states["rows"]
+    return out
+
+
+def distinct(col, filters=None):
+    """Sorted distinct non-null values of a column."""
+    return aggregate([col], filters=filters)[col].tolist()
+
+
+def sample(columns, n, filters=None, seed=0):
+    """Uniform random sample of at most ``n`` rows (all rows if the dataset is smaller)."""
+    columns = tuple(columns)
+    return get_result_cache().get_or_compute(
+        "sample",
+        (columns, int(n), selection_hash(filters), seed),
+        lambda: streaming_sample(scan_batches(columns, filters), int(n), seed),
+    )
+
+
+def dataset_columns():
+    """Column names of the hold dataset, without loading it."""
+    if OUT_OF_CORE:
+        return store_columns()
+    return load_data().columns.tolist()
+
+
+def dataset_schema():
+    """Zero-row frame with the dataset's columns and dtypes, without loading it."""
+    return take_rows(np.empty(0, dtype=np.int64))
+
+
+def dataset_rows():
+    """Number of holds, without loading the dataset."""
+    if OUT_OF_CORE:
+        return store_rows()
+    return len(load_data())
+
+
+def take_rows(positions, columns=None):
+    """The holds at row ``positions`` (only ``columns``), indexed by position.
+
+    Positions are in the order ``scan_batches`` streams the rows; out of core
+    only the requested rows and columns are read from the store.
+    """
+    columns = list(columns) if columns is not None else dataset_columns()
+    if OUT_OF_CORE:
+        return take_from_store(positions, columns)
+    return load_data().iloc[positions][columns]
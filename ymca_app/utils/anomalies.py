@@ -0,0 +1,226 @@
+import threading
+import warnings
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.aggregates import dataset_columns, scan_batches
+from utils.data_loader import dataset_version
+from utils.executive_report import find_cluster_col
+from utils.selection import DateRange
+
+# ==========================
+# STREAMING ANOMALY DETECTION
+# ==========================
+# Monthly fee loss and hold counts are tracked per location and per cluster.
+# Each series keeps only a ring buffer of its last WINDOW months (for the
+# rolling median / MAD) and an EWMA mean and variance, so memory does not grow
+# with history. A month is scored against that state when it closes and then
+# folded into it; earlier months are never revisited.
+ANOMALY_DIMENSIONS = {"Location": "membership_location"}
+METRICS = ["fee_loss", "holds"]
+WINDOW = 12
+EWMA_ALPHA = 0.3
+# Robust z-score (|x - median| / (1.4826 * MAD)) from which a month is flagged
+THRESHOLD = 3.5
+MIN_HISTORY = 6
+# Series with fewer typical holds per month are too sparse to judge
+MIN_MONTHLY_HOLDS = 5
+MAX_ALERTS = 1000
+# Open-ended upper bound for "rows from this month on" scans
+_FAR_FUTURE = pd.Timestamp("2200-01-01")
+
+
+class MonthlyDetector:
+    """Rolling median / MAD and EWMA per key over closed monthly totals."""
+
+    def __init__(self, window=WINDOW, alpha=EWMA_ALPHA, threshold=THRESHOLD, min_history=MIN_HISTORY):
+        self.window, self.alpha, self.threshold, self.min_history = window, alpha, threshold, min_history
+        self.keys, self._index = [], {}
+        self.history = np.zeros((0, len(METRICS), window))
+        self.seen = np.zeros(0, dtype=np.int64)
+        self.ewma_mean = np.zeros((0, len(METRICS)))
+        self.ewma_var = np.zeros((0, len(METRICS)))
+
+    def _add_keys(self, keys):
+        new = [k for k in keys if k not in self._index]
+        if not new:
+            return
+        for k in new:
+            self._index[k] = len(self.keys)
+            self.keys.append(k)
+        self.history = np.concatenate([self.history, np.zeros((len(new), len(METRICS), self.window))])
+        self.seen = np.concatenate([self.seen, np.zeros(len(new), dtype=np.int64)])
+        self.ewma_mean = np.concatenate([self.ewma_mean, np.zeros((len(new), len(METRICS)))])
+        self.ewma_var = np.concatenate([self.ewma_var, np.zeros((len(new), len(METRICS)))])
+
+    def update(self, totals):
+        """Score one closed month, then absorb it.
+
+        ``totals`` maps key -> [fee_loss, holds]; known keys missing from it had
+        no holds that month. Returns one dict per flagged (key, metric).
+        """
+        self._add_keys(totals)
+        x = np.zeros((len(self.keys), len(METRICS)))
+        for k, v in totals.items():
+            x[self._index[k]] = v
+
+        # Score against the state built from earlier months only
+        filled = np.minimum(self.seen, self.window)
+        valid = np.arange(self.window)[None, None, :] < filled[:, None, None]
+        hist = np.where(valid, self.history, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+            # Keys without history yet have all-NaN windows
+            warnings.simplefilter("ignore", RuntimeWarning)
+            median = np.nanmedian(hist, axis=2)
+            mad = np.nanmedian(np.abs(hist - median[:, :, None]), axis=2)
+            # MAD is 0 when most months are identical (e.g. a sparse series of
+            # zeros); the mean absolute deviation then stands in for it
+            mean_ad = np.nanmean(np.abs(hist - median[:, :, None]), axis=2)
+            scale = np.maximum(np.where(mad > 0, 1.4826 * mad, 1.2533 * mean_ad), 1.0)
+            robust_z = (x - median) / scale
+            ewma_z = (x - self.ewma_mean) / np.sqrt(self.ewma_var)
+
+        enough = (self.seen >= self.min_history) & (median[:, METRICS.index("holds")] >= MIN_MONTHLY_HOLDS)
+        flagged = enough[:, None] & (np.abs(robust_z) >= self.threshold)
+        alerts = [
+            {
+                "key": self.keys[i],
+                "metric": METRICS[j],
+                "value": x[i, j],
+                "expected": median[i, j],
+                "robust_z": robust_z[i, j],
+                "ewma_z": ewma_z[i, j],
+                "direction": "Spike" if robust_z[i, j] > 0 else "Drop",
+            }
+            for i, j in zip(*np.nonzero(flagged))
+        ]
+
+        # Absorb: overwrite the oldest ring slot, update the EWMA moments
+        rows = np.arange(len(self.keys))
+        self.history[rows, :, self.seen % self.window] = x
+        first = self.seen == 0
+        diff = x - self.ewma_mean
+        self.ewma_mean = np.where(first[:, None], x, self.ewma_mean + self.alpha * diff)
+        self.ewma_var = np.where(first[:, None], 0.0, (1 - self.alpha) * (self.ewma_var + self.alpha * diff ** 2))
+        self.seen += 1
+        return alerts
+
+
+class AnomalyMonitor:
+    """Feeds ingestion batches to one detector per dimension.
+
+    ``ingest`` only adds a batch's rows to per-month totals of the months
+    still open; ``close_months`` scores and absorbs every open month before a
+    given month, oldest first. Rows of an already closed month arrive too late
+    to be scored and are counted in ``late_rows``.
+    """
+
+    def __init__(self, dimensions):
+        self.dimensions = dict(dimensions)
+        self.detectors = {label: MonthlyDetector() for label in self.dimensions}
+        self.pending = {}  # month -> label -> key -> [fee_loss, holds]
+        self.last_closed = None
+        self.late_rows = 0
+        self.alerts = deque(maxlen=MAX_ALERTS)
+
+    def open_from(self):
+        """First day of the oldest month not yet closed (None before any month closed)."""
+        if self.last_closed is None:
+            return None
+        return (self.last_closed + 1).to_timestamp()
+
+    def ingest(self, batch):
+        batch = batch.dropna(subset=["start_date"])
+        month = batch["start_date"].dt.to_period("M")
+        if self.last_closed is not None:
+            late = month <= self.last_closed
+            self.late_rows += int(late.sum())
+            batch, month = batch[~late], month[~late]
+        loss = batch["fee_loss"].fillna(0) if "fee_loss" in batch.columns else pd.Series(0.0, index=batch.index)
+        for label, col in self.dimensions.items():
+            cells = (
+                pd.DataFrame({"month": month, "key": batch[col], "fee_loss": loss})
+                .dropna(subset=["key"])
+                .groupby(["month", "key"])["fee_loss"]
+                .agg(["sum", "size"])
+            )
+            for (m, key), (total, holds) in cells.iterrows():
+                totals = self.pending.setdefault(m, {}).setdefault(label, {})
+                totals[key] = totals.get(key, np.zeros(2)) + [total, holds]
+
+    def close_months(self, until):
+        """Score and absorb every open month before ``until`` (a month Period), oldest first."""
+        if not self.pending:
+            return
+        month = min(self.pending) if self.last_closed is None else self.last_closed + 1
+        while month < until:
+            totals = self.pending.pop(month, {})
+            for label, detector in self.detectors.items():
+                for alert in detector.update(totals.get(label, {})):
+                    self.alerts.append({"dimension": label, "month": month.to_timestamp(), **alert})
+            self.last_closed = month
+            month += 1
+
+    def discard_open_months(self):
+        """Forget the open months' totals (they are re-read from the next dataset version)."""
+        self.pending = {}
+
+
+def anomaly_dimensions(columns):
+    dims = {label: col for label, col in ANOMALY_DIMENSIONS.items() if col in columns}
+    cluster_col = find_cluster_col(columns)
+    if cluster_col is not None:
+        dims["Cluster"] = cluster_col
+    return dims
+
+
+# ==========================
+# APP-WIDE MONITOR
+# ==========================
+@st.cache_resource
+def _monitor_state():
+    # Deliberately not keyed by dataset version: the monitor outlives versions
+    # and only ingests what a new version added
+    return {"monitor": None, "version": None, "lock": threading.Lock()}
+
+
+def sync_anomalies():
+    """The app-wide monitor, caught up with the current dataset version.
+
+    The first call streams the whole dataset. When the dataset file changes,
+    only rows from the oldest open month on are read (new holds are assumed to
+    be appended); months before the newest one are then closed and scored.
+    """
+    state = _monitor_state()
+    with state["lock"]:
+        version = dataset_version()
+        if state["version"] != version:
+            columns = dataset_columns()
+            monitor = state["monitor"] or AnomalyMonitor(anomaly_dimensions(columns))
+            monitor.discard_open_months()
+            start = monitor.open_from()
+            filters = {"start_date": DateRange(start, _FAR_FUTURE)} if start is not None else None
+            read = ["start_date"] + [c for c in ["fee_loss"] if c in columns] + list(monitor.dimensions.values())
+            newest = None
+            for batch in scan_batches(read, filters):
+                monitor.ingest(batch)
+                if batch["start_date"].notna().any():
+                    latest = batch["start_date"].max().to_period("M")
+                    newest = latest if newest is None else max(newest, latest)
+            # The newest month may still be filling up; it stays open
+            if newest is not None:
+                monitor.close_months(newest)
+            state["monitor"], state["version"] = monitor, version
+        return state["monitor"]
+
+
+def anomaly_alerts():
+    """Flagged (dimension, key, month, metric) rows, newest month first."""
+    monitor = sync_anomalies()
+    alerts = pd.DataFrame(list(monitor.alerts))
+    if alerts.empty:
+        return alerts
+    return alerts.sort_values(["month", "robust_z"], ascending=[False, False], ignore_index=True)
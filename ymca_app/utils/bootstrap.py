@@ -0,0 +1,176 @@
+import itertools
+import math
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import distinct, scan_batches
+from utils.result_cache import get_result_cache
+from utils.selection import row_mask, selection_hash
+
+# ==========================
+# POISSON BOOTSTRAP
+# ==========================
+# Each resample re-weights every hold by an independent Poisson(1) count
+# instead of drawing row indices, so resamples of different segments and of
+# streamed batches are independent and their weighted sums simply add up.
+# A block of resamples is one (resamples x chunk rows) weight matrix; with rows
+# sorted by group, each group's weighted sums of every value are one matrix
+# product of its slice of the weights with the stacked value columns. Sums kept
+# per finer cell can be added up into coarser groups afterwards.
+DEFAULT_RESAMPLES = 1000
+DEFAULT_LEVEL = 0.95
+SEED = 0
+# A weight matrix is block resamples x chunk rows of float32 (~3 MB)
+_BLOCK_RESAMPLES = 100
+_CHUNK_ROWS = 8_192
+
+# Poisson(1) inverse CDF over 16-bit uniforms: a table lookup is ~5x faster
+# than Generator.poisson and the weights' distribution is off by < 1 / 65536
+_POISSON_CDF = np.cumsum([math.exp(-1) / math.factorial(k) for k in range(20)])
+_POISSON_TABLE = np.searchsorted(_POISSON_CDF, (np.arange(65536) + 0.5) / 65536).astype(np.float32)
+
+
+def poisson_weights(rng, shape):
+    """Matrix of independent Poisson(1) resampling weights."""
+    return _POISSON_TABLE[rng.integers(0, 65536, size=shape, dtype=np.uint16)]
+
+
+def _read_only(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+def _group_codes(batch, by, groups):
+    """Mixed-radix code of each row's group; -1 where a key is missing."""
+    code = np.zeros(len(batch), dtype=np.int64)
+    valid = np.ones(len(batch), dtype=bool)
+    for col, values in zip(by, groups):
+        c = pd.Categorical(batch[col], categories=values).codes.astype(np.int64)
+        valid &= c >= 0
+        code = code * len(values) + c
+    return np.where(valid, code, -1)
+
+
+def _resample(by, values, n_resamples, filters):
+    """Exact and per-resample (value sums, value counts) of every ``by`` key combination."""
+    by, values = list(by), list(values)
+    groups = [distinct(col, filters=filters) for col in by]
+    n_groups = int(np.prod([len(g) for g in groups])) if by else 1
+    rng = np.random.default_rng(SEED)
+
+    rows = np.zeros(n_groups)
+    # groups x (value sums, value counts): exact (all weights 1) and per resample
+    exact = np.zeros((n_groups, 2 * len(values)))
+    boot = np.zeros((n_resamples, n_groups, 2 * len(values)))
+
+    for batch in scan_batches(by + values, filters):
+        code = _group_codes(batch, by, groups) if by else np.zeros(len(batch), dtype=np.int64)
+        order = np.argsort(code, kind="stable")
+        order = order[code[order] >= 0]
+        if not len(order):
+            continue
+        code = code[order]
+        bounds = np.flatnonzero(np.r_[True, code[1:] != code[:-1], True])
+        present = code[bounds[:-1]]
+        rows[present] += np.diff(bounds)
+
+        x = batch[values].to_numpy(dtype=float)[order]
+        stacked = np.hstack([np.nan_to_num(x), (~np.isnan(x)).astype(float)])
+        exact[present] += np.add.reduceat(stacked, bounds[:-1], axis=0)
+
+        # Weights are small integers, exact in float32; each chunk's products
+        # are accumulated in float64
+        stacked = stacked.astype(np.float32)
+        for lo in range(0, len(code), _CHUNK_ROWS):
+            hi = min(lo + _CHUNK_ROWS, len(code))
+            cuts = np.r_[lo, bounds[(bounds > lo) & (bounds < hi)], hi]
+            for block in range(0, n_resamples, _BLOCK_RESAMPLES):
+                size = min(_BLOCK_RESAMPLES, n_resamples - block)
+                weights = poisson_weights(rng, (size, hi - lo))
+                for a, b in zip(cuts[:-1], cuts[1:]):
+                    boot[block:block + size, code[a]] += weights[:, a - lo:b - lo] @ stacked[a:b]
+
+    if by:
+        keys = pd.DataFrame(list(itertools.product(*groups)), columns=by)
+    else:
+        keys = pd.DataFrame(index=[0])
+    return keys.assign(rows=rows.astype(np.int64)), _read_only(exact), _read_only(boot)
+
+
+def _intervals(cells, by, values, level):
+    keys, exact, boot = cells
+    out = keys.copy()
+
+    tails = [(1 - level) / 2, (1 + level) / 2]
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        # Groups without rows have no resampled means at all
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for i, v in enumerate(values):
+            boot_sums, boot_counts = boot[:, :, i], boot[:, :, len(values) + i]
+            # Percentile intervals; a resample that drew no rows of a group has no mean
+            sum_lo, sum_hi = np.quantile(boot_sums, tails, axis=0)
+            mean_lo, mean_hi = np.nanquantile(boot_sums / boot_counts, tails, axis=0)
+            out[f"{v}_sum"] = exact[:, i]
+            out[f"{v}_sum_lo"] = sum_lo
+            out[f"{v}_sum_hi"] = sum_hi
+            out[f"{v}_mean"] = exact[:, i] / exact[:, len(values) + i]
+            out[f"{v}_mean_lo"] = mean_lo
+            out[f"{v}_mean_hi"] = mean_hi
+
+    if not by:
+        return out
+    return out[out["rows"] > 0].reset_index(drop=True)
+
+
+def _roll_up(cells, by, within):
+    """Sum the cells that pass ``within`` into ``by`` groups (resample by resample)."""
+    keys, exact, boot = cells
+    mask = row_mask(keys, within)
+    keys, exact, boot = keys[mask], exact[mask], boot[:, mask]
+    if by:
+        group = keys.groupby(by, sort=True).ngroup().to_numpy()
+        out = keys.groupby(by, sort=True)["rows"].sum().reset_index()
+    else:
+        group = np.zeros(len(keys), dtype=np.int64)
+        out = pd.DataFrame({"rows": [int(keys["rows"].sum())]})
+    rolled_exact = np.zeros((len(out), exact.shape[1]))
+    rolled_boot = np.zeros((boot.shape[0], len(out), boot.shape[2]))
+    np.add.at(rolled_exact, group, exact)
+    np.add.at(rolled_boot, (slice(None), group), boot)
+    return out, rolled_exact, rolled_boot
+
+
+def bootstrap_ci(by, values, filters=None, n_resamples=DEFAULT_RESAMPLES, level=DEFAULT_LEVEL, within=None):
+    """Bootstrap confidence intervals of the sum and mean of ``values`` per ``by`` group.
+
+    Returns the ``by`` keys, ``rows`` and for every value ``{v}_sum`` /
+    ``{v}_mean`` (exact) with ``_lo`` / ``_hi`` interval bounds at ``level``.
+    With ``by=[]`` a single dataset-wide row is returned. All groups and values
+    are resampled in one streaming pass; cached per dataset version and filter set.
+
+    ``within`` narrows ``filters`` on categorical columns (e.g. a chart
+    cross-filter): the resampled sums are kept per ``by`` x ``within``-column
+    cell and the matching cells are added up, so changing it never resamples.
+    """
+    by, values = tuple(by), tuple(values)
+    cell_by = by + tuple(c for c in (within or {}) if c not in by)
+    cells = get_result_cache().get_or_compute(
+        "bootstrap_cells",
+        (cell_by, values, n_resamples, selection_hash(filters)),
+        lambda: _resample(cell_by, values, n_resamples, filters),
+    )
+    return get_result_cache().get_or_compute(
+        "bootstrap_ci",
+        (by, values, n_resamples, level, selection_hash(filters), selection_hash(within)),
+        lambda: _intervals(_roll_up(cells, list(by), within) if within else cells, by, values, level),
+    )
+
+
+def with_error_bars(summary, column):
+    """Add ``{column}_err_plus`` / ``_err_minus`` (distances to the CI bounds) for plotly ``error_y``."""
+    return summary.assign(**{
+        f"{column}_err_plus": (summary[f"{column}_hi"] - summary[column]).clip(lower=0),
+        f"{column}_err_minus": (summary[column] - summary[f"{column}_lo"]).clip(lower=0),
+    })
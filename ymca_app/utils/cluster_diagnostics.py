@@ -0,0 +1,229 @@
+import hashlib
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+
+from utils.aggregates import scan_batches
+from utils.data_loader import BASE_DIR, dataset_version
+from utils.result_cache import get_result_cache
+from utils.selection import freeze_filters, row_mask, selection_hash, thaw_filters
+
+# ==========================
+# CONFIGURATION
+# ==========================
+# Hold features are standardized (z-scores; a missing value is imputed with the
+# feature mean, i.e. 0) and projected to 2D once per dataset version and
+# feature set. The projection and standardized matrix are kept on disk, so a
+# server restart does not recompute them.
+DIAGNOSTIC_FEATURES = ["fee_loss", "hold_duration_days", "membership_fee", "avg_hold_contact", "age_at_hold"]
+EMBEDDING_DIR = Path(os.environ.get("YMCA_EMBEDDING_DIR", BASE_DIR / ".embeddings"))
+_EMBEDDING_FORMAT = 1  # bump when the stored projection changes
+
+# Above this many rows the projection is fitted in mini-batches (IncrementalPCA)
+INCREMENTAL_PCA_ROWS = 1_000_000
+_PCA_BATCH_ROWS = 100_000
+
+# Silhouette needs all pairwise distances, so separation is scored on several
+# proportionally stratified samples; the spread across them shows how stable
+# the score is. Sample rows^2 x samples above PARALLEL_MIN_WORK use a process pool.
+SEPARATION_SAMPLES = 5
+SAMPLE_ROWS = 4_000
+MIN_ROWS_PER_CLUSTER = 50
+PARALLEL_MIN_WORK = 200_000_000
+
+DENSITY_BINS = 80
+
+
+def _read_only(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+# ==========================
+# EMBEDDING (DISK-CACHED)
+# ==========================
+def _embedding_path(version, cluster_col, features):
+    digest = hashlib.sha1(repr((cluster_col, tuple(features), _EMBEDDING_FORMAT)).encode()).hexdigest()[:12]
+    return EMBEDDING_DIR / f"{version}-{digest}.npz"
+
+
+def _compute_embedding(cluster_col, features):
+    raw, labels = [], []
+    for batch in scan_batches([cluster_col] + features):
+        raw.append(batch[features].to_numpy(dtype=np.float32))
+        labels.append(batch[cluster_col].to_numpy())
+    z = np.concatenate(raw) if raw else np.zeros((0, len(features)), dtype=np.float32)
+    codes, clusters = pd.factorize(np.concatenate(labels) if labels else np.array([]), sort=True)
+
+    # Standardize in place; a constant feature only gets centred
+    mean, std = np.nanmean(z, axis=0), np.nanstd(z, axis=0)
+    z -= mean
+    z /= np.where(std > 0, std, 1)
+    z[np.isnan(z)] = 0
+
+    if len(z) > INCREMENTAL_PCA_ROWS:
+        pca = IncrementalPCA(n_components=2, batch_size=_PCA_BATCH_ROWS).fit(z)
+    else:
+        pca = PCA(n_components=2, random_state=0).fit(z)
+
+    return {
+        "embedding": pca.transform(z).astype(np.float32),
+        "features_z": z,
+        "codes": codes.astype(np.int32),
+        # String labels are stored as fixed-width text (no pickling on disk)
+        "clusters": clusters.astype(str) if clusters.dtype == object else clusters,
+        "feature_mean": mean,
+        "feature_std": std,
+        "components": pca.components_,
+        "explained_variance_ratio": pca.explained_variance_ratio_,
+    }
+
+
+@st.cache_resource(show_spinner="Projecting cluster features...")
+def _load_embedding(version, cluster_col, features):
+    path = _embedding_path(version, cluster_col, features)
+    if path.exists():
+        with np.load(path, allow_pickle=False) as stored:
+            result = {k: stored[k] for k in stored.files}
+    else:
+        result = _compute_embedding(cluster_col, list(features))
+        EMBEDDING_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, **result)
+        os.replace(tmp, path)
+    return {k: _read_only(v) for k, v in result.items()}
+
+
+def cluster_embedding(cluster_col, features=DIAGNOSTIC_FEATURES):
+    """2D PCA projection of the standardized features of every hold, in dataset row order.
+
+    Keys: ``embedding`` (rows x 2), ``features_z`` (rows x features), ``codes``
+    (per-row position in ``clusters``, -1 when missing), ``clusters``,
+    ``components`` and ``explained_variance_ratio``. Arrays are read-only.
+    """
+    return _load_embedding(dataset_version(), cluster_col, tuple(features))
+
+
+def _selection(filters, clusters, data):
+    """Rows (dataset order) passing ``filters`` whose cluster is one of ``clusters``."""
+    keep = np.isin(data["codes"], np.flatnonzero(np.isin(data["clusters"], list(clusters))))
+    if filters:
+        cols = list(filters)
+        keep &= np.concatenate([row_mask(batch, filters) for batch in scan_batches(cols)])
+    return np.flatnonzero(keep)
+
+
+# ==========================
+# DIAGNOSTICS
+# ==========================
+def _score_sample(sample):
+    z, labels = sample
+    return silhouette_score(z, labels), davies_bouldin_score(z, labels)
+
+
+def _stratified_sample(codes, rows, size, seed):
+    rng = np.random.default_rng(seed)
+    picked = []
+    for c in np.unique(codes[rows]):
+        members = rows[codes[rows] == c]
+        n = min(len(members), max(MIN_ROWS_PER_CLUSTER, round(size * len(members) / len(rows))))
+        picked.append(rng.choice(members, n, replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def _diagnose(cluster_col, features, clusters, frozen, n_samples, sample_rows, max_workers):
+    data = cluster_embedding(cluster_col, features)
+    rows = _selection(thaw_filters(frozen), clusters, data)
+    codes, z = data["codes"], data["features_z"]
+    present = np.unique(codes[rows])
+    names = data["clusters"][present]
+
+    # Per-feature z-scored centroids and holds per cluster
+    counts = np.bincount(codes[rows], minlength=len(data["clusters"]))[present]
+    sums = np.zeros((len(data["clusters"]), len(features)))
+    np.add.at(sums, codes[rows], z[rows])
+    centroids = pd.DataFrame(sums[present] / counts[:, None], columns=list(features))
+    centroids.insert(0, cluster_col, names)
+    centroids.insert(1, "holds", counts)
+
+    scores = pd.DataFrame(columns=["sample", "rows", "silhouette", "davies_bouldin"])
+    if len(present) >= 2:
+        samples = [_stratified_sample(codes, rows, sample_rows, seed) for seed in range(n_samples)]
+        work = [(z[s], codes[s]) for s in samples]
+        if sum(len(s) ** 2 for s in samples) >= PARALLEL_MIN_WORK:
+            # spawn: forking a multi-threaded Streamlit server is not safe
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn")) as pool:
+                results = list(pool.map(_score_sample, work))
+        else:
+            results = [_score_sample(w) for w in work]
+        scores = pd.DataFrame({
+            "sample": np.arange(1, n_samples + 1),
+            "rows": [len(s) for s in samples],
+            "silhouette": [r[0] for r in results],
+            "davies_bouldin": [r[1] for r in results],
+        })
+    return centroids, scores
+
+
+def cluster_diagnostics(cluster_col, clusters, filters=None, features=DIAGNOSTIC_FEATURES,
+                        n_samples=SEPARATION_SAMPLES, sample_rows=SAMPLE_ROWS, max_workers=None):
+    """How well ``clusters`` are separated on the standardized features.
+
+    Returns ``(centroids, scores)``: the mean z-score of every feature per
+    cluster (with its ``holds``), and silhouette / Davies–Bouldin scores of
+    each stratified sample (empty with fewer than two clusters). Cached per
+    filter set.
+    """
+    clusters, features = tuple(clusters), tuple(features)
+    frozen = freeze_filters(filters)
+    return get_result_cache().get_or_compute(
+        "cluster_diagnostics",
+        (cluster_col, clusters, features, n_samples, sample_rows, selection_hash(filters)),
+        lambda: _diagnose(cluster_col, features, clusters, frozen, n_samples, sample_rows, max_workers),
+    )
+
+
+def _bin(cluster_col, features, clusters, frozen, bins):
+    data = cluster_embedding(cluster_col, features)
+    rows = _selection(thaw_filters(frozen), clusters, data)
+    emb, codes = data["embedding"], data["codes"]
+    if not len(rows):
+        return pd.DataFrame(columns=[cluster_col, "pc1", "pc2", "holds"])
+
+    # Shared edges over the whole dataset, so views stay comparable as filters change
+    edges = [np.linspace(emb[:, i].min(), emb[:, i].max(), bins + 1) for i in range(2)]
+    centers = [(e[:-1] + e[1:]) / 2 for e in edges]
+    frames = []
+    for c in np.unique(codes[rows]):
+        pts = emb[rows[codes[rows] == c]]
+        counts, _, _ = np.histogram2d(pts[:, 0], pts[:, 1], bins=edges)
+        ix, iy = np.nonzero(counts)
+        frames.append(pd.DataFrame({
+            cluster_col: data["clusters"][c],
+            "pc1": centers[0][ix],
+            "pc2": centers[1][iy],
+            "holds": counts[ix, iy].astype(np.int64),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def embedding_density(cluster_col, clusters, filters=None, features=DIAGNOSTIC_FEATURES, bins=DENSITY_BINS):
+    """Occupied cells of a ``bins`` x ``bins`` grid over the 2D projection, per cluster.
+
+    One row per (cluster, cell) with the cell centre (``pc1``, ``pc2``) and its
+    ``holds``; the chart size is bounded by the grid, not the number of holds.
+    """
+    clusters, features = tuple(clusters), tuple(features)
+    frozen = freeze_filters(filters)
+    return get_result_cache().get_or_compute(
+        "embedding_density",
+        (cluster_col, clusters, features, bins, selection_hash(filters)),
+        lambda: _bin(cluster_col, features, clusters, frozen, bins),
+    )
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import aggregate, scan_batches
+from utils.result_cache import get_result_cache
+from utils.selection import selection_hash
+
+# ==========================
+# COHORT MATRIX
+# ==========================
+# Holds are grouped into monthly cohorts by their start_date. Each hold's days
+# (and its fee loss, pro rata per day) are spread over the calendar months it
+# spans, giving a (cohort x months-since-start) matrix. Every batch adds into
+# the same matrix with one bincount, so it streams in out-of-core mode too.
+COHORT_DATE_COL = "start_date"
+COHORT_COLUMNS = [COHORT_DATE_COL, "hold_duration_days", "fee_loss"]
+_MEASURES = ["cohort_holds", "active_holds", "ended_holds", "hold_days", "fee_loss"]
+_CUMULATIVE = ["cum_ended_holds", "cum_hold_days", "cum_fee_loss"]
+
+
+def _month_number(dates):
+    """Months since 1970-01 of each datetime64 value."""
+    return dates.astype("datetime64[M]").astype(np.int64)
+
+
+def _batch_counts(batch, first_month, n_cohorts, n_ages):
+    batch = batch.dropna(subset=[COHORT_DATE_COL, "hold_duration_days"])
+    start = batch[COHORT_DATE_COL].to_numpy().astype("datetime64[D]")
+    duration = np.clip(batch["hold_duration_days"].to_numpy(dtype=float), 0, None)
+    fee_loss = batch["fee_loss"].fillna(0).to_numpy(dtype=float)
+    end = start + duration.astype(np.int64).astype("timedelta64[D]")
+
+    # Overlap (in days) of every hold with each of the calendar months after its start
+    ages = np.arange(n_ages)
+    month_lo = (start.astype("datetime64[M]")[:, None] + ages).astype("datetime64[D]")
+    month_hi = (start.astype("datetime64[M]")[:, None] + ages + 1).astype("datetime64[D]")
+    lo = np.maximum(month_lo, start[:, None])
+    hi = np.minimum(month_hi, end[:, None])
+    days = np.clip((hi - lo).astype(np.int64), 0, None).astype(float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_day = np.where(duration > 0, fee_loss / duration, 0.0)
+    loss = days * per_day[:, None]
+    # Zero-day holds book their whole fee loss in the start month
+    loss[:, 0] += np.where(duration > 0, 0.0, fee_loss)
+
+    cohort = _month_number(start) - first_month
+    cell = (cohort[:, None] * n_ages + ages).ravel()
+    n_cells = n_cohorts * n_ages
+    codes = np.concatenate([cell + i * n_cells for i in range(len(_MEASURES))])
+    started = np.broadcast_to(ages == 0, days.shape)
+    # A hold ends in the month of its last day (zero-day holds in their start month)
+    last_day = np.maximum(end - np.timedelta64(1, "D"), start)
+    end_age = np.minimum(_month_number(last_day) - _month_number(start), n_ages - 1)
+    ended = ages == end_age[:, None]
+    weights = np.concatenate([started.ravel(), (days > 0).ravel(), ended.ravel(), days.ravel(), loss.ravel()])
+    return np.bincount(codes, weights=weights, minlength=len(_MEASURES) * n_cells)
+
+
+def _build_matrix(filters):
+    bounds = aggregate([], ["hold_duration_days", COHORT_DATE_COL], ["max", "min"], filters=filters).iloc[0]
+    first = bounds[f"{COHORT_DATE_COL}_min"]
+    last = bounds[f"{COHORT_DATE_COL}_max"]
+    if pd.isna(first):
+        return pd.DataFrame(columns=["cohort", "months_since_start"] + _MEASURES + _CUMULATIVE)
+
+    first_month = _month_number(np.array([first], dtype="datetime64[D]"))[0]
+    n_cohorts = int(_month_number(np.array([last], dtype="datetime64[D]"))[0] - first_month) + 1
+    # A hold of d days touches at most ceil(d / 28) + 1 calendar months
+    n_ages = int(np.ceil(max(bounds["hold_duration_days_max"], 0) / 28)) + 1
+
+    counts = np.zeros(len(_MEASURES) * n_cohorts * n_ages)
+    for batch in scan_batches(COHORT_COLUMNS, filters):
+        counts += _batch_counts(batch, first_month, n_cohorts, n_ages)
+    counts = counts.reshape(len(_MEASURES), n_cohorts, n_ages)
+
+    cohorts = pd.period_range(pd.Timestamp(first).to_period("M"), periods=n_cohorts, freq="M")
+    matrix = pd.DataFrame({
+        "cohort": np.repeat(cohorts.astype(str), n_ages),
+        "months_since_start": np.tile(np.arange(n_ages), n_cohorts),
+    })
+    for i, measure in enumerate(_MEASURES):
+        matrix[measure] = counts[i].ravel()
+    holds = ["cohort_holds", "active_holds", "ended_holds"]
+    matrix[holds] = matrix[holds].astype(np.int64)
+
+    # Every hold is counted once in its cohort's size; drop empty cohorts and ages no hold reaches
+    matrix["cohort_holds"] = matrix.groupby("cohort")["cohort_holds"].transform("sum")
+    reached = matrix.groupby("months_since_start")["active_holds"].transform("sum") > 0
+    matrix = matrix[(matrix["cohort_holds"] > 0) & reached].reset_index(drop=True)
+
+    running = matrix.groupby("cohort")[["ended_holds", "hold_days", "fee_loss"]].cumsum()
+    matrix[_CUMULATIVE] = running.set_axis(_CUMULATIVE, axis=1)
+    return matrix
+
+
+def cohort_matrix(filters=None):
+    """Long-form cohort matrix, one row per (cohort, months since start).
+
+    Columns: ``cohort`` ("YYYY-MM" of start_date), ``months_since_start``,
+    ``active_holds`` (holds still running that month), ``ended_holds`` (holds
+    whose last day falls in that month), ``hold_days`` and ``fee_loss`` accrued
+    that month, their running totals ``cum_ended_holds`` / ``cum_hold_days`` /
+    ``cum_fee_loss`` and ``cohort_holds`` (holds that started in the cohort).
+    Cached per dataset version and filter set.
+    """
+    return get_result_cache().get_or_compute("cohort_matrix", selection_hash(filters), lambda: _build_matrix(filters))
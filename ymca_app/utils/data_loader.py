@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from pathlib import Path
+
+# ==========================
+# DATASET LOCATION
+# ==========================
+BASE_DIR = Path(__file__).resolve().parent.parent      # ymca_app/
+DATA_PATH = BASE_DIR / "ymca_clusters.xlsx"
+
+
+def dataset_version(path=DATA_PATH):
+    """Cheap fingerprint of the dataset file (mtime + size).
+
+    Used as a cache key so every cached resource is rebuilt when the file changes.
+    """
+    stat = Path(path).stat()
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def _freeze(df):
+    """Return a frame whose NumPy buffers are read-only.
+
+    Any attempt to write into the shared dataset in place raises instead of
+    silently corrupting the copy every other session is looking at.
+    """
+    cols = {}
+    for col in df.columns:
+        s = df[col]
+        if s.dtype.kind in "biufcmMO":
+            arr = np.array(s.to_numpy(), copy=True)
+            arr.flags.writeable = False
+            cols[col] = pd.Series(arr, name=col, index=df.index, copy=False)
+        else:
+            # Arrow-backed columns (e.g. pandas str dtype) are already immutable
+            cols[col] = s
+    return pd.DataFrame(cols, index=df.index, copy=False)
+
+
+@st.cache_resource(show_spinner="Loading YMCA dataset...")
+def _load_shared(version):
+    df = pd.read_excel(DATA_PATH, engine="openpyxl")
+
+    # Convert date column if present
+    if "start_date" in df.columns:
+        df["start_date"] = pd.to_datetime(df["start_date"], errors="coerce")
+
+    # Ensure year / month fields exist for the time-based pages
+    if "hold_year" not in df.columns and "start_date" in df.columns:
+        df["hold_year"] = df["start_date"].dt.year
+    if "hold_month" not in df.columns and "start_date" in df.columns:
+        df["hold_month"] = df["start_date"].dt.month
+
+    return _freeze(df)
+
+
+def load_data():
+    """Return a zero-copy view of the process-wide hold dataset.
+
+    The dataset is loaded once per file version and shared by every page and
+    session (``st.cache_resource``), instead of being unpickled again on every
+    rerun like ``st.cache_data`` does. The returned frame is a shallow view:
+    pages may add their own derived columns to it without affecting anyone else,
+    but the underlying buffers are read-only.
+    """
+    return _load_shared(dataset_version()).copy(deep=False)
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import dataset_columns, scan_batches
+from utils.result_cache import get_result_cache
+
+# ==========================
+# RULE DEFINITIONS
+# ==========================
+# A rule names the columns it reads and a vectorized check returning a boolean
+# mask of the rows that PASS. Rules whose columns are missing from the dataset
+# are skipped. Range, set and cross-column rules ignore missing values; the
+# completeness rules report those.
+FEE_PERIOD_DAYS = 14  # membership fees are billed per two weeks
+FEE_LOSS_TOLERANCE = 0.01  # relative, with a $1 floor for small holds
+EARLIEST_START = pd.Timestamp("2000-01-01")
+
+KNOWN_VALUES = {
+    "application_package_category": ["Annual", "Continuous"],
+    "application_subscription_membership_type": ["Access", "Enhanced", "EnhancedPlus", "Essential", "EssentialPlus"],
+    "reason_for_hold": [
+        "Medical/Health", "Other", "Other Recreation Alternatives", "Program or Service Gap",
+        "Schedule Conflict (Busy)", "Vacation",
+    ],
+    "application_contact_age_category": ["Adult", "ChildYouth", "Infant", "Senior", "Young"],
+    "application_contact_gender": ["Female", "Male", "Not Specified"],
+    "hold_duration_group": ["0-30 days", "31-60", "61-120", "121-365", "1+ year"],
+    "cluster_name": ["Non-Plus", "Plus"],
+    "cluster_label": [0, 1],
+}
+DURATION_GROUPS = [(0, 30, "0-30 days"), (31, 60, "31-60"), (61, 120, "61-120"), (121, 365, "121-365"),
+                   (366, np.inf, "1+ year")]
+AGE_CATEGORY_RANGES = {"Infant": (0, 1), "ChildYouth": (0, 17), "Young": (14, 25), "Adult": (22, 64),
+                       "Senior": (61, 120)}
+CLUSTER_NAMES = {0: "Non-Plus", 1: "Plus"}
+
+
+def _rule(rule_id, category, description, columns, check):
+    return {"rule": rule_id, "category": category, "description": description, "columns": columns, "check": check}
+
+
+def not_null(col):
+    return _rule(f"{col}_present", "Completeness", f"{col} is filled in", [col], lambda b: b[col].notna().to_numpy())
+
+
+def in_range(col, lo=None, hi=None):
+    def check(b):
+        x = b[col]
+        ok = x.isna() | ((x >= lo) if lo is not None else True) & ((x <= hi) if hi is not None else True)
+        return np.asarray(ok, dtype=bool)
+
+    bounds = f"between {lo} and {hi}" if lo is not None and hi is not None else (
+        f"at least {lo}" if lo is not None else f"at most {hi}"
+    )
+    return _rule(f"{col}_range", "Validity", f"{col} is {bounds}", [col], check)
+
+
+def in_set(col, values):
+    return _rule(
+        f"{col}_known", "Validity", f"{col} is one of {len(values)} known values", [col],
+        lambda b: (b[col].isna() | b[col].isin(values)).to_numpy(),
+    )
+
+
+def _fee_loss_consistent(b):
+    expected = b["membership_fee"] * b["hold_duration_days"] / FEE_PERIOD_DAYS
+    ok = (b["fee_loss"] - expected).abs() <= np.maximum(FEE_LOSS_TOLERANCE * expected.abs(), 1.0)
+    return (ok | expected.isna() | b["fee_loss"].isna()).to_numpy()
+
+
+def _start_date_in_range(b):
+    day = b["start_date"]
+    return (day.isna() | ((day >= EARLIEST_START) & (day <= pd.Timestamp.now()))).to_numpy()
+
+
+def _period_matches(b):
+    year, month = b["start_date"].dt.year, b["start_date"].dt.month
+    return (b["start_date"].isna() | ((b["hold_year"] == year) & (b["hold_month"] == month))).to_numpy()
+
+
+def _quarter_matches(b):
+    quarter = b["start_date"].dt.to_period("Q").astype(str)
+    return (b["start_date"].isna() | b["hold_quarter"].isna() | (b["hold_quarter"].astype(str) == quarter)).to_numpy()
+
+
+def _duration_group_matches(b):
+    days, group = b["hold_duration_days"], b["hold_duration_group"]
+    ok = days.isna() | group.isna() | ~group.isin([g for _, _, g in DURATION_GROUPS])
+    for lo, hi, label in DURATION_GROUPS:
+        ok |= (group == label) & (days >= lo) & (days <= hi)
+    return ok.to_numpy()
+
+
+def _age_category_matches(b):
+    age, category = b["age_at_hold"], b["application_contact_age_category"]
+    ok = age.isna() | category.isna() | ~category.isin(list(AGE_CATEGORY_RANGES))
+    for label, (lo, hi) in AGE_CATEGORY_RANGES.items():
+        ok |= (category == label) & (age >= lo) & (age <= hi)
+    return ok.to_numpy()
+
+
+def _cluster_name_matches(b):
+    expected = b["cluster_label"].map(CLUSTER_NAMES)
+    return (expected.isna() | b["cluster_name"].isna() | (b["cluster_name"] == expected)).to_numpy()
+
+
+RULES = (
+    [
+        not_null(c) for c in [
+            "membership_location", "start_date", "membership_fee", "hold_duration_days", "fee_loss",
+            "reason_for_hold", "application_package_category", "application_subscription_membership_type",
+            "application_contact_age_category", "application_contact_gender", "age_at_hold", "cluster_label",
+        ]
+    ]
+    + [
+        in_range("membership_fee", 0, 500),
+        in_range("hold_duration_days", 1, 3650),
+        in_range("fee_loss", 0),
+        in_range("age_at_hold", 0, 120),
+        in_range("avg_hold_contact", 0),
+        _rule("start_date_range", "Validity", f"start_date is between {EARLIEST_START:%Y-%m-%d} and today",
+              ["start_date"], _start_date_in_range),
+    ]
+    + [in_set(col, values) for col, values in KNOWN_VALUES.items()]
+    + [
+        _rule("fee_loss_consistent", "Consistency",
+              f"fee_loss = membership_fee × hold_duration_days / {FEE_PERIOD_DAYS} (±1%, min $1)",
+              ["fee_loss", "membership_fee", "hold_duration_days"], _fee_loss_consistent),
+        _rule("hold_period_matches", "Consistency", "hold_year / hold_month match start_date",
+              ["start_date", "hold_year", "hold_month"], _period_matches),
+        _rule("hold_quarter_matches", "Consistency", "hold_quarter matches start_date",
+              ["start_date", "hold_quarter"], _quarter_matches),
+        _rule("duration_group_matches", "Consistency", "hold_duration_group matches hold_duration_days",
+              ["hold_duration_days", "hold_duration_group"], _duration_group_matches),
+        _rule("age_category_matches", "Consistency", "application_contact_age_category fits age_at_hold",
+              ["age_at_hold", "application_contact_age_category"], _age_category_matches),
+        _rule("cluster_name_matches", "Consistency", "cluster_name matches cluster_label",
+              ["cluster_label", "cluster_name"], _cluster_name_matches),
+    ]
+)
+
+
+def applicable_rules(columns, rules=RULES):
+    """Rules whose columns are all present."""
+    columns = set(columns)
+    return [r for r in rules if set(r["columns"]) <= columns]
+
+
+# ==========================
+# INCREMENTAL EVALUATION
+# ==========================
+class QualityReport:
+    """Violation counts and sample rows, accumulated batch by batch.
+
+    ``add`` evaluates every rule on a batch (one vectorized mask per rule) and
+    merges the result, so a newly ingested batch is checked without going
+    back over earlier ones. Sample rows are positions in the order batches
+    were added.
+    """
+
+    def __init__(self, rules, sample_rows=20):
+        self.rules = list(rules)
+        self.sample_rows = sample_rows
+        self.rows = 0
+        self.rows_with_violations = 0
+        self.violations = np.zeros(len(self.rules), dtype=np.int64)
+        self.samples = [[] for _ in self.rules]
+
+    def add(self, batch):
+        failed_any = np.zeros(len(batch), dtype=bool)
+        for i, rule in enumerate(self.rules):
+            failed = ~rule["check"](batch)
+            failed_any |= failed
+            self.violations[i] += int(failed.sum())
+            room = self.sample_rows - len(self.samples[i])
+            if room > 0:
+                self.samples[i].extend((self.rows + np.flatnonzero(failed)[:room]).tolist())
+        self.rows_with_violations += int(failed_any.sum())
+        self.rows += len(batch)
+        return self
+
+    def summary(self):
+        """One row per rule: ``rule``, ``category``, ``description``, ``violations``, ``violation_pct``."""
+        out = pd.DataFrame({
+            "rule": [r["rule"] for r in self.rules],
+            "category": [r["category"] for r in self.rules],
+            "description": [r["description"] for r in self.rules],
+            "violations": self.violations,
+        })
+        out["violation_pct"] = out["violations"] / max(self.rows, 1) * 100
+        out.attrs["rows"] = self.rows
+        out.attrs["rows_with_violations"] = self.rows_with_violations
+        return out
+
+
+def _check_dataset():
+    rules = applicable_rules(dataset_columns())
+    columns = sorted({c for r in rules for c in r["columns"]})
+    report = QualityReport(rules)
+    for batch in scan_batches(columns):
+        report.add(batch)
+    return report.summary(), {r["rule"]: s for r, s in zip(rules, report.samples)}
+
+
+def data_quality_report():
+    """Rule results over the whole dataset in one pass: ``(summary, sample_rows)``.
+
+    ``sample_rows`` maps a rule id to up to 20 violating row positions of the
+    shared frame. Cached per dataset version.
+    """
+    return get_result_cache().get_or_compute("data_quality", (), _check_dataset)
@@ -0,0 +1,179 @@
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+
+from utils.aggregates import dataset_columns, sample
+from utils.data_loader import dataset_version
+from utils.executive_report import find_cluster_col
+
+# ==========================
+# RETENTION RISK SCORE
+# ==========================
+def retention_risk_score(df):
+    """0–100 risk per hold: 60% min-max scaled hold duration + 40% min-max scaled fee loss."""
+    def scaled(s):
+        return (s - s.min()) / (s.max() - s.min() + 1e-9)
+
+    return (0.6 * scaled(df["hold_duration_days"]) + 0.4 * scaled(df["fee_loss"])) * 100
+
+
+# ==========================
+# DRIVER MODELS
+# ==========================
+# One gradient-boosted tree model per target learns fee loss (or the retention
+# risk score) from every driver jointly. Segment columns are native categorical
+# splits; missing values go to whichever side of a split fits best.
+SEGMENT_DRIVERS = {
+    "Location": "membership_location",
+    "Package Category": "application_package_category",
+    "Membership Type": "application_subscription_membership_type",
+    "Age Category": "application_contact_age_category",
+    "Reason for Hold": "reason_for_hold",
+    "Gender": "application_contact_gender",
+}
+NUMERIC_DRIVERS = {
+    "Hold Duration (Days)": "hold_duration_days",
+    "Membership Fee": "membership_fee",
+    "Age at Hold": "age_at_hold",
+}
+TARGETS = {"Fee Loss": "fee_loss", "Retention Risk": "retention_risk_score"}
+
+# Larger datasets are trained on a uniform sample of this many holds
+TRAIN_ROWS = 200_000
+TEST_SHARE = 0.2
+PERMUTATION_REPEATS = 5
+# Partial dependence averages predictions over this many holds per grid point
+PDP_ROWS = 2_000
+PDP_GRID = 20
+# Test rows x drivers x repeats above which permutations run on a worker pool
+PARALLEL_MIN_WORK = 5_000_000
+
+
+def driver_columns(columns):
+    """``label -> column`` of the drivers present in this dataset (plus the cluster column)."""
+    drivers = {label: col for label, col in SEGMENT_DRIVERS.items() if col in columns}
+    cluster_col = find_cluster_col(columns)
+    if cluster_col is not None:
+        drivers["Cluster"] = cluster_col
+    drivers.update({label: col for label, col in NUMERIC_DRIVERS.items() if col in columns})
+    return drivers
+
+
+def _design_matrix(df, drivers):
+    """Float matrix with segment columns as category codes (NaN when missing)."""
+    X, categories = [], {}
+    for col in drivers.values():
+        if col in NUMERIC_DRIVERS.values():
+            X.append(df[col].to_numpy(dtype=float))
+        else:
+            codes, values = pd.factorize(df[col], sort=True)
+            X.append(np.where(codes >= 0, codes, np.nan))
+            categories[col] = values.tolist()
+    return np.column_stack(X), categories
+
+
+_worker_model = None
+
+
+def _init_worker(model):
+    # The fitted model is sent to each worker once, not once per driver
+    global _worker_model
+    _worker_model = model
+
+
+def _partial_dependence(task):
+    j, grid, X = task
+    # Every grid value is set on every row at once: one predict call per driver
+    stacked = np.repeat(X[None, :, :], len(grid), axis=0)
+    stacked[:, :, j] = np.asarray(grid)[:, None]
+    pred = _worker_model.predict(stacked.reshape(-1, X.shape[1])).reshape(len(grid), len(X))
+    return pred.mean(axis=1)
+
+
+def _fit_drivers(target, max_workers):
+    drivers = driver_columns(dataset_columns())
+    needed = list(drivers.values()) + ["fee_loss", "hold_duration_days"]
+    df = sample(needed, TRAIN_ROWS)
+    df = df[df["fee_loss"].notna() & df["hold_duration_days"].notna()]
+    y = (retention_risk_score(df) if TARGETS[target] == "retention_risk_score" else df["fee_loss"]).to_numpy()
+    X, categories = _design_matrix(df, drivers)
+    is_cat = np.array([col in categories for col in drivers.values()])
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SHARE, random_state=0)
+    model = HistGradientBoostingRegressor(categorical_features=is_cat, random_state=0).fit(X_train, y_train)
+
+    # Permutation importance: R^2 lost on held-out holds when a driver is shuffled
+    parallel = len(X_test) * X.shape[1] * PERMUTATION_REPEATS >= PARALLEL_MIN_WORK
+    perm = permutation_importance(
+        model, X_test, y_test, n_repeats=PERMUTATION_REPEATS, random_state=0,
+        n_jobs=max_workers if parallel else None,
+    )
+    importance = pd.DataFrame({
+        "driver": list(drivers),
+        "column": list(drivers.values()),
+        "importance": perm.importances_mean,
+        "importance_std": perm.importances_std,
+    }).sort_values("importance", ascending=False, ignore_index=True)
+
+    # Partial dependence on a grid of each driver's values (categories, or quantiles)
+    rng = np.random.default_rng(0)
+    X_pdp = X_test[rng.choice(len(X_test), min(PDP_ROWS, len(X_test)), replace=False)]
+    tasks = []
+    for j, col in enumerate(drivers.values()):
+        if col in categories:
+            grid = np.arange(len(categories[col]), dtype=float)
+        else:
+            grid = np.unique(np.nanquantile(X[:, j], np.linspace(0.05, 0.95, PDP_GRID)))
+        tasks.append((j, grid, X_pdp))
+    if parallel:
+        # spawn: forking a multi-threaded Streamlit server is not safe
+        with ProcessPoolExecutor(
+            max_workers=max_workers if max_workers and max_workers > 0 else None,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model,),
+        ) as pool:
+            curves = list(pool.map(_partial_dependence, tasks))
+    else:
+        _init_worker(model)
+        curves = [_partial_dependence(t) for t in tasks]
+
+    pdp = []
+    for (label, col), (j, grid, _), curve in zip(drivers.items(), tasks, curves):
+        values = categories[col] if col in categories else grid.tolist()
+        pdp.append(pd.DataFrame({"driver": label, "value": values, "prediction": curve}))
+
+    return {
+        "model": model,
+        "drivers": drivers,
+        "categories": categories,
+        "importance": importance,
+        "partial_dependence": pd.concat(pdp, ignore_index=True),
+        "r2_test": r2_score(y_test, model.predict(X_test)),
+        "train_rows": len(X_train),
+        "test_rows": len(X_test),
+        "baseline": float(np.mean(y)),
+    }
+
+
+@st.cache_resource(show_spinner="Training driver model...")
+def _build_driver_model(version, target, max_workers):
+    return _fit_drivers(target, max_workers)
+
+
+def driver_analysis(target="Fee Loss", max_workers=-1):
+    """Driver model for ``target`` (a key of ``TARGETS``) with its attributions.
+
+    Trained once per dataset version on all holds (global filters do not
+    apply). Returns a dict with the fitted ``model``, ``importance``
+    (permutation importance per driver, in held-out R^2), ``partial_dependence``
+    (average prediction per driver value), ``r2_test`` and row counts.
+    """
+    return _build_driver_model(dataset_version(), target, max_workers)
@@ -0,0 +1,236 @@
+import base64
+import html
+import importlib.util
+import io
+import multiprocessing as mp
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+from utils.aggregates import aggregate, dataset_columns
+
+# ==========================
+# EXECUTIVE SUMMARY CUBE
+# ==========================
+# Every number on the Executive Summary can be derived from this small cube of
+# (location x reason x cluster) sums and counts, so reports never touch raw rows.
+CUBE_KEYS = ["membership_location", "reason_for_hold"]
+CUBE_VALUES = ["fee_loss", "hold_duration_days"]
+
+HAS_STATIC_EXPORT = importlib.util.find_spec("kaleido") is not None
+
+
+def find_cluster_col(columns):
+    for c in columns:
+        if "cluster_label" in c.lower() or "cluster_name" in c.lower():
+            return c
+    return None
+
+
+def executive_cube(filters=None):
+    """Sum / count cube used by the Executive Summary page and the report pack.
+
+    Rows whose location, reason or cluster is missing keep a cell of their own,
+    so the headline totals cover every hold.
+    """
+    columns = dataset_columns()
+    cluster_col = find_cluster_col(columns)
+    keys = [c for c in CUBE_KEYS + [cluster_col] if c is not None and c in columns]
+    values = [c for c in CUBE_VALUES if c in columns]
+    return aggregate(keys, values, ["sum", "count"], filters=filters, dropna=False), cluster_col
+
+
+def summarize(cube, cluster_col=None, location=None, cluster=None):
+    """Executive Summary numbers for the whole dataset or one location / cluster."""
+    sub = cube
+    if location is not None:
+        sub = sub[sub["membership_location"] == location]
+    if cluster is not None:
+        sub = sub[sub[cluster_col] == cluster]
+
+    has_loss = "fee_loss_sum" in sub.columns
+    has_hold = "hold_duration_days_sum" in sub.columns
+    hold_count = sub["hold_duration_days_count"].sum() if has_hold else 0
+
+    summary = {
+        "total_records": int(sub["rows"].sum()),
+        "total_fee_loss": sub["fee_loss_sum"].sum() if has_loss else 0,
+        "avg_hold": sub["hold_duration_days_sum"].sum() / hold_count if hold_count else 0,
+        "loc_loss": None,
+        "reason_loss": None,
+        "cluster_summary": None,
+    }
+    if not has_loss:
+        return summary
+
+    if "membership_location" in sub.columns:
+        summary["loc_loss"] = (
+            sub.groupby("membership_location")["fee_loss_sum"].sum()
+            .rename("fee_loss").reset_index()
+            .sort_values("fee_loss", ascending=False)
+        )
+    if "reason_for_hold" in sub.columns:
+        summary["reason_loss"] = (
+            sub.groupby("reason_for_hold")["fee_loss_sum"].sum()
+            .rename("fee_loss").reset_index()
+            .sort_values("fee_loss", ascending=False)
+        )
+    if cluster_col is not None:
+        cl = sub.groupby(cluster_col)[["fee_loss_sum", "fee_loss_count"]].sum()
+        summary["cluster_summary"] = pd.DataFrame({
+            "Total Fee Loss": cl["fee_loss_sum"],
+            "Avg Fee Loss": cl["fee_loss_sum"] / cl["fee_loss_count"],
+            "Members": cl["fee_loss_count"],
+        }).reset_index()
+    return summary
+
+
+# ==========================
+# HEADLESS RENDERING
+# ==========================
+def _figures(summary, title):
+    figs = []
+    if summary["loc_loss"] is not None and len(summary["loc_loss"]) > 1:
+        figs.append(px.bar(
+            summary["loc_loss"].head(5),
+            x="membership_location",
+            y="fee_loss",
+            title=f"Top Locations by Fee Loss – {title}",
+            color="fee_loss",
+            color_continuous_scale="Reds"
+        ))
+    if summary["reason_loss"] is not None:
+        fig = px.bar(
+            summary["reason_loss"],
+            x="reason_for_hold",
+            y="fee_loss",
+            title=f"Fee Loss by Hold Reason – {title}",
+        )
+        fig.update_layout(xaxis_tickangle=-35)
+        figs.append(fig)
+    return figs
+
+
+def _figure_html(fig, static_images):
+    if static_images:
+        png = pio.to_image(fig, format="png", width=1000, height=500)
+        return f"<img src='data:image/png;base64,{base64.b64encode(png).decode()}' style='width:100%'>"
+    return pio.to_html(fig, full_html=False, include_plotlyjs=False)
+
+
+def render_report_html(summary, title, cluster_col=None, static_images=HAS_STATIC_EXPORT):
+    """Standalone HTML Executive Summary report for one slice of the data."""
+    parts = [
+        "<html><head><meta charset='utf-8'>",
+        f"<title>Executive Summary – {html.escape(title)}</title>",
+        "" if static_images else "<script src='https://cdn.plot.ly/plotly-2.35.2.min.js'></script>",
+        "<style>body{font-family:sans-serif;margin:40px;color:#222} h1{color:#8b0000}"
+        " .kpi{display:inline-block;margin-right:40px} .kpi b{font-size:26px;display:block}"
+        " table{border-collapse:collapse} td,th{border:1px solid #ddd;padding:4px 10px}</style>",
+        "</head><body>",
+        f"<h1>📋 Executive Summary – {html.escape(title)}</h1>",
+        f"<p>YMCA hold behaviour report generated {date.today():%Y-%m-%d}.</p>",
+        f"<div class='kpi'>Total Hold Records<b>{summary['total_records']:,}</b></div>",
+        f"<div class='kpi'>Total Estimated Fee Loss<b>${summary['total_fee_loss']:,.0f}</b></div>",
+        f"<div class='kpi'>Average Hold Duration<b>{summary['avg_hold']:.1f} days</b></div>",
+        "<hr>",
+    ]
+    for fig in _figures(summary, title):
+        parts.append(_figure_html(fig, static_images))
+
+    cluster_summary = summary["cluster_summary"]
+    if cluster_summary is not None and len(cluster_summary):
+        parts.append("<h2>🧩 Cluster-Level Summary</h2>")
+        parts.append(cluster_summary.round(2).to_html(index=False))
+        top_cluster = cluster_summary.sort_values("Total Fee Loss", ascending=False).iloc[0]
+        parts.append(
+            f"<p>📌 <b>Key Insight:</b> Cluster <b>{html.escape(str(top_cluster[cluster_col]))}</b> "
+            f"has the highest total fee loss (${top_cluster['Total Fee Loss']:,.0f}).</p>"
+        )
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+# ==========================
+# PARALLEL REPORT PACK
+# ==========================
+_worker_cube = None
+_worker_cluster_col = None
+
+
+def _init_worker(cube, cluster_col):
+    # The cube is sent to each worker once, not once per report
+    global _worker_cube, _worker_cluster_col
+    _worker_cube, _worker_cluster_col = cube, cluster_col
+
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "_", str(text)).strip("_").lower()
+
+
+def _render_job(job):
+    kind, value, out_dir, static_images = job
+    summary = summarize(
+        _worker_cube,
+        _worker_cluster_col,
+        location=value if kind == "location" else None,
+        cluster=value if kind == "cluster" else None,
+    )
+    title = "All Locations" if kind == "overall" else f"{kind.title()} {value}"
+    path = Path(out_dir) / f"{kind}_{_slug(value)}.html"
+    path.write_text(render_report_html(summary, title, _worker_cluster_col, static_images), encoding="utf-8")
+    return title, path
+
+
+def report_jobs(cube, cluster_col, out_dir, static_images):
+    jobs = [("overall", "all", str(out_dir), static_images)]
+    if "membership_location" in cube.columns:
+        jobs += [("location", v, str(out_dir), static_images) for v in sorted(cube["membership_location"].dropna().unique())]
+    if cluster_col is not None:
+        jobs += [("cluster", v, str(out_dir), static_images) for v in sorted(cube[cluster_col].dropna().unique())]
+    return jobs
+
+
+def generate_report_pack(out_dir, max_workers=None, static_images=HAS_STATIC_EXPORT):
+    """Render one report per location and per cluster (plus an overall one) in parallel.
+
+    The dataset is aggregated once in this process; workers only receive the
+    small summary cube. Returns the list of ``(title, path)`` written, with an
+    ``index.html`` linking them all.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cube, cluster_col = executive_cube()
+    jobs = report_jobs(cube, cluster_col, out_dir, static_images)
+
+    # spawn: forking a multi-threaded Streamlit server is not safe
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(cube, cluster_col),
+    ) as pool:
+        written = list(pool.map(_render_job, jobs))
+
+    links = "\n".join(f"<li><a href='{p.name}'>{html.escape(t)}</a></li>" for t, p in written)
+    (out_dir / "index.html").write_text(
+        f"<html><head><meta charset='utf-8'><title>Executive Summary Pack</title></head>"
+        f"<body><h1>📋 Executive Summary Pack – {date.today():%Y-%m}</h1><ul>{links}</ul></body></html>",
+        encoding="utf-8",
+    )
+    return written
+
+
+def zip_report_pack(out_dir):
+    """Zip every file in a generated pack into an in-memory archive."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path in sorted(Path(out_dir).iterdir()):
+            zf.write(path, arcname=path.name)
+    return buf.getvalue()
@@ -0,0 +1,213 @@
+import json
+import threading
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+from utils.aggregates import aggregate, dataset_columns, distinct
+from utils.bootstrap import bootstrap_ci, with_error_bars
+from utils.data_loader import dataset_version
+from utils.result_cache import get_result_cache
+from utils.selection import thaw_filters
+
+# ==========================
+# FIGURE CACHE
+# ==========================
+# Finished figures are stored as Plotly JSON in the shared result cache, so they
+# count against the same memory budget as every other cached result.
+_BUILDERS = {}
+
+
+def register_figure(page, chart_id):
+    """Decorator registering a builder ``build(*params) -> plotly Figure`` for a chart."""
+    def wrap(build):
+        _BUILDERS[(page, chart_id)] = build
+        return build
+    return wrap
+
+
+def cached_figure(page, chart_id, params, build):
+    """Return the figure for ``(page, chart_id, params)`` as a Plotly dict.
+
+    ``build()`` is only called on a cache miss; hits skip both the ``px.*``
+    construction and our JSON encoding. The dict can be passed straight to
+    ``st.plotly_chart``.
+    """
+    fig_json = get_result_cache().get_or_compute(
+        "figure",
+        (page, chart_id, tuple(params)),
+        lambda: pio.to_json(build(), validate=False),
+    )
+    return json.loads(fig_json)
+
+
+def figure(page, chart_id, *params):
+    """Cached figure from a registered builder.
+
+    Builders that depend on the global filters take the frozen selection
+    (``utils.selection.freeze_filters``) as their last parameter.
+    """
+    build = _BUILDERS[(page, chart_id)]
+    return cached_figure(page, chart_id, params, lambda: build(*params))
+
+
+# ==========================
+# CHART BUILDERS
+# ==========================
+@register_figure("insights", "records_donut")
+def _insights_records_donut(dim_col, dim_label, selection=()):
+    cat_counts = aggregate([dim_col], filters=thaw_filters(selection)).sort_values("rows", ascending=False)
+    cat_counts.columns = [dim_label, "Count"]
+    return px.pie(
+        cat_counts,
+        names=dim_label,
+        values="Count",
+        hole=0.5,
+        title=f"Share of Records by {dim_label}",
+        color_discrete_sequence=px.colors.sequential.Reds
+    )
+
+
+@register_figure("insights", "fee_loss_treemap")
+def _insights_fee_loss_treemap(selection=()):
+    treemap_df = (
+        aggregate(
+            ["membership_location", "application_contact_age_category"], ["fee_loss"], ["sum"],
+            filters=thaw_filters(selection),
+        )
+        .rename(columns={"fee_loss_sum": "fee_loss"})
+    )
+    return px.treemap(
+        treemap_df,
+        path=["membership_location", "application_contact_age_category"],
+        values="fee_loss",
+        title="Fee Loss by Location and Age Category"
+    )
+
+
+@register_figure("time_trends", "location_month_heatmap")
+def _time_trends_heatmap(years, selection=()):
+    filters = {**thaw_filters(selection), "hold_year": list(years)}
+    heat_df = (
+        aggregate(["membership_location", "hold_month"], ["fee_loss"], ["sum"], filters=filters)
+        .rename(columns={"fee_loss_sum": "fee_loss"})
+    )
+
+    pivot = heat_df.pivot(index="membership_location", columns="hold_month", values="fee_loss").fillna(0)
+    pivot = pivot.sort_index()
+
+    fig = px.imshow(
+        pivot,
+        aspect="auto",
+        labels=dict(x="Month", y="Location", color="Total Fee Loss"),
+        title="Monthly Fee Loss Heatmap by Location",
+        color_continuous_scale="Reds"
+    )
+    # Heatmap traces emit no selection events; invisible markers on the cell
+    # centres make every cell clickable for cross-filtering
+    cells = pivot.stack().rename("fee_loss").reset_index()
+    fig.update_traces(hoverinfo="skip", hovertemplate=None)
+    fig.add_trace(go.Scatter(
+        x=cells["hold_month"],
+        y=cells["membership_location"],
+        customdata=cells["fee_loss"],
+        mode="markers",
+        marker=dict(size=18, opacity=0, symbol="square-open", color="#000000"),
+        selected=dict(marker=dict(opacity=1)),
+        unselected=dict(marker=dict(opacity=0)),
+        hovertemplate="Location: %{y}<br>Month: %{x}<br>Total Fee Loss: %{customdata:$,.0f}<extra></extra>",
+        showlegend=False,
+    ))
+    return fig
+
+
+@register_figure("executive", "top_locations")
+def _executive_top_locations(selection=()):
+    loc_ci = bootstrap_ci(["membership_location"], ["fee_loss"], filters=thaw_filters(selection))
+    loc_loss = (
+        with_error_bars(loc_ci, "fee_loss_sum")
+        .rename(columns={"fee_loss_sum": "fee_loss"})
+        .sort_values("fee_loss", ascending=False)
+        .head(5)
+    )
+    return px.bar(
+        loc_loss,
+        x="membership_location",
+        y="fee_loss",
+        error_y="fee_loss_sum_err_plus",
+        error_y_minus="fee_loss_sum_err_minus",
+        title="Top 5 Locations by Fee Loss (95% CI)",
+        color="fee_loss",
+        color_continuous_scale="Reds"
+    )
+
+
+@register_figure("executive", "reason_loss")
+def _executive_reason_loss(selection=()):
+    reason_ci = bootstrap_ci(["reason_for_hold"], ["fee_loss"], filters=thaw_filters(selection))
+    reason_loss = (
+        with_error_bars(reason_ci, "fee_loss_sum")
+        .rename(columns={"fee_loss_sum": "fee_loss"})
+        .sort_values("fee_loss", ascending=False)
+    )
+    fig = px.bar(
+        reason_loss,
+        x="reason_for_hold",
+        y="fee_loss",
+        error_y="fee_loss_sum_err_plus",
+        error_y_minus="fee_loss_sum_err_minus",
+        title="Fee Loss by Hold Reason (95% CI)",
+    )
+    fig.update_layout(xaxis_tickangle=-35)
+    return fig
+
+
+# ==========================
+# BACKGROUND WARM-UP
+# ==========================
+INSIGHT_DIMENSIONS = {
+    "Location": "membership_location",
+    "Age Category": "application_contact_age_category",
+    "Package Category": "application_package_category",
+    "Membership Type": "application_subscription_membership_type",
+    "Reason for Hold": "reason_for_hold",
+}
+
+
+def default_warm_jobs():
+    """``(page, chart_id, params)`` for the charts users see with default settings."""
+    columns = dataset_columns()
+    jobs = [
+        ("insights", "fee_loss_treemap", ()),
+        ("executive", "top_locations", ()),
+        ("executive", "reason_loss", ()),
+    ]
+    for label, col in INSIGHT_DIMENSIONS.items():
+        if col in columns:
+            jobs.append(("insights", "records_donut", (col, label)))
+    if "hold_year" in columns:
+        jobs.append(("time_trends", "location_month_heatmap", (tuple(distinct("hold_year")),)))
+    return jobs
+
+
+def warm_figures(jobs=None):
+    """Build and cache figures ahead of time; failures are skipped, pages rebuild on demand."""
+    for page, chart_id, params in jobs if jobs is not None else default_warm_jobs():
+        try:
+            figure(page, chart_id, *params)
+        except Exception:
+            continue
+
+
+@st.cache_resource(show_spinner=False)
+def _start_warmup(version):
+    thread = threading.Thread(target=warm_figures, name="figure-cache-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_background_warmup():
+    """Warm the figure cache once per dataset version on a background thread."""
+    return _start_warmup(dataset_version())
@@ -0,0 +1,153 @@
+import pandas as pd
+import streamlit as st
+
+from utils.aggregates import aggregate, dataset_columns, distinct
+from utils.selection import DateRange
+
+# ==========================
+# GLOBAL FILTER CONTEXT
+# ==========================
+# Sidebar filters shared by every page. Selections are kept in session state
+# (outside the widget keys) so they survive switching pages.
+GLOBAL_FILTERS = {
+    "Location": "membership_location",
+    "Package Category": "application_package_category",
+    "Membership Type": "application_subscription_membership_type",
+    "Age Category": "application_contact_age_category",
+    "Reason for Hold": "reason_for_hold",
+}
+DATE_COL = "start_date"
+_STORE = "global_filters"
+
+
+def _cluster_col(columns):
+    for c in ["cluster_label", "cluster_name", "cluster"]:
+        if c in columns:
+            return c
+    return None
+
+
+def filter_columns():
+    """``{label: column}`` of the global filters available in this dataset."""
+    columns = dataset_columns()
+    available = {label: col for label, col in GLOBAL_FILTERS.items() if col in columns}
+    cluster_col = _cluster_col(columns)
+    if cluster_col is not None:
+        available["Cluster"] = cluster_col
+    return available
+
+
+def _date_bounds():
+    bounds = aggregate([], [DATE_COL], ["min", "max"]).iloc[0]
+    return bounds[f"{DATE_COL}_min"].date(), bounds[f"{DATE_COL}_max"].date()
+
+
+def _save(col, widget_key):
+    st.session_state[_STORE][col] = st.session_state[widget_key]
+
+
+def _reset():
+    st.session_state[_STORE] = {}
+
+
+def active_filters():
+    """The current global filter set (only the filters that actually narrow the data)."""
+    filters = {}
+    for col, value in st.session_state.get(_STORE, {}).items():
+        if col == DATE_COL:
+            if len(value) == 2 and tuple(value) != _date_bounds():
+                filters[col] = DateRange(pd.Timestamp(value[0]), pd.Timestamp(value[1]))
+        elif value:
+            filters[col] = list(value)
+    return filters
+
+
+# ==========================
+# CHART CROSS-FILTERS
+# ==========================
+# Clicking (or box / lasso selecting) marks on a chart drawn with
+# ``on_select="rerun"`` narrows the other charts on the same page.
+def cross_filter_key(page, chart_id):
+    """Widget key for a cross-filtering chart (changes when the selection is cleared)."""
+    version = st.session_state.get(f"_xf_version_{page}_{chart_id}", 0)
+    return f"_xf_{page}_{chart_id}_{version}"
+
+
+def _clear_cross_filter(page, chart_id):
+    version_key = f"_xf_version_{page}_{chart_id}"
+    st.session_state[version_key] = st.session_state.get(version_key, 0) + 1
+
+
+def cross_filter(page, chart_id, fields, filters=None):
+    """Filter set selected on a chart.
+
+    ``fields`` maps a point attribute of the selection event (``"x"``, ``"y"``)
+    to the dataset column it shows. Selected values are matched back to the
+    column's own values, restricted to ``filters``.
+    """
+    state = st.session_state.get(cross_filter_key(page, chart_id))
+    points = state["selection"]["points"] if state else []
+    if not points:
+        return {}
+
+    selected = {}
+    for attr, col in fields.items():
+        lookup = {str(v): v for v in distinct(col, filters=filters)}
+        values = {lookup[str(p[attr])] for p in points if str(p.get(attr)) in lookup}
+        if values:
+            selected[col] = sorted(values, key=str)
+    return selected
+
+
+def render_cross_filter_status(page, chart_id, selected, labels=None):
+    """Caption describing an active chart selection, with a button to clear it."""
+    if not selected:
+        st.caption("🖱 Click or box-select marks on the chart to cross-filter the rest of the page.")
+        return
+    labels = labels or {}
+    parts = [f"{labels.get(col, col)} = {', '.join(map(str, values))}" for col, values in selected.items()]
+    c1, c2 = st.columns([4, 1])
+    c1.info(f"🔗 Cross-filter active: {' · '.join(parts)}")
+    c2.button("✖ Clear selection", key=f"_xf_clear_{page}_{chart_id}",
+              on_click=_clear_cross_filter, args=(page, chart_id), use_container_width=True)
+
+
+def render_global_filters():
+    """Draw the global filter panel in the sidebar and return the active filter set."""
+    store = st.session_state.setdefault(_STORE, {})
+
+    with st.sidebar:
+        st.markdown("### 🌐 Global Filters")
+        with st.expander("Applies to every page", expanded=bool(store)):
+            st.caption("Leave a filter empty to include all values.")
+
+            for label, col in filter_columns().items():
+                widget_key = f"_gf_{col}"
+                st.session_state[widget_key] = store.get(col, [])
+                st.multiselect(label, distinct(col), key=widget_key, on_change=_save, args=(col, widget_key))
+
+            if DATE_COL in dataset_columns():
+                lo, hi = _date_bounds()
+                widget_key = f"_gf_{DATE_COL}"
+                st.session_state[widget_key] = tuple(store.get(DATE_COL, (lo, hi)))
+                st.date_input(
+                    "Hold Start Date",
+                    min_value=lo,
+                    max_value=hi,
+                    key=widget_key,
+                    on_change=_save,
+                    args=(DATE_COL, widget_key),
+                )
+
+            st.button("↺ Reset filters", on_click=_reset, use_container_width=True)
+
+        filters = active_filters()
+        if filters:
+            st.caption(f"🔎 {len(filters)} global filter(s) active")
+
+    if filters and aggregate([], filters=filters)["rows"].sum() == 0:
+        st.warning("⚠️ No records match the global filters. Adjust or reset them in the sidebar.")
+        st.stop()
+
+    return filters
+
@@ -0,0 +1,174 @@
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import aggregate
+from utils.result_cache import get_result_cache
+from utils.selection import freeze_filters, selection_hash, thaw_filters
+
+# ==========================
+# BATCH HOLT-WINTERS
+# ==========================
+# Additive damped-trend Holt-Winters (ETS(A,Ad,A)) in error-correction form:
+#   forecast  f_t = l + phi * b + s[t - m]
+#   error     e_t = y_t - f_t
+#   level     l  <- l + phi * b + alpha * e_t
+#   trend     b  <- phi * b + beta * e_t
+#   season    s[t] = s[t - m] + gamma * e_t
+# Every series (rows of a 2D array) is run against every smoothing parameter
+# combination at once, so the recursion is one loop over months with array
+# updates of shape (series, parameter sets); each series then keeps the
+# parameters with the smallest one-step-ahead squared error.
+SEASON = 12
+DAMPING = 0.98
+ALPHAS = np.linspace(0.05, 0.95, 10)
+BETAS = np.array([0.0, 0.01, 0.05, 0.1, 0.2])
+GAMMAS = np.array([0.0, 0.05, 0.1, 0.2, 0.4])
+INTERVAL_Z = 1.96  # 95% prediction intervals
+
+# Series are fitted in chunks (the state is ~24 KB per series across all
+# parameter sets); batches larger than this fan the chunks out over a process
+# pool, below it worker start-up costs more than the fit itself
+PARALLEL_MIN_SERIES = 20_000
+_CHUNK_SERIES = 2_000
+
+
+def _fit_chunk(y):
+    """Fit every row of ``y`` (series x months); returns the state needed to forecast."""
+    n_series, n_months = y.shape
+    alpha, beta, gamma = (g.ravel() for g in np.meshgrid(ALPHAS, BETAS, GAMMAS, indexing="ij"))
+
+    # Initial state from the first two seasons
+    first, second = y[:, :SEASON].mean(axis=1), y[:, SEASON:2 * SEASON].mean(axis=1)
+    level = np.repeat(first[:, None], len(alpha), axis=1)
+    trend = np.repeat(((second - first) / SEASON)[:, None], len(alpha), axis=1)
+    season = np.repeat((y[:, :SEASON] - first[:, None])[:, None, :], len(alpha), axis=1)
+
+    sse = np.zeros((n_series, len(alpha)))
+    for t in range(n_months):
+        s = season[:, :, t % SEASON]
+        err = y[:, t, None] - (level + DAMPING * trend + s)
+        if t >= SEASON:
+            # The first season is fitted exactly by the initial seasonal state
+            sse += err ** 2
+        level = level + DAMPING * trend + alpha * err
+        trend = DAMPING * trend + beta * err
+        season[:, :, t % SEASON] = s + gamma * err
+
+    best = sse.argmin(axis=1)
+    pick = np.arange(n_series)
+    return {
+        "level": level[pick, best],
+        "trend": trend[pick, best],
+        "season": season[pick, best],
+        "alpha": alpha[best],
+        "beta": beta[best],
+        "gamma": gamma[best],
+        "sigma": np.sqrt(sse[pick, best] / (n_months - SEASON)),
+    }
+
+
+def fit_holt_winters(y, max_workers=None):
+    """Fit a batch of monthly series (2D array, series x months, >= two seasons)."""
+    y = np.asarray(y, dtype=float)
+    chunks = [y[i:i + _CHUNK_SERIES] for i in range(0, len(y), _CHUNK_SERIES)]
+    if len(y) < PARALLEL_MIN_SERIES:
+        fitted = [_fit_chunk(chunk) for chunk in chunks]
+    else:
+        # spawn: forking a multi-threaded Streamlit server is not safe
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn")) as pool:
+            fitted = list(pool.map(_fit_chunk, chunks))
+    return {k: np.concatenate([f[k] for f in fitted]) for k in fitted[0]}
+
+
+def forecast_holt_winters(fit, n_months, horizon):
+    """Point forecasts and 95% interval half-widths (series x horizon)."""
+    h = np.arange(1, horizon + 1)
+    damped = np.cumsum(DAMPING ** h)  # phi + phi^2 + ... + phi^h
+    season_idx = (n_months + h - 1) % SEASON
+    mean = fit["level"][:, None] + damped[None, :] * fit["trend"][:, None] + fit["season"][:, season_idx]
+
+    # h-step variance of ETS(A,Ad,A): sigma^2 * (1 + sum_{j<h} c_j^2)
+    j = np.arange(1, horizon)
+    c = (
+        fit["alpha"][:, None]
+        + fit["beta"][:, None] * np.cumsum(DAMPING ** j)[None, :]
+        + fit["gamma"][:, None] * (j % SEASON == 0)[None, :]
+    )
+    var_factor = 1 + np.concatenate([np.zeros((len(mean), 1)), np.cumsum(c ** 2, axis=1)], axis=1)
+    return mean, INTERVAL_Z * fit["sigma"][:, None] * np.sqrt(var_factor)
+
+
+# ==========================
+# FEE LOSS FORECASTS
+# ==========================
+def monthly_matrix(by, filters=None):
+    """Monthly fee loss as a (series x months) array: one row per ``by`` value plus "All".
+
+    Months run contiguously from the first to the last month with holds;
+    months without holds are 0. Returns ``(series labels, months, matrix)``.
+    """
+    keys = ([by] if by else []) + ["hold_year", "hold_month"]
+    cells = aggregate(keys, ["fee_loss"], ["sum"], filters=filters)
+    if cells.empty:
+        return [], pd.DatetimeIndex([]), np.zeros((0, 0))
+
+    month = pd.to_datetime(dict(year=cells["hold_year"], month=cells["hold_month"], day=1))
+    months = pd.date_range(month.min(), month.max(), freq="MS")
+    col = ((month.dt.year - months[0].year) * 12 + month.dt.month - months[0].month).to_numpy()
+
+    labels = ["All"] + (sorted(cells[by].unique().tolist()) if by else [])
+    matrix = np.zeros((len(labels), len(months)))
+    np.add.at(matrix[0], col, cells["fee_loss_sum"].to_numpy())
+    if by:
+        row = pd.Categorical(cells[by], categories=labels[1:]).codes + 1
+        np.add.at(matrix, (row, col), cells["fee_loss_sum"].to_numpy())
+    return labels, months, matrix
+
+
+def _forecast(by, horizon, frozen):
+    labels, months, matrix = monthly_matrix(by, thaw_filters(frozen))
+    if len(months) < 2 * SEASON:
+        # Too short for a seasonal fit: repeat the last month (naive forecast)
+        mean = np.repeat(matrix[:, -1:], horizon, axis=1) if len(months) else np.zeros((0, horizon))
+        half = np.zeros_like(mean)
+        method = "naive"
+    else:
+        mean, half = forecast_holt_winters(fit_holt_winters(matrix), len(months), horizon)
+        method = "holt_winters"
+
+    future = pd.date_range(months[-1] + pd.offsets.MonthBegin(1), periods=horizon, freq="MS") if len(months) else []
+    actual = pd.DataFrame({
+        "series": np.repeat(labels, len(months)),
+        "month": np.tile(months, len(labels)),
+        "kind": "Actual",
+        "fee_loss": matrix.ravel(),
+    })
+    forecast = pd.DataFrame({
+        "series": np.repeat(labels, horizon),
+        "month": np.tile(future, len(labels)),
+        "kind": "Forecast",
+        "fee_loss": np.clip(mean, 0, None).ravel(),
+        "lower": np.clip(mean - half, 0, None).ravel(),
+        "upper": np.clip(mean + half, 0, None).ravel(),
+    })
+    out = pd.concat([actual, forecast], ignore_index=True)
+    out.attrs["method"] = method
+    return out
+
+
+def fee_loss_forecast(by=None, horizon=3, filters=None):
+    """Monthly fee loss history plus a ``horizon``-month forecast per ``by`` value and overall.
+
+    One row per (series, month): ``series`` ("All" or the ``by`` value),
+    ``month``, ``kind`` ("Actual" / "Forecast"), ``fee_loss`` and for forecasts
+    the 95% ``lower`` / ``upper`` bounds. Cached per dataset version and filter set.
+    """
+    frozen = freeze_filters(filters)
+    return get_result_cache().get_or_compute(
+        "fee_loss_forecast",
+        (by, horizon, selection_hash(filters)),
+        lambda: _forecast(by, horizon, frozen),
+    )
@@ -0,0 +1,209 @@
+import itertools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import aggregate, dataset_columns
+from utils.executive_report import find_cluster_col
+from utils.result_cache import get_result_cache
+from utils.selection import freeze_filters, selection_hash, thaw_filters
+
+# ==========================
+# INSIGHT MINING
+# ==========================
+# Every 1-, 2- and 3-way combination of the dimensions below is a candidate
+# segment. Segments are rolled up from one (all dimensions) cube of fee loss
+# sums and hold counts, and scored by:
+#   * contribution   – share of all fee loss
+#   * lift           – fee loss per hold relative to the overall average
+#   * representation – holds relative to the count expected if the segment's
+#                      dimension values were independent (1 for single values)
+#   * excess loss    – fee loss above the expectation (expected holds x
+#                      average loss per hold); insights are ranked by it
+# A missing dimension value is a code of its own in the cube: every hold counts
+# towards the totals, the average loss and each dimension's value shares, and
+# only segments on the missing value itself are left out. Support is
+# anti-monotone (a combination never has more holds than any of its parts), so
+# dropping segments below the support thresholds also prunes every combination
+# built from them.
+MINING_DIMENSIONS = {
+    "Location": "membership_location",
+    "Age Category": "application_contact_age_category",
+    "Package Category": "application_package_category",
+    "Membership Type": "application_subscription_membership_type",
+    "Reason for Hold": "reason_for_hold",
+    "Gender": "application_contact_gender",
+    "Hold Length": "hold_duration_group",
+    "Quarter": "hold_quarter",
+}
+MAX_ORDER = 3
+MIN_HOLDS = 30
+MIN_LOSS_SHARE = 0.001
+# A combination whose lift and representation are within this of one of its
+# parts adds nothing the part does not already say
+REDUNDANCY_TOLERANCE = 0.10
+
+# Cube cells x dimension combinations above which the scan uses a process pool
+PARALLEL_MIN_WORK = 20_000_000
+
+
+def mining_dimensions(columns):
+    """``label -> column`` of the dimensions present in this dataset (plus the cluster column)."""
+    dims = {label: col for label, col in MINING_DIMENSIONS.items() if col in columns}
+    cluster_col = find_cluster_col(columns)
+    if cluster_col is not None:
+        dims["Cluster"] = cluster_col
+    return dims
+
+
+# ==========================
+# PARALLEL SCAN
+# ==========================
+_worker_cube = None
+
+
+def _init_worker(cube):
+    # The encoded cube is sent to each worker once, not once per combination
+    global _worker_cube
+    _worker_cube = cube
+
+
+def _score_combination(combo):
+    codes, cardinality, rows, loss, min_holds, min_loss = _worker_cube
+    combo = list(combo)
+    # One extra code per dimension (== its cardinality) for a missing value
+    radix = cardinality + 1
+    size = int(np.prod(radix[combo]))
+    code = np.zeros(len(rows), dtype=np.int64)
+    for d in combo:
+        code = code * radix[d] + codes[:, d]
+    holds = np.bincount(code, weights=rows, minlength=size)
+    fee_loss = np.bincount(code, weights=loss, minlength=size)
+
+    keep = np.flatnonzero((holds >= min_holds) & (fee_loss >= min_loss))
+    # Decode the surviving segments back to per-dimension value codes
+    values = np.empty((len(keep), len(combo)), dtype=np.int64)
+    rest = keep.copy()
+    for i in range(len(combo) - 1, -1, -1):
+        values[:, i] = rest % radix[combo[i]]
+        rest //= radix[combo[i]]
+    known = (values < cardinality[combo]).all(axis=1)
+    return combo, values[known], holds[keep][known], fee_loss[keep][known]
+
+
+def _mine(frozen, max_order, min_holds, min_loss_share, max_workers):
+    filters = thaw_filters(frozen)
+    dims = mining_dimensions(dataset_columns())
+    labels, cols = list(dims), list(dims.values())
+    cube = aggregate(cols, ["fee_loss"], ["sum"], filters=filters, dropna=False)
+    if cube.empty:
+        return pd.DataFrame()
+
+    categories = [sorted(cube[c].dropna().unique().tolist()) for c in cols]
+    cardinality = np.array([len(cat) for cat in categories], dtype=np.int64)
+    codes = np.column_stack([pd.Categorical(cube[c], categories=cat).codes for c, cat in zip(cols, categories)])
+    codes = np.where(codes < 0, cardinality, codes)
+    rows = cube["rows"].to_numpy(dtype=float)
+    loss = cube["fee_loss_sum"].to_numpy(dtype=float)
+    total_holds, total_loss = rows.sum(), loss.sum()
+
+    encoded = (codes.astype(np.int64), cardinality, rows, loss, min_holds, min_loss_share * total_loss)
+    combos = [c for k in range(1, max_order + 1) for c in itertools.combinations(range(len(cols)), k)]
+
+    if len(rows) * len(combos) >= PARALLEL_MIN_WORK:
+        # spawn: forking a multi-threaded Streamlit server is not safe
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(encoded,),
+        ) as pool:
+            results = list(pool.map(_score_combination, combos, chunksize=8))
+    else:
+        _init_worker(encoded)
+        results = [_score_combination(c) for c in combos]
+
+    # Share of holds of every single dimension value, for the independence expectation
+    marginal = [
+        np.bincount(codes[:, d], weights=rows, minlength=cardinality[d] + 1) / total_holds for d in range(len(cols))
+    ]
+    avg_loss = total_loss / total_holds
+
+    frames = []
+    for combo, values, holds, fee_loss in results:
+        if not len(holds):
+            continue
+        expected = total_holds * np.prod([marginal[d][values[:, i]] for i, d in enumerate(combo)], axis=0)
+        frame = pd.DataFrame({
+            "order": len(combo),
+            "dimensions": " × ".join(labels[d] for d in combo),
+            "segment": [
+                " · ".join(f"{labels[d]} = {categories[d][v]}" for d, v in zip(combo, vals)) for vals in values
+            ],
+            "holds": holds.astype(np.int64),
+            "fee_loss": fee_loss,
+            "contribution_pct": fee_loss / total_loss * 100,
+            "loss_per_hold": fee_loss / holds,
+            "lift": fee_loss / holds / avg_loss,
+            "representation": holds / expected,
+            "excess_fee_loss": fee_loss - expected * avg_loss,
+        })
+        frame["_key"] = [frozenset(zip(combo, vals)) for vals in values.tolist()]
+        frames.append(frame)
+    scan = {"combinations": len(combos), "segments_scanned": int(sum(np.prod(cardinality[list(c)]) for c in combos))}
+    if not frames:
+        # No segment passed the size / share thresholds
+        found = pd.DataFrame()
+        found.attrs.update(scan)
+        return found
+    found = pd.concat(frames, ignore_index=True)
+
+    # Redundancy: a combination that behaves like one of its parts is dropped
+    by_key = dict(zip(found["_key"], zip(found["lift"], found["representation"])))
+    redundant = np.zeros(len(found), dtype=bool)
+    for i, (key, lift, rep) in enumerate(zip(found["_key"], found["lift"], found["representation"])):
+        if len(key) < 2:
+            continue
+        for part in itertools.combinations(key, len(key) - 1):
+            parent = by_key.get(frozenset(part))
+            if parent is None:
+                continue
+            if abs(lift / parent[0] - 1) < REDUNDANCY_TOLERANCE and abs(rep / parent[1] - 1) < REDUNDANCY_TOLERANCE:
+                redundant[i] = True
+                break
+
+    found = found[~redundant].drop(columns="_key")
+    found = found.sort_values("excess_fee_loss", ascending=False, ignore_index=True)
+    found["insight"] = [_narrative(r) for r in found.itertuples()]
+    found.attrs.update(scan)
+    return found
+
+
+def _narrative(r):
+    parts = [f"**{r.segment}** accounts for **{r.contribution_pct:.1f}%** of fee loss (${r.fee_loss:,.0f})"]
+    if abs(r.lift - 1) >= 0.1:
+        parts.append(f"loses **{r.lift:.2f}×** the average fee per hold")
+    if r.order > 1 and abs(r.representation - 1) >= 0.1:
+        direction = "more" if r.representation > 1 else "less"
+        parts.append(f"holds are **{abs(r.representation - 1) * 100:.0f}% {direction} common** than its parts predict")
+    excess = "above" if r.excess_fee_loss >= 0 else "below"
+    return "; ".join(parts) + f" — **${abs(r.excess_fee_loss):,.0f} {excess}** expectation."
+
+
+def mine_insights(filters=None, max_order=MAX_ORDER, min_holds=MIN_HOLDS, min_loss_share=MIN_LOSS_SHARE,
+                  max_workers=None):
+    """Ranked insights over every 1- to ``max_order``-way dimension combination.
+
+    Segments with fewer than ``min_holds`` holds or under ``min_loss_share`` of
+    all fee loss are pruned. One row per remaining segment with its scores and
+    a narrative ``insight``, sorted by fee loss above expectation. Cached per
+    filter set and thresholds.
+    """
+    frozen = freeze_filters(filters)
+    return get_result_cache().get_or_compute(
+        "insights",
+        (max_order, min_holds, min_loss_share, selection_hash(filters)),
+        lambda: _mine(frozen, max_order, min_holds, min_loss_share, max_workers),
+    )
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.aggregates import dataset_columns, scan_batches, take_rows
+from utils.data_loader import _freeze, dataset_version
+
+# ==========================
+# MEMBER KEY
+# ==========================
+# Each row of the dataset is a hold. When the export carries a member / contact
+# id it identifies the member; otherwise members are approximated by attributes
+# that stay fixed for a contact: home location, gender, their average hold
+# length and birth year (hold start year minus age at hold). The proxy can split
+# one member in two when a birthday falls between holds.
+MEMBER_ID_COLUMNS = ["member_id", "contact_id", "application_contact_id"]
+PROXY_KEY_COLUMNS = ["membership_location", "application_contact_gender", "avg_hold_contact", "birth_year"]
+
+FREQUENCY_SEGMENTS = [(1, "1 hold"), (2, "2 holds"), (4, "3-4 holds"), (np.inf, "5+ holds")]
+
+
+def member_key_columns(columns):
+    """Columns identifying a member: a real id column if present, else the proxy key."""
+    for c in MEMBER_ID_COLUMNS:
+        if c in columns:
+            return [c], False
+    return PROXY_KEY_COLUMNS, True
+
+
+def _key_frame(df):
+    key_cols, _ = member_key_columns(df.columns)
+    keys = pd.DataFrame(index=df.index)
+    for c in key_cols:
+        if c == "birth_year":
+            keys[c] = df["start_date"].dt.year - df["age_at_hold"]
+        else:
+            keys[c] = df[c]
+    return keys
+
+
+def frequency_segment(holds):
+    """Frequency segment label for each member's hold count."""
+    bounds = [b for b, _ in FREQUENCY_SEGMENTS]
+    labels = np.array([label for _, label in FREQUENCY_SEGMENTS])
+    return labels[np.searchsorted(bounds, holds, side="left")]
+
+
+# ==========================
+# MEMBER TABLE + INDEX
+# ==========================
+def _read_only(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+@st.cache_resource(show_spinner="Building member table...")
+def _build_members(version):
+    key_cols, proxy = member_key_columns(dataset_columns())
+    source = [c for c in key_cols if c != "birth_year"] + (["age_at_hold"] if proxy else [])
+    needed = list(dict.fromkeys(source + ["start_date", "hold_duration_days", "fee_loss"]))
+    df = pd.concat(list(scan_batches(needed)), ignore_index=True)
+    keys = _key_frame(df)
+
+    # One hash pass assigns every hold its member code
+    codes = keys.groupby(list(keys.columns), dropna=False, sort=False).ngroup().to_numpy()
+    n_members = int(codes.max()) + 1
+
+    start = df["start_date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    duration = df["hold_duration_days"].fillna(0).to_numpy(dtype=np.int64)
+    fee_loss = df["fee_loss"].fillna(0).to_numpy(dtype=float)
+
+    # CSR index: holds sorted by (member, start date); member m owns
+    # order[offsets[m]:offsets[m + 1]]
+    order = np.lexsort((start, codes))
+    counts = np.bincount(codes, minlength=n_members)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    first, last = offsets[:-1], offsets[1:] - 1
+
+    s_start, s_dur, s_code = start[order], duration[order], codes[order]
+
+    # Idle days between the end of one hold and the start of the member's next one
+    same_member = s_code[1:] == s_code[:-1]
+    gaps = (s_start[1:] - (s_start[:-1] + s_dur[:-1]))[same_member]
+    gap_owner = s_code[1:][same_member]
+    n_gaps = np.bincount(gap_owner, minlength=n_members)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_gap = np.bincount(gap_owner, weights=gaps, minlength=n_members) / n_gaps
+    min_gap = np.full(n_members, np.inf)
+    np.minimum.at(min_gap, gap_owner, gaps)
+    min_gap[n_gaps == 0] = np.nan
+
+    members = keys.iloc[order[first]].reset_index(drop=True)
+    members.insert(0, "member", np.arange(n_members))
+    members["holds"] = counts
+    members["total_hold_days"] = np.add.reduceat(s_dur, first)
+    members["max_hold_days"] = np.maximum.reduceat(s_dur, first)
+    members["total_fee_loss"] = np.add.reduceat(fee_loss[order], first)
+    members["first_hold"] = pd.to_datetime(s_start[first], unit="D")
+    members["last_hold"] = pd.to_datetime(s_start[last], unit="D")
+    members["mean_gap_days"] = mean_gap
+    members["min_gap_days"] = min_gap
+    members["frequency_segment"] = frequency_segment(counts)
+
+    return _freeze(members), _read_only(codes), _read_only(order), _read_only(offsets)
+
+
+def member_table():
+    """One row per member (zero-copy view of the cached table).
+
+    ``member`` code, the key columns, ``holds``, ``total_hold_days``,
+    ``max_hold_days``, ``total_fee_loss``, ``first_hold`` / ``last_hold``,
+    ``mean_gap_days`` / ``min_gap_days`` (idle days between consecutive holds,
+    NaN for single-hold members) and ``frequency_segment``.
+    """
+    return _build_members(dataset_version())[0].copy(deep=False)
+
+
+def hold_members():
+    """Member code of every row of the shared hold frame."""
+    return _build_members(dataset_version())[1]
+
+
+def member_hold_rows(member):
+    """Row positions (in the shared hold frame) of one member's holds, oldest first."""
+    _, _, order, offsets = _build_members(dataset_version())
+    return order[offsets[member]:offsets[member + 1]]
+
+
+def member_holds(member):
+    """One member's hold records, oldest first."""
+    return take_rows(member_hold_rows(member))
+
+
+def members_in(row_index):
+    """Sorted member codes owning at least one of the given hold rows."""
+    return np.unique(hold_members()[row_index])
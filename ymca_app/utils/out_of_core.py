@@ -0,0 +1,167 @@
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import streamlit as st
+from openpyxl import load_workbook
+
+from utils.data_loader import BASE_DIR, DATA_PATH, dataset_version
+from utils.selection import DateRange
+
+# ==========================
+# CONFIGURATION
+# ==========================
+# Out-of-core mode is switched on for hosts where the hold history does not fit
+# in memory. Pages then only ever materialize aggregates or samples.
+OUT_OF_CORE = os.environ.get("YMCA_OUT_OF_CORE", "0").lower() in ("1", "true", "yes")
+MEMORY_BUDGET_MB = int(os.environ.get("YMCA_MEMORY_BUDGET_MB", "256"))
+STORE_DIR = Path(os.environ.get("YMCA_PARQUET_DIR", BASE_DIR / ".parquet_store"))
+
+PARTITION_COL = "hold_year"
+PARTITIONING = ds.partitioning(pa.schema([(PARTITION_COL, pa.int64())]), flavor="hive")
+
+# Rough per-cell cost of a pandas batch (values + index + groupby scratch space)
+_BYTES_PER_CELL = 64
+
+
+def batch_rows(n_columns, budget_mb=None):
+    """Number of rows per streamed batch that keeps a batch within the memory budget."""
+    budget = (budget_mb or MEMORY_BUDGET_MB) * 1024 * 1024
+    return max(1_024, budget // (max(n_columns, 1) * _BYTES_PER_CELL))
+
+
+def _normalize(chunk):
+    # Same normalization the in-memory loader applies
+    if "start_date" in chunk.columns:
+        chunk["start_date"] = pd.to_datetime(chunk["start_date"], errors="coerce")
+    if PARTITION_COL not in chunk.columns and "start_date" in chunk.columns:
+        chunk[PARTITION_COL] = chunk["start_date"].dt.year
+    if "hold_month" not in chunk.columns and "start_date" in chunk.columns:
+        chunk["hold_month"] = chunk["start_date"].dt.month
+    return chunk
+
+
+def _iter_excel_chunks(path, chunk_rows):
+    """Stream the workbook row by row (openpyxl read-only mode) in DataFrame chunks."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h) for h in next(rows)]
+        buf = []
+        for row in rows:
+            buf.append(row)
+            if len(buf) >= chunk_rows:
+                yield pd.DataFrame(buf, columns=header)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=header)
+    finally:
+        wb.close()
+
+
+def _unified_type(types):
+    """One Arrow type that holds every chunk's values of a column."""
+    types = {t for t in types if not pa.types.is_null(t)}
+    if not types:
+        return pa.string()  # never filled in
+    if len(types) == 1:
+        return types.pop()
+    if all(pa.types.is_integer(t) for t in types):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    if all(pa.types.is_timestamp(t) for t in types):
+        return pa.timestamp("ns")
+    return pa.string()
+
+
+def _write_store(path):
+    tmp = path.with_name(path.name + ".tmp")
+    staging = path.with_name(path.name + ".staging")
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    # Pass 1: stage each chunk with the types pandas inferred for it. A column
+    # can be all-null in one chunk or integer in one and float in the next, so
+    # the store's schema is only known once every chunk has been seen.
+    column_types = {}
+    for i, chunk in enumerate(_iter_excel_chunks(DATA_PATH, batch_rows(20))):
+        table = pa.Table.from_pandas(_normalize(chunk), preserve_index=False)
+        pq.write_table(table, staging / f"chunk-{i:05d}.parquet")
+        for field in table.schema:
+            column_types.setdefault(field.name, []).append(field.type)
+    schema = pa.schema([(name, _unified_type(types)) for name, types in column_types.items()])
+
+    # Pass 2: cast every staged chunk to that schema and partition it
+    for i, staged in enumerate(sorted(staging.glob("chunk-*.parquet"))):
+        table = pq.read_table(staged).select(schema.names).cast(schema)
+        pq.write_to_dataset(
+            table,
+            root_path=tmp,
+            partitioning=PARTITIONING,
+            basename_template=f"part-{i:05d}-{{i}}.parquet",
+        )
+
+    shutil.rmtree(staging)
+    tmp.rename(path)
+
+
+@st.cache_resource(show_spinner="Preparing partitioned Parquet store...")
+def _open_store(version):
+    path = STORE_DIR / version
+    if not path.exists():
+        STORE_DIR.mkdir(parents=True, exist_ok=True)
+        _write_store(path)
+    return ds.dataset(path, format="parquet", partitioning=PARTITIONING)
+
+
+def get_store():
+    """Partitioned Parquet dataset for the current data version (built on first use)."""
+    return _open_store(dataset_version())
+
+
+def store_columns():
+    return get_store().schema.names
+
+
+def filter_expression(filters):
+    """Turn a filter set into a pyarrow filter (pushed down to partitions / row groups)."""
+    expr = None
+    for col, allowed in (filters or {}).items():
+        if isinstance(allowed, DateRange):
+            start = pd.Timestamp(allowed.start).normalize()
+            end = pd.Timestamp(allowed.end).normalize() + pd.Timedelta(days=1)
+            term = (ds.field(col) >= start.to_pydatetime()) & (ds.field(col) < end.to_pydatetime())
+        else:
+            term = ds.field(col).isin(list(allowed))
+        expr = term if expr is None else expr & term
+    return expr
+
+
+def iter_batches(columns, filters=None, budget_mb=None):
+    """Yield pandas batches of ``columns`` that each fit inside the memory budget."""
+    scanner = get_store().scanner(
+        columns=list(columns),
+        filter=filter_expression(filters),
+        batch_size=batch_rows(len(columns), budget_mb),
+    )
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def store_rows():
+    return get_store().count_rows()
+
+
+def take_from_store(positions, columns):
+    """Rows at ``positions`` (in scan order) with only ``columns``, indexed by position."""
+    positions = np.asarray(positions, dtype=np.int64)
+    table = get_store().take(pa.array(positions), columns=list(columns))
+    return table.to_pandas().set_axis(positions)
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sklearn.ensemble import IsolationForest
+
+from utils.aggregates import dataset_columns, scan_batches, take_rows
+from utils.data_loader import dataset_version
+from utils.result_cache import get_result_cache
+from utils.selection import freeze_filters, selection_bitmap, selection_hash, thaw_filters
+
+# ==========================
+# OUTLIER SCORES
+# ==========================
+# Every hold gets two scores, computed once per dataset version:
+#   * an IsolationForest anomaly score over the metrics jointly (higher = more
+#     isolated; positive = flagged by the forest's default threshold)
+#   * a robust z-score per metric within its segment:
+#     (x - segment median) / (1.4826 * segment MAD)
+# Fees and hold lengths differ by membership type, so a value is judged against
+# holds of the same type.
+OUTLIER_METRICS = ["hold_duration_days", "fee_loss", "membership_fee"]
+OUTLIER_SEGMENT = "application_subscription_membership_type"
+ROBUST_Z_THRESHOLD = 3.5
+FOREST_TREES = 200
+# Share of holds the forest flags (its threshold is set at this quantile)
+FOREST_CONTAMINATION = 0.02
+PAGE_SIZE = 25
+
+
+def _read_only(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+def _robust_z(values, segments):
+    """Per-column robust z-scores of ``values`` within each segment (NaN stays NaN)."""
+    frame = pd.DataFrame(values)
+    groups = pd.Series(segments).fillna("__all__")
+    median = frame.groupby(groups).transform("median")
+    deviation = (frame - median).abs()
+    mad = deviation.groupby(groups).transform("median")
+    # MAD is 0 when most of a segment shares one value; the mean absolute deviation stands in
+    scale = (1.4826 * mad).where(mad > 0, 1.2533 * deviation.groupby(groups).transform("mean"))
+    return ((frame - median) / scale.where(scale > 0)).to_numpy(dtype=np.float32)
+
+
+@st.cache_resource(show_spinner="Scoring outliers...")
+def _build_outlier_scores(version, metrics, segment):
+    columns = list(metrics) + ([segment] if segment else [])
+    batches = list(scan_batches(columns))
+    values = np.concatenate([b[list(metrics)].to_numpy(dtype=float) for b in batches])
+    segments = np.concatenate([b[segment].to_numpy() for b in batches]) if segment else np.zeros(len(values))
+
+    # The forest cannot split on missing values; they sit at the column median
+    filled = np.where(np.isnan(values), np.nanmedian(values, axis=0), values)
+    forest = IsolationForest(
+        n_estimators=FOREST_TREES, contamination=FOREST_CONTAMINATION, n_jobs=-1, random_state=0
+    ).fit(filled)
+    forest_score = -forest.decision_function(filled).astype(np.float32)
+
+    robust_z = _robust_z(values, segments)
+    max_abs_z = np.abs(np.nan_to_num(robust_z, nan=0.0)).max(axis=1)
+
+    # Rows ranked most anomalous first; filtered views take a masked slice of this
+    order = np.lexsort((-max_abs_z, -forest_score))
+    return {
+        "forest_score": _read_only(forest_score),
+        "robust_z": _read_only(robust_z),
+        "max_abs_z": _read_only(max_abs_z),
+        "order": _read_only(order.astype(np.int64)),
+    }
+
+
+def outlier_metrics(columns):
+    return [m for m in OUTLIER_METRICS if m in columns]
+
+
+def outlier_scores():
+    """Per-row outlier scores in dataset row order (read-only arrays).
+
+    Keys: ``forest_score``, ``robust_z`` (rows x metrics), ``max_abs_z`` and
+    ``order`` (row positions, most anomalous first).
+    """
+    columns = dataset_columns()
+    segment = OUTLIER_SEGMENT if OUTLIER_SEGMENT in columns else None
+    return _build_outlier_scores(dataset_version(), tuple(outlier_metrics(columns)), segment)
+
+
+def _ranked_rows(filters):
+    """Row positions passing ``filters``, most anomalous first (cached per selection)."""
+    order = outlier_scores()["order"]
+    if not filters:
+        return order
+
+    def compute():
+        keep = np.unpackbits(selection_bitmap(filters), count=len(order)).view(bool)
+        return _read_only(order[keep[order]])
+
+    return get_result_cache().get_or_compute("outlier_ranking", selection_hash(filters), compute)
+
+
+def outlier_summary(filters=None):
+    """Holds in ``filters`` flagged by the forest, by a robust z-score, and by both."""
+    frozen = freeze_filters(filters)
+
+    def compute():
+        scores = outlier_scores()
+        rows = _ranked_rows(thaw_filters(frozen))
+        forest = scores["forest_score"][rows] > 0
+        robust = scores["max_abs_z"][rows] >= ROBUST_Z_THRESHOLD
+        return {
+            "holds": len(rows),
+            "forest": int(forest.sum()),
+            "robust": int(robust.sum()),
+            "both": int((forest & robust).sum()),
+        }
+
+    return get_result_cache().get_or_compute("outlier_summary", selection_hash(filters), compute)
+
+
+def top_outliers(filters=None, page=0, page_size=PAGE_SIZE, columns=()):
+    """One page of the holds in ``filters``, most anomalous first.
+
+    Returns ``(page_frame, total)``: the page's rows (``columns`` plus the
+    scores) and the number of holds in the selection. The ranking is cached,
+    so each page costs only its own rows.
+    """
+    rows = _ranked_rows(filters)
+    scores = outlier_scores()
+    pick = rows[page * page_size:(page + 1) * page_size]
+    metrics = outlier_metrics(dataset_columns())
+
+    out = take_rows(pick, columns) if columns else pd.DataFrame(index=pick)
+    out.insert(0, "row", pick)
+    out["forest_score"] = scores["forest_score"][pick]
+    for j, m in enumerate(metrics):
+        out[f"{m}_robust_z"] = scores["robust_z"][pick, j]
+    return out.reset_index(drop=True), len(rows)
+
+
+# ==========================
+# SERVER-SIDE BOX STATISTICS
+# ==========================
+def _box(values):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {
+        "n": len(values),
+        "mean": values.mean(),
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "lowerfence": inside.min(),
+        "upperfence": inside.max(),
+        "outliers": int(len(values) - len(inside)),
+        "min": values.min(),
+        "max": values.max(),
+    }
+
+
+def _box_stats(value, by, frozen):
+    columns = [value] + ([by] if by else [])
+    frame = pd.concat(list(scan_batches(columns, thaw_filters(frozen))), ignore_index=True)
+    groups = frame.groupby(by, sort=True) if by else [(None, frame)]
+    rows = []
+    for key, group in groups:
+        stats = _box(group[value].to_numpy(dtype=float))
+        if stats is not None:
+            rows.append({by: key, **stats} if by else stats)
+    return pd.DataFrame(rows)
+
+
+def box_stats(value, by=None, filters=None):
+    """Tukey box-plot statistics of ``value`` (per ``by`` group), computed on the server.
+
+    One row per group with ``n``, ``mean``, ``q1``, ``median``, ``q3``, the
+    whisker ends ``lowerfence`` / ``upperfence`` (furthest values within 1.5
+    IQR), the number of ``outliers`` beyond them, ``min`` and ``max``.
+    """
+    frozen = freeze_filters(filters)
+    return get_result_cache().get_or_compute(
+        "box_stats", (value, by, selection_hash(filters)), lambda: _box_stats(value, by, frozen)
+    )
@@ -0,0 +1,251 @@
+import itertools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import aggregate, distinct, scan_batches
+from utils.result_cache import get_result_cache
+from utils.selection import freeze_filters, selection_hash, thaw_filters
+
+# ==========================
+# HOLD POLICY MODEL
+# ==========================
+# A candidate policy has three levers:
+#   * max_hold_days    – days on hold beyond the cap are charged the full fee
+#   * partial_fee_pct  – share of the fee still charged during allowed hold days
+#   * exempt_reasons   – hold reasons the policy does not apply to
+# A hold of d days loses r = fee_loss / d per day, so the policy recovers
+#   r * max(d - cap, 0) + pct * r * min(d, cap)
+# unless its reason is exempt. Fairness compares each age category's /
+# location's share of the charged-back revenue with its share of holds: a fair
+# policy spreads the burden in proportion to who takes the holds.
+POLICY_COLUMNS = [
+    "reason_for_hold",
+    "application_contact_age_category",
+    "membership_location",
+    "hold_duration_days",
+    "fee_loss",
+]
+# label -> (groups, cell -> group codes) in the policy statistics
+FAIRNESS_DIMENSIONS = {
+    "Age Category": ("ages", "cell_age"),
+    "Location": ("locations", "cell_location"),
+}
+
+# Candidate grids larger than this are fanned out over a process pool
+PARALLEL_MIN_CANDIDATES = 50_000
+_CHUNK_CANDIDATES = 25_000
+
+
+def _codes(values, categories):
+    return pd.Categorical(values, categories=categories).codes.astype(np.int64)
+
+
+def _build_stats(filters):
+    """Per (reason x age x location) cell suffix sums over hold duration.
+
+    With R[d] = sum of r and RD[d] = sum of r * d over the cell's holds of d
+    days, the days beyond a cap M cost sum_{d>M} (RD[d] - M * R[d]), so any
+    cap is evaluated from two suffix sums instead of the raw rows.
+    """
+    reasons = distinct("reason_for_hold", filters=filters)
+    ages = distinct("application_contact_age_category", filters=filters)
+    locations = distinct("membership_location", filters=filters)
+    max_days = int(aggregate([], ["hold_duration_days"], ["max"], filters=filters).iloc[0]["hold_duration_days_max"])
+
+    n_cells = len(reasons) * len(ages) * len(locations)
+    width = max_days + 2
+    rate = np.zeros(n_cells * width)
+    rate_days = np.zeros(n_cells * width)
+    holds = np.zeros(n_cells)
+    for batch in scan_batches(POLICY_COLUMNS, filters):
+        batch = batch.dropna(subset=POLICY_COLUMNS)
+        batch = batch[batch["hold_duration_days"] > 0]
+        days = batch["hold_duration_days"].to_numpy(dtype=np.int64)
+        r = batch["fee_loss"].to_numpy(dtype=float) / days
+        cell = (
+            _codes(batch["reason_for_hold"], reasons) * len(ages)
+            + _codes(batch["application_contact_age_category"], ages)
+        ) * len(locations) + _codes(batch["membership_location"], locations)
+        slot = cell * width + days
+        rate += np.bincount(slot, weights=r, minlength=n_cells * width)
+        rate_days += np.bincount(slot, weights=r * days, minlength=n_cells * width)
+        holds += np.bincount(cell, minlength=n_cells)
+
+    rate = rate.reshape(n_cells, width)
+    rate_days = rate_days.reshape(n_cells, width)
+    # suffix[:, M] = sum over durations d > M
+    suffix_rate = np.cumsum(rate[:, ::-1], axis=1)[:, ::-1]
+    suffix_rate = np.concatenate([suffix_rate[:, 1:], np.zeros((n_cells, 1))], axis=1)
+    suffix_rate_days = np.cumsum(rate_days[:, ::-1], axis=1)[:, ::-1]
+    suffix_rate_days = np.concatenate([suffix_rate_days[:, 1:], np.zeros((n_cells, 1))], axis=1)
+
+    grid = np.indices((len(reasons), len(ages), len(locations))).reshape(3, -1)
+    return {
+        "reasons": reasons,
+        "ages": ages,
+        "locations": locations,
+        "max_days": max_days,
+        "cell_reason": grid[0],
+        "cell_age": grid[1],
+        "cell_location": grid[2],
+        "holds": holds,
+        "loss": rate_days.sum(axis=1),
+        "suffix_rate": suffix_rate,
+        "suffix_rate_days": suffix_rate_days,
+    }
+
+
+def policy_stats(filters=None):
+    """Sufficient statistics for evaluating hold policies (cached per filter set)."""
+    return get_result_cache().get_or_compute("policy_stats", selection_hash(filters), lambda: _build_stats(filters))
+
+
+def _group_matrix(cell_group, n_groups):
+    onehot = np.zeros((n_groups, len(cell_group)))
+    onehot[cell_group, np.arange(len(cell_group))] = 1.0
+    return onehot
+
+
+def evaluate_policies(stats, caps, pcts, exempt_masks):
+    """Score candidates given as parallel arrays (cap days, partial fee fraction, reason bitmask).
+
+    Returns recovered revenue per candidate and, per fairness dimension, each
+    group's share of it (candidates x groups).
+    """
+    caps = np.clip(np.asarray(caps, dtype=np.int64), 0, stats["max_days"] + 1)
+    pcts = np.asarray(pcts, dtype=float)
+    exempt_masks = np.asarray(exempt_masks, dtype=np.int64)
+
+    # cells x candidates
+    excess = stats["suffix_rate_days"][:, caps] - caps * stats["suffix_rate"][:, caps]
+    within = stats["loss"][:, None] - excess
+    applies = ((exempt_masks[None, :] >> stats["cell_reason"][:, None]) & 1) == 0
+    recovered = np.where(applies, excess + pcts * within, 0.0)
+
+    total = recovered.sum(axis=0)
+    shares = {}
+    for label, (groups, cell_group) in FAIRNESS_DIMENSIONS.items():
+        onehot = _group_matrix(stats[cell_group], len(stats[groups]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares[label] = np.nan_to_num((onehot @ recovered) / total).T
+    return total, shares
+
+
+def hold_shares(stats):
+    """Each group's share of holds, per fairness dimension."""
+    shares = {}
+    for label, (groups, cell_group) in FAIRNESS_DIMENSIONS.items():
+        group_holds = _group_matrix(stats[cell_group], len(stats[groups])) @ stats["holds"]
+        shares[label] = group_holds / max(group_holds.sum(), 1)
+    return shares
+
+
+# ==========================
+# PARALLEL GRID SEARCH
+# ==========================
+_worker_stats = None
+
+
+def _init_worker(stats):
+    # The statistics are sent to each worker once, not once per chunk
+    global _worker_stats
+    _worker_stats = stats
+
+
+def _score_chunk(chunk):
+    caps, pcts, masks = chunk
+    recovered, shares = evaluate_policies(_worker_stats, caps, pcts, masks)
+    baseline = hold_shares(_worker_stats)
+    # Largest gap between a group's share of the charges and its share of holds
+    disparity = {
+        label: np.where(recovered > 0, np.abs(s - baseline[label]).max(axis=1), 0.0)
+        for label, s in shares.items()
+    }
+    return recovered, disparity
+
+
+def pareto_front(recovered, disparity):
+    """Mask of candidates no other candidate beats on both recovered revenue (max) and disparity (min)."""
+    order = np.lexsort((disparity, -recovered))
+    best = np.minimum.accumulate(disparity[order])
+    keep = np.zeros(len(recovered), dtype=bool)
+    keep[order] = disparity[order] < np.concatenate([[np.inf], best[:-1]])
+    return keep
+
+
+def _search(frozen, caps, pcts, exemptable, max_workers):
+    filters = thaw_filters(frozen)
+    stats = policy_stats(filters)
+    reason_bit = {reason: 1 << i for i, reason in enumerate(stats["reasons"])}
+    exemptable = [r for r in exemptable if r in reason_bit]
+    subsets = [
+        combo for k in range(len(exemptable) + 1) for combo in itertools.combinations(exemptable, k)
+    ]
+    masks = np.array([sum(reason_bit[r] for r in combo) for combo in subsets], dtype=np.int64)
+
+    grid_cap, grid_pct, grid_subset = np.meshgrid(
+        np.asarray(caps), np.asarray(pcts) / 100.0, np.arange(len(subsets)), indexing="ij"
+    )
+    grid_cap, grid_pct, grid_subset = grid_cap.ravel(), grid_pct.ravel(), grid_subset.ravel()
+    chunks = [
+        (grid_cap[i:i + _CHUNK_CANDIDATES], grid_pct[i:i + _CHUNK_CANDIDATES], masks[grid_subset[i:i + _CHUNK_CANDIDATES]])
+        for i in range(0, len(grid_cap), _CHUNK_CANDIDATES)
+    ]
+
+    if len(grid_cap) >= PARALLEL_MIN_CANDIDATES:
+        # spawn: forking a multi-threaded Streamlit server is not safe
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(stats,),
+        ) as pool:
+            results = list(pool.map(_score_chunk, chunks))
+    else:
+        _init_worker(stats)
+        results = [_score_chunk(chunk) for chunk in chunks]
+
+    recovered = np.concatenate([r for r, _ in results])
+    candidates = pd.DataFrame({
+        "max_hold_days": grid_cap,
+        "partial_fee_pct": np.round(grid_pct * 100, 2),
+        "exempt_reasons": [", ".join(subsets[i]) or "None" for i in grid_subset],
+        "recovered_revenue": recovered,
+        "recovered_pct": recovered / stats["loss"].sum() * 100,
+    })
+    for label in FAIRNESS_DIMENSIONS:
+        candidates[f"disparity_{label.lower().replace(' ', '_')}"] = np.concatenate([d[label] for _, d in results]) * 100
+    disparity_cols = [c for c in candidates.columns if c.startswith("disparity_")]
+    candidates["disparity"] = candidates[disparity_cols].max(axis=1)
+    candidates["pareto"] = pareto_front(candidates["recovered_revenue"].to_numpy(), candidates["disparity"].to_numpy())
+    return candidates
+
+
+def search_policies(caps, pcts, exemptable=(), filters=None, max_workers=None):
+    """Evaluate every (cap, partial fee %, exemption subset) combination.
+
+    ``caps`` are max hold days, ``pcts`` partial-fee percentages and every
+    subset of ``exemptable`` reasons is tried. Returns one row per candidate
+    with recovered revenue, disparity (largest percentage-point gap between an
+    age category's / location's share of the charges and its share of holds;
+    ``disparity`` is the worse of the two) and a ``pareto`` flag. Cached per
+    grid and filter set.
+    """
+    caps, pcts, exemptable = tuple(int(c) for c in caps), tuple(float(p) for p in pcts), tuple(exemptable)
+    frozen = freeze_filters(filters)
+    return get_result_cache().get_or_compute(
+        "policy_search",
+        (caps, pcts, exemptable, selection_hash(filters)),
+        lambda: _search(frozen, caps, pcts, exemptable, max_workers),
+    )
+
+
+def policy_impact(stats, cap, pct, exempt=()):
+    """Recovered revenue and per-group shares of it for a single policy."""
+    reason_bit = {reason: 1 << i for i, reason in enumerate(stats["reasons"])}
+    mask = sum(reason_bit[r] for r in exempt if r in reason_bit)
+    recovered, shares = evaluate_policies(stats, [cap], [pct / 100.0], [mask])
+    return recovered[0], {label: s[0] for label, s in shares.items()}
@@ -0,0 +1,70 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import plotly.io as pio
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# ==========================
+# SHARED CHART WORKER POOL
+# ==========================
+CHART_WORKERS = int(os.environ.get("YMCA_CHART_WORKERS", str(min(8, (os.cpu_count() or 2) * 2))))
+
+SKELETON_HTML = """
+<div style="height:{height}px; border-radius:10px; margin-bottom:16px;
+            background:linear-gradient(90deg,#f3e3e3 25%,#fbeeee 50%,#f3e3e3 75%);
+            background-size:200% 100%; animation:ymca-skeleton 1.2s ease-in-out infinite;
+            display:flex; align-items:center; justify-content:center; color:#a05050;">
+    ⏳ {label}
+</div>
+<style>@keyframes ymca-skeleton {{0% {{background-position:200% 0}} 100% {{background-position:-200% 0}}}}</style>
+"""
+
+
+@st.cache_resource(show_spinner=False)
+def _chart_executor():
+    return ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix="chart-worker")
+
+
+def _with_ctx(build, ctx):
+    # Attach the session's script context so cached helpers used while building
+    # behave as on the main thread. Builders must not call st.* themselves.
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        fig = build()
+        # Serialize on the worker so the script thread only has to send it
+        return fig if isinstance(fig, dict) else json.loads(pio.to_json(fig, validate=False))
+    return run
+
+
+class ProgressiveCharts:
+    """Render cheap content first and stream heavy charts in afterwards.
+
+    ``add()`` reserves a placeholder (showing a skeleton) at the current position
+    and starts building the figure on the shared worker pool; the page then keeps
+    rendering KPIs and tables. ``render()`` fills each placeholder as soon as its
+    figure is ready.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._ctx = get_script_run_ctx()
+
+    def add(self, build, container=None, label="Loading chart...", height=450, **plotly_kwargs):
+        placeholder = (container or st).empty()
+        placeholder.markdown(SKELETON_HTML.format(height=height, label=label), unsafe_allow_html=True)
+        future = _chart_executor().submit(_with_ctx(build, self._ctx))
+        self._jobs[future] = (placeholder, plotly_kwargs)
+        return placeholder
+
+    def render(self):
+        for future in as_completed(list(self._jobs)):
+            placeholder, plotly_kwargs = self._jobs.pop(future)
+            try:
+                fig = future.result()
+            except Exception as e:
+                placeholder.error(f"❌ Could not build chart: {e}")
+                continue
+            placeholder.plotly_chart(fig, use_container_width=True, **plotly_kwargs)
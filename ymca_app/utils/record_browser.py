@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.aggregates import dataset_columns, scan_batches, take_rows
+from utils.data_loader import dataset_version
+from utils.result_cache import get_result_cache
+from utils.selection import filter_index, selection_bitmap, selection_hash
+
+# ==========================
+# SORT PERMUTATIONS
+# ==========================
+# Per sortable column the dataset's row positions are argsorted once per
+# dataset version (values ascending, missing values last). A filtered, sorted
+# view is that permutation masked by the selection bitmap, cached per
+# (selection, column); a page is then a slice of it, so paging costs only the
+# rows shown. Descending order walks the present values backwards and keeps
+# missing values last.
+PAGE_SIZES = [25, 50, 100, 250]
+DATASET_ORDER = "(dataset order)"
+
+
+def _read_only(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+def _sort_permutation(values):
+    """``(order, n_present)``: positions sorting ``values`` ascending, missing values last."""
+    s = pd.Series(values)
+    missing = s.isna().to_numpy()
+    if s.dtype.kind in "biufmM":
+        key = s.to_numpy()
+        if key.dtype.kind in "mM":
+            key = key.view("int64")
+    else:
+        key, _ = pd.factorize(s, sort=True)
+    order = np.lexsort((key, missing))
+    return _read_only(order.astype(np.int64)), int((~missing).sum())
+
+
+@st.cache_resource(show_spinner=False)
+def _build_sort_order(version, col):
+    return _sort_permutation(pd.concat([batch[col] for batch in scan_batches([col])], ignore_index=True))
+
+
+def sort_order(col):
+    """``(order, n_present)`` of a dataset column, built once per dataset version."""
+    return _build_sort_order(dataset_version(), col)
+
+
+def _sorted_rows(filters, sort_by, derived, derived_key):
+    """Row positions of the selection in ascending ``sort_by`` order, and how many have a value."""
+    if sort_by is None:
+        rows = filter_index(filters)
+        return rows, len(rows)
+
+    if derived is not None and sort_by in derived.columns:
+        # Derived columns only exist for the selection: sort them once per selection
+        def compute():
+            order, n_present = _sort_permutation(derived[sort_by].to_numpy())
+            return _read_only(derived.index.to_numpy()[order]), n_present
+
+        return get_result_cache().get_or_compute(
+            "browser_derived_order", (derived_key, sort_by, selection_hash(filters)), compute
+        )
+
+    order, n_present = sort_order(sort_by)
+    if not filters:
+        return order, n_present
+
+    def compute():
+        kept = np.unpackbits(selection_bitmap(filters), count=len(order)).view(bool)[order]
+        return _read_only(order[kept]), int(kept[:n_present].sum())
+
+    return get_result_cache().get_or_compute("browser_order", (sort_by, selection_hash(filters)), compute)
+
+
+def browse(filters=None, sort_by=None, descending=False, page=0, page_size=PAGE_SIZES[0], columns=None,
+           derived=None, derived_key=None):
+    """One page of the records in ``filters``, optionally sorted by ``sort_by``.
+
+    ``derived`` is an optional frame of extra columns indexed by row position
+    (covering the selection) that is shown and can be sorted on;
+    ``derived_key`` identifies its contents for caching. Returns
+    ``(page_frame, total)``; the frame's index is the row position.
+    """
+    rows, n_present = _sorted_rows(filters, sort_by, derived, derived_key)
+    idx = np.arange(page * page_size, min((page + 1) * page_size, len(rows)))
+    if sort_by is not None and descending:
+        idx = np.where(idx < n_present, n_present - 1 - idx, idx)
+    positions = rows[idx]
+
+    out = take_rows(positions, columns)
+    if derived is not None:
+        out = out.join(derived.loc[positions])
+    return out, len(rows)
+
+
+# ==========================
+# BROWSER WIDGET
+# ==========================
+@st.fragment
+def _browser(key, filters, columns, sort_by, descending, derived, derived_key):
+    sortable = list(columns if columns is not None else dataset_columns())
+    if derived is not None:
+        sortable += [c for c in derived.columns if c not in sortable]
+
+    c1, c2, c3 = st.columns([3, 1, 1])
+    options = [DATASET_ORDER] + sortable
+    sort_choice = c1.selectbox(
+        "Sort by:", options, index=options.index(sort_by) if sort_by in options else 0, key=f"_rb_{key}_sort"
+    )
+    desc = c2.toggle("Descending", value=descending, key=f"_rb_{key}_desc")
+    page_size = c3.selectbox("Rows per page:", PAGE_SIZES, key=f"_rb_{key}_size")
+    sort_col = None if sort_choice == DATASET_ORDER else sort_choice
+
+    total = len(_sorted_rows(filters, sort_col, derived, derived_key)[0])
+    n_pages = max(1, -(-total // page_size))
+    page_key = f"_rb_{key}_page"
+    # A narrower selection may have fewer pages than the one last shown
+    if st.session_state.get(page_key, 1) > n_pages:
+        st.session_state[page_key] = n_pages
+    page = st.number_input(f"Page (of {n_pages:,}):", min_value=1, max_value=n_pages, step=1, key=page_key)
+
+    rows, _ = browse(filters, sort_col, desc, page - 1, page_size, columns, derived, derived_key)
+    st.dataframe(rows, use_container_width=True)
+    first = (page - 1) * page_size
+    st.caption(f"Records {min(first + 1, total):,}–{first + len(rows):,} of {total:,}")
+
+
+def render_record_browser(key, filters=None, columns=None, sort_by=None, descending=False, derived=None,
+                          derived_key=None):
+    """Paged, sortable table of the records in ``filters``.
+
+    Only the visible page is sent to the browser. The widget is a fragment:
+    sorting or paging reruns just the table. ``key`` keeps its widgets apart
+    from other browsers; see ``browse`` for ``derived``.
+    """
+    _browser(key, filters, columns, sort_by, descending, derived, derived_key)
@@ -0,0 +1,140 @@
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import dataset_version
+
+# ==========================
+# CONFIGURATION
+# ==========================
+RESULT_CACHE_MB = int(os.environ.get("YMCA_RESULT_CACHE_MB", "256"))
+
+
+def estimate_bytes(value):
+    """Approximate in-memory size of a cached value."""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_bytes(v) for v in value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def _shallow_copy(value):
+    # Callers commonly add columns to returned frames; give them their own
+    # container so the cached object itself is never modified.
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, tuple):
+        return tuple(_shallow_copy(v) for v in value)
+    return value
+
+
+class ResultCache:
+    """Process-wide LRU cache for aggregates, filtered indexes and figures.
+
+    Entries are keyed by ``(operation, params, dataset version)`` and evicted
+    least-recently-used first once their combined size passes ``max_bytes``.
+    When the dataset version changes, every entry from the old version is dropped.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()     # key -> (value, size)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, operation, params, version):
+        key = (operation, params, version)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], True
+
+    def put(self, operation, params, version, value):
+        key = (operation, params, version)
+        size = estimate_bytes(value)
+        if size > self.max_bytes:
+            # Larger than the whole budget: hand it back without caching
+            return
+        with self._lock:
+            self._check_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, operation, params, compute, version=None):
+        """Return the cached result for ``(operation, params)`` or compute and store it."""
+        version = dataset_version() if version is None else version
+        value, found = self.get(operation, params, version)
+        if not found:
+            value = compute()
+            self.put(operation, params, version, value)
+        return _shallow_copy(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    """The single ResultCache shared by every page and session."""
+    return ResultCache(RESULT_CACHE_MB * 1024 * 1024)
+
+
+def cached_result(operation, params, compute):
+    """Shortcut for ``get_result_cache().get_or_compute(...)`` on the current dataset version."""
+    return get_result_cache().get_or_compute(operation, params, compute)
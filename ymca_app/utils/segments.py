@@ -0,0 +1,166 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy import stats
+
+from utils.aggregates import dataset_rows, scan_batches, take_rows
+from utils.data_loader import dataset_version
+from utils.result_cache import get_result_cache
+from utils.selection import selection_bitmap, selection_hash
+
+# ==========================
+# SEGMENT OFFSETS INDEX
+# ==========================
+# Per segment column the dataset's rows are sorted once by segment value;
+# value i owns order[offsets[i]:offsets[i + 1]] (rows ascending). Pulling a
+# segment's rows is a slice, not a column scan, and the per-row codes give any
+# segment's category mix with one bincount.
+SIGNIFICANCE_LEVEL = 0.05
+
+
+def _read_only(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+@st.cache_resource(show_spinner=False)
+def _build_segment_index(version, col):
+    column = pd.concat([batch[col] for batch in scan_batches([col])], ignore_index=True)
+    codes, values = pd.factorize(column, sort=True)
+    codes = codes.astype(np.int64)
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=len(values)))])
+    lookup = {v: i for i, v in enumerate(values.tolist())}
+    return lookup, _read_only(codes), _read_only(order), _read_only(offsets)
+
+
+def segment_index(col):
+    """``(value -> position, per-row codes, order, offsets)`` for a segment column."""
+    return _build_segment_index(dataset_version(), col)
+
+
+def segment_rows(col, value, filters=None):
+    """Row positions (ascending) of the dataset where ``col == value``, within ``filters``."""
+    lookup, _, order, offsets = segment_index(col)
+    if value not in lookup:
+        return np.empty(0, dtype=np.int64)
+    i = lookup[value]
+    rows = order[offsets[i]:offsets[i + 1]]
+    if filters:
+        keep = np.unpackbits(selection_bitmap(filters), count=dataset_rows()).view(bool)
+        rows = rows[keep[rows]]
+    return rows
+
+
+# ==========================
+# SIGNIFICANCE TESTS
+# ==========================
+def holm(pvalues):
+    """Holm–Bonferroni adjusted p-values (controls the family-wise error rate)."""
+    p = np.asarray(pvalues, dtype=float)
+    order = np.argsort(p)
+    adjusted = np.maximum.accumulate(p[order] * (len(p) - np.arange(len(p))))
+    out = np.empty_like(p)
+    out[order] = np.minimum(adjusted, 1.0)
+    return out
+
+
+def _welch(a, b):
+    # Vectorized over metric columns; NaNs are left out per column
+    n_a, n_b = (~np.isnan(a)).sum(axis=0), (~np.isnan(b)).sum(axis=0)
+    var_a, var_b = np.nanvar(a, axis=0, ddof=1) / n_a, np.nanvar(b, axis=0, ddof=1) / n_b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (np.nanmean(a, axis=0) - np.nanmean(b, axis=0)) / np.sqrt(var_a + var_b)
+        dof = (var_a + var_b) ** 2 / (var_a ** 2 / (n_a - 1) + var_b ** 2 / (n_b - 1))
+    return t, 2 * stats.t.sf(np.abs(t), dof)
+
+
+def _compare(col, segment_values, metrics, categories, filters):
+    rows = {v: segment_rows(col, v, filters) for v in segment_values}
+    values = {v: take_rows(r, metrics).to_numpy(dtype=float) for v, r in rows.items()}
+
+    summary = []
+    for v, x in values.items():
+        for j, m in enumerate(metrics):
+            summary.append({
+                col: v,
+                "metric": m,
+                "n": int((~np.isnan(x[:, j])).sum()),
+                "mean": np.nanmean(x[:, j]) if len(x) else np.nan,
+                "median": np.nanmedian(x[:, j]) if len(x) else np.nan,
+                "std": np.nanstd(x[:, j], ddof=1) if len(x) > 1 else np.nan,
+            })
+
+    numeric = []
+    for a, b in itertools.combinations(segment_values, 2):
+        xa, xb = values[a], values[b]
+        if len(xa) < 2 or len(xb) < 2:
+            continue
+        t, t_p = _welch(xa, xb)
+        u, u_p = stats.mannwhitneyu(xa, xb, axis=0, nan_policy="omit", method="asymptotic")
+        for j, m in enumerate(metrics):
+            numeric.append({
+                "segment_a": a,
+                "segment_b": b,
+                "metric": m,
+                "mean_a": np.nanmean(xa[:, j]),
+                "mean_b": np.nanmean(xb[:, j]),
+                "difference": np.nanmean(xa[:, j]) - np.nanmean(xb[:, j]),
+                "welch_t": t[j],
+                "welch_p": t_p[j],
+                "mann_whitney_u": u[j],
+                "mann_whitney_p": u_p[j],
+            })
+    numeric = pd.DataFrame(numeric)
+    if len(numeric):
+        # One family: every pair x metric x test on this page
+        adjusted = holm(np.concatenate([numeric["welch_p"], numeric["mann_whitney_p"]]).astype(float))
+        numeric["welch_p_adj"] = adjusted[:len(numeric)]
+        numeric["mann_whitney_p_adj"] = adjusted[len(numeric):]
+        numeric["significant"] = (numeric[["welch_p_adj", "mann_whitney_p_adj"]] < SIGNIFICANCE_LEVEL).any(axis=1)
+
+    mixes, categorical = [], []
+    for cat in categories:
+        lookup, codes, _, _ = segment_index(cat)
+        table = np.array([np.bincount(codes[r][codes[r] >= 0], minlength=len(lookup)) for r in rows.values()])
+        labels = list(lookup)
+        for v, counts in zip(segment_values, table):
+            mixes.extend({col: v, "category": cat, "value": label, "rows": int(c)} for label, c in zip(labels, counts))
+        # Categories no compared segment has would give empty expected counts
+        table = table[:, table.sum(axis=0) > 0]
+        if table.shape[1] < 2 or (table.sum(axis=1) == 0).any():
+            continue
+        chi2, p, dof, _ = stats.chi2_contingency(table)
+        n = table.sum()
+        categorical.append({
+            "category": cat,
+            "chi2": chi2,
+            "dof": dof,
+            "p_value": p,
+            "cramers_v": np.sqrt(chi2 / (n * (min(table.shape) - 1))),
+        })
+    categorical = pd.DataFrame(categorical)
+    if len(categorical):
+        categorical["p_adj"] = holm(categorical["p_value"])
+        categorical["significant"] = categorical["p_adj"] < SIGNIFICANCE_LEVEL
+
+    return pd.DataFrame(summary), numeric, categorical, pd.DataFrame(mixes)
+
+
+def compare_segments(col, segment_values, metrics, categories=(), filters=None):
+    """Compare two or more values of segment column ``col``.
+
+    Every pair of segments is tested on every metric at once (Welch t and
+    Mann–Whitney U) and the category mixes of all segments with chi-square.
+    P-values are Holm-adjusted within each table. Returns ``(summary,
+    numeric_tests, category_tests, category_mix)``; cached per filter set.
+    """
+    segment_values, metrics, categories = tuple(segment_values), tuple(metrics), tuple(categories)
+    return get_result_cache().get_or_compute(
+        "segment_compare",
+        (col, segment_values, metrics, categories, selection_hash(filters)),
+        lambda: _compare(col, list(segment_values), list(metrics), list(categories), filters),
+    )
@@ -0,0 +1,132 @@
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import load_data
+from utils.result_cache import get_result_cache
+
+# ==========================
+# FILTER SPECS
+# ==========================
+# A filter set is ``{column: allowed values}``; a column may instead map to a
+# DateRange (inclusive on both ends, compared by calendar day).
+DateRange = namedtuple("DateRange", ["start", "end"])
+
+
+def freeze_filters(filters):
+    """Hashable, order-independent form of a filter set."""
+    frozen = []
+    for col, allowed in (filters or {}).items():
+        if isinstance(allowed, DateRange):
+            frozen.append((col, DateRange(pd.Timestamp(allowed.start), pd.Timestamp(allowed.end))))
+        else:
+            frozen.append((col, tuple(sorted(allowed, key=str))))
+    return tuple(sorted(frozen, key=lambda item: item[0]))
+
+
+def thaw_filters(frozen):
+    return {col: allowed if isinstance(allowed, DateRange) else list(allowed) for col, allowed in frozen}
+
+
+def selection_hash(filters):
+    """Short stable key for a filter set, used in every cache key that depends on it."""
+    frozen = freeze_filters(filters)
+    if not frozen:
+        return "all"
+    return hashlib.sha1(repr(frozen).encode("utf-8")).hexdigest()[:16]
+
+
+def combine_filters(*filter_sets):
+    """AND several filter sets together (value lists on the same column are intersected)."""
+    combined = {}
+    for filters in filter_sets:
+        for col, allowed in (filters or {}).items():
+            if col not in combined:
+                combined[col] = allowed
+            elif isinstance(allowed, DateRange):
+                prev = combined[col]
+                combined[col] = DateRange(max(prev.start, allowed.start), min(prev.end, allowed.end))
+            else:
+                allowed_set = set(allowed)
+                combined[col] = [v for v in combined[col] if v in allowed_set]
+    return combined
+
+
+def row_mask(df, filters):
+    """Boolean mask of the rows of ``df`` that pass ``filters``."""
+    mask = np.ones(len(df), dtype=bool)
+    for col, allowed in (filters or {}).items():
+        if isinstance(allowed, DateRange):
+            day = df[col].dt.normalize()
+            mask &= ((day >= pd.Timestamp(allowed.start)) & (day <= pd.Timestamp(allowed.end))).to_numpy()
+        else:
+            mask &= df[col].isin(list(allowed)).to_numpy()
+    return mask
+
+
+# ==========================
+# CACHED ROW SELECTIONS
+# ==========================
+def _read_only(arr):
+    # Cached arrays are shared by every session
+    arr.flags.writeable = False
+    return arr
+
+
+def _aggregates():
+    # Imported on use: the aggregates API is itself built on this module
+    from utils import aggregates
+    return aggregates
+
+
+def selection_bitmap(filters):
+    """Packed bitmap (1 bit per row) of the dataset rows passing ``filters``.
+
+    Every column's bitmap is resolved once and kept in the shared result cache;
+    a multi-column selection is the AND of those, so narrowing an existing
+    selection (e.g. a chart cross-filter) only scans the newly added column.
+    A column's bitmap streams just that column, so out of core the full frame
+    is never loaded.
+    """
+    frozen = freeze_filters(filters)
+    if len(frozen) > 1:
+        def compute():
+            bitmaps = [selection_bitmap({col: allowed}) for col, allowed in thaw_filters(frozen).items()]
+            return _read_only(np.bitwise_and.reduce(bitmaps))
+    elif frozen:
+        def compute():
+            only = thaw_filters(frozen)
+            masks = [row_mask(batch, only) for batch in _aggregates().scan_batches(list(only))]
+            return _read_only(np.packbits(np.concatenate(masks) if masks else np.zeros(0, dtype=bool)))
+    else:
+        def compute():
+            return _read_only(np.packbits(np.ones(_aggregates().dataset_rows(), dtype=bool)))
+
+    return get_result_cache().get_or_compute("selection_bitmap", selection_hash(filters), compute)
+
+
+def filter_index(filters):
+    """Row positions (scan order) that pass ``filters`` (cached per selection hash)."""
+    def compute():
+        n = _aggregates().dataset_rows()
+        return _read_only(np.flatnonzero(np.unpackbits(selection_bitmap(filters), count=n)))
+
+    return get_result_cache().get_or_compute("filter_index", selection_hash(filters), compute)
+
+
+def filtered_data(filters, columns=None):
+    """The holds passing ``filters``, with only ``columns`` (all by default).
+
+    In memory this is a view of the shared frame (the frame itself when there
+    are no filters); out of core only the selected rows and columns are read.
+    """
+    aggregates = _aggregates()
+    if not aggregates.OUT_OF_CORE:
+        df = load_data()
+        if filters:
+            df = df.iloc[filter_index(filters)]
+        return df if columns is None else df[list(columns)]
+    rows = filter_index(filters) if filters else np.arange(aggregates.dataset_rows())
+    return aggregates.take_rows(rows, columns)
@@ -0,0 +1,137 @@
+import numpy as np
+
+from utils.aggregates import dataset_columns, scan_batches, streaming_aggregate
+from utils.result_cache import get_result_cache
+from utils.selection import DateRange, row_mask, selection_hash
+
+# ==========================
+# LOG-BUCKET QUANTILE SKETCH
+# ==========================
+# Values are counted in logarithmic buckets whose width is a fixed fraction of
+# their value (the DDSketch scheme), so any quantile read from a sketch is
+# within RELATIVE_ACCURACY of the exact one. Two sketches merge by adding their
+# bucket counts, which lets every segment combination be answered from cells.
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+
+# Offset keeping bucket keys monotone in the value: negatives < 0 (zero) < positives
+_KEY_OFFSET = 1 << 20
+
+SKETCH_VALUES = ["hold_duration_days", "fee_loss", "membership_fee"]
+SKETCH_KEYS = [
+    "membership_location",
+    "reason_for_hold",
+    "application_contact_age_category",
+    "application_package_category",
+    "application_subscription_membership_type",
+    "cluster_label",
+    "cluster_name",
+    "hold_year",
+]
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def bucket_keys(values):
+    """Sketch bucket key of every value."""
+    values = np.asarray(values, dtype=float)
+    mags = np.abs(values)
+    keys = np.zeros(len(values), dtype=np.int64)
+    nonzero = mags > 0
+    keys[nonzero] = np.ceil(np.log(mags[nonzero]) / _LOG_GAMMA).astype(np.int64) + _KEY_OFFSET
+    return np.where(values < 0, -keys, keys)
+
+
+def bucket_values(keys):
+    """Representative value of each bucket (relative error <= RELATIVE_ACCURACY)."""
+    keys = np.asarray(keys, dtype=np.int64)
+    mags = 2 * _GAMMA ** (np.abs(keys) - _KEY_OFFSET) / (_GAMMA + 1)
+    return np.where(keys == 0, 0.0, np.sign(keys) * mags)
+
+
+def quantile_label(q):
+    return f"p{q * 100:g}"
+
+
+# ==========================
+# PER-CELL SKETCHES
+# ==========================
+def sketch_keys():
+    """Columns of the cells sketches are kept for (those present in this dataset)."""
+    columns = dataset_columns()
+    return [c for c in SKETCH_KEYS if c in columns]
+
+
+def _bucketed(batches, value):
+    for batch in batches:
+        batch = batch[batch[value].notna()]
+        yield batch.drop(columns=value).assign(_bucket=bucket_keys(batch[value].to_numpy()))
+
+
+def cell_sketches(value, filters=None):
+    """Sketch of ``value`` for every cell of the segment cube.
+
+    One row per (cell, bucket): the key columns, ``_bucket`` and ``rows`` (the
+    bucket count). Built in one streaming pass and cached per filter set.
+    """
+    keys = sketch_keys()
+    return get_result_cache().get_or_compute(
+        "quantile_sketch",
+        (value, tuple(keys), selection_hash(filters)),
+        lambda: streaming_aggregate(_bucketed(scan_batches(keys + [value], filters), value), keys + ["_bucket"]),
+    )
+
+
+def merge_quantiles(sketches, by, value, qs=DEFAULT_QUANTILES, filters=None):
+    """Merge cell sketches per ``by`` group and read ``qs`` off the merged sketch.
+
+    ``filters`` may only use the cells' key columns.
+    """
+    by = list(by)
+    cells = sketches[row_mask(sketches, filters)] if filters else sketches
+    if not by:
+        cells = cells.assign(_all=0)
+    group = by or ["_all"]
+
+    merged = cells.groupby(group + ["_bucket"], sort=True)["rows"].sum().reset_index()
+    grouped = merged.groupby(group, sort=True)["rows"]
+    seen = grouped.cumsum().to_numpy()
+    total = grouped.transform("sum").to_numpy()
+
+    out = grouped.sum().to_frame().drop(columns="rows")
+    for q in qs:
+        # First bucket whose running count passes the (0-based) rank of the quantile
+        first = merged[seen > q * (total - 1)].groupby(group, sort=True)["_bucket"].first()
+        out[f"{value}_{quantile_label(q)}"] = bucket_values(first.reindex(out.index).to_numpy())
+
+    if not by:
+        return out.reset_index(drop=True)
+    return out.reset_index()
+
+
+def quantiles(by, value, qs=DEFAULT_QUANTILES, filters=None):
+    """Quantiles of ``value`` (P50 / P90 / P99 by default) per ``by`` group.
+
+    Answered by merging the per-cell sketches, never by scanning raw rows.
+    ``by`` must be sketch key columns. Filters on key columns select cells;
+    any other filter (e.g. a start-date range) selects the rows the cell
+    sketches are built from. Returns ``by`` plus ``{value}_p50`` etc.
+    """
+    keys = sketch_keys()
+    unknown = [c for c in by if c not in keys]
+    if unknown:
+        raise ValueError(f"Cannot group quantiles by {unknown}, sketches are kept per {keys}")
+
+    cell_filters, row_filters = {}, {}
+    for col, allowed in (filters or {}).items():
+        if col in keys and not isinstance(allowed, DateRange):
+            cell_filters[col] = allowed
+        else:
+            row_filters[col] = allowed
+
+    by, qs = tuple(by), tuple(qs)
+    return get_result_cache().get_or_compute(
+        "quantiles",
+        (by, value, qs, selection_hash(filters)),
+        lambda: merge_quantiles(cell_sketches(value, row_filters), by, value, qs, cell_filters),
+    )
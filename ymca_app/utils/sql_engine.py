@@ -0,0 +1,103 @@
+import re
+import threading
+
+import duckdb
+import streamlit as st
+
+from utils.data_loader import _load_shared, dataset_version
+from utils.result_cache import get_result_cache
+
+# ==========================
+# SETTINGS
+# ==========================
+TABLE_NAME = "holds"
+DEFAULT_ROW_CAP = 5_000
+DEFAULT_TIMEOUT_S = 10
+
+
+class QueryError(Exception):
+    """Raised when a query is rejected, fails, or runs past its timeout."""
+
+
+@st.cache_resource(show_spinner=False)
+def _get_connection(version):
+    # In-memory database with no file / network access: the only thing a
+    # query can see is the registered hold dataset.
+    return duckdb.connect(config={"enable_external_access": False})
+
+
+# Whitespace and comments, skipping over string literals and quoted identifiers
+_GAP = r"(?:\s+|--[^\n]*|/\*.*?\*/)"
+_SQL_TOKENS = re.compile(rf"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\$\$.*?\$\$|(?P<gap>{_GAP}+)", re.S)
+
+
+def normalize_sql(sql):
+    """Cache key for ``sql``: comments dropped, whitespace outside literals collapsed, trailing semicolons removed.
+
+    Only used to let equivalent queries share a cache entry; the query is
+    always executed as written.
+    """
+    return _SQL_TOKENS.sub(lambda m: " " if m.group("gap") else m.group(0), sql).strip().rstrip(";").strip()
+
+
+def _check_read_only(sql):
+    # Decided on the parsed statement; the connection's disabled external
+    # access is a second layer, not the guard
+    try:
+        statements = duckdb.extract_statements(sql)
+    except duckdb.Error as e:
+        raise QueryError(str(e))
+    if len(statements) != 1:
+        raise QueryError("Please run one statement at a time.")
+    if statements[0].type != duckdb.StatementType.SELECT:
+        raise QueryError("Only read-only queries (SELECT / WITH / DESCRIBE / SUMMARIZE) are allowed.")
+
+
+def _execute(sql, version, row_cap, timeout_s):
+    con = _get_connection(version)
+    cur = con.cursor()
+    # register() scans the shared frame in place through Arrow, no copy is made
+    cur.register(TABLE_NAME, _load_shared(version))
+
+    timer = threading.Timer(timeout_s, cur.interrupt)
+    timer.start()
+    try:
+        rel = cur.sql(sql)
+        if rel is None:
+            raise QueryError("Query did not return any rows.")
+        # Ask for one extra row so we can tell the user the result was truncated
+        result = rel.limit(row_cap + 1).df()
+    except duckdb.InterruptException:
+        raise QueryError(f"Query cancelled after {timeout_s} seconds.")
+    except duckdb.Error as e:
+        raise QueryError(str(e))
+    finally:
+        timer.cancel()
+        cur.close()
+
+    truncated = len(result) > row_cap
+    return result.head(row_cap), truncated
+
+
+def run_query(sql, row_cap=DEFAULT_ROW_CAP, timeout_s=DEFAULT_TIMEOUT_S):
+    """Run a read-only SQL query against the hold dataset (table ``holds``).
+
+    Results are kept in the shared result cache keyed by normalized SQL, row cap
+    and dataset version, so re-running a query (or the same query from another
+    session) is instant. Returns ``(dataframe, truncated)``.
+    """
+    _check_read_only(sql)
+    version = dataset_version()
+    row_cap, timeout_s = int(row_cap), int(timeout_s)
+    return get_result_cache().get_or_compute(
+        "sql_query",
+        (normalize_sql(sql), row_cap),
+        lambda: _execute(sql, version, row_cap, timeout_s),
+        version=version,
+    )
+
+
+def table_schema():
+    """Column names and DuckDB types of the ``holds`` table."""
+    result, _ = run_query(f"DESCRIBE {TABLE_NAME}", row_cap=1_000)
+    return result[["column_name", "column_type"]]